@@ -1,57 +1,94 @@
 from __future__ import annotations
 
+import json
+import math
+import os
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+from time import monotonic, perf_counter
 from typing import Any
 
 import objc
 from AppKit import (
+    NSAffineTransform,
     NSBezierPath,
     NSClassFromString,
     NSColor,
     NSCursor,
+    NSDictionary,
     NSFont,
     NSFontAttributeName,
     NSFontWeightRegular,
     NSForegroundColorAttributeName,
     NSGradient,
+    NSGraphicsContext,
+    NSObject,
     NSPoint,
     NSRect,
+    NSScreen,
     NSString,
 )
-from GlyphsApp import GSLTR, MOUSEMOVED, Glyphs
+from GlyphsApp import (
+    DOCUMENTACTIVATED,
+    DOCUMENTWASSAVED,
+    GSCURVE,
+    GSLTR,
+    GSOFFCURVE,
+    MOUSEMOVED,
+    GSUppercase,
+    UPDATEINTERFACE,
+    GetOpenFile,
+    GetSaveFile,
+    Glyphs,
+)
 from GlyphsApp.plugins import SelectTool
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 GlyphsToolSelect = NSClassFromString("GlyphsToolSelect")
 
 SNAP_TOLERANCE = 14
+KERNING_SNAP_TOLERANCE = 4
 COLOR_R = 0.9
 COLOR_G = 0.1
 COLOR_B = 0.0
 COLOR_ALPHA = 0.5
+PREVIEW_ALPHA = 0.35
 DRAGGING_HANDLE_HEIGHT = 30
 DRAGGING_HANDLE_WIDTH = 1
 LABEL_TEXT_SIZE = 11
 LABEL_DIST = 6
 LABEL_VERT_INNER_BIAS = 0.3
-
-
-def applyKerning(layer1, layer2, delta, step, direction=GSLTR) -> None:
-    """
-    Apply the kerning difference to the given layer pair.
-    """
-    value = layer2.previousKerningForLayer_direction_(layer1, direction)
-
-    # Glyphs 3 returns "no kerning" as None
-    if value is None or value > 0xFFFF:
-        # Kern pair didn't exist, set the kerning to the delta value
-        value = int(round(delta / step) * step)
-    else:
-        # Kern pair existed before, add the delta value
-        value = int(round((value + delta) / step) * step)
-
-    if direction == GSLTR:
-        layer2.setPreviousKerning_forLayer_direction_(value, layer1, direction)
-    else:
-        layer2.setPreviousKerning_forLayer_direction_(value, layer1, direction)
+LABEL_CACHE_SIZE = 256
+HANDLE_INVALIDATION_MARGIN = 1
+DEFAULT_FRAME_RATE = 60
+SPACING_SCOPES = ("single", "selection", "group")
+# Glyph names in metrics keys like "=n", "=|o+10" or "=a-cy*0.5"
+METRICS_KEY_NAME = re.compile(r"[A-Za-z_][\w.]*(?:-[A-Za-z_][\w.]*)*")
+PROFILE_BUFFER_SIZE = 4096
+PROFILE_SESSIONS = 100
+JOURNAL_SUFFIX = ".dragtokern-journal"
+JOURNAL_SYNC_INTERVAL = 2.0
+DELTA_FORMAT = "com.lucasfonts.DragToKern.delta"
+# Optical sidebearing suggestions: number of scanlines per outline, the
+# maximum margin depth as a fraction of the zone height, and the number of
+# measured outlines that are kept
+OPTICAL_SAMPLES = 40
+OPTICAL_DEPTH = 0.25
+OPTICAL_CACHE_SIZE = 2048
+SIDEBEARING_SNAP_TOLERANCE = 4
+# Side profiles for the gap readout, between descender and ascender
+SIDE_PROFILE_SAMPLES = 64
+SIDE_PROFILE_WORKERS = 4
+# Line segments per curve segment when the outline is flattened
+SIDE_PROFILE_CURVE_STEPS = 8
 
 
 def handleException(composedLayers, layerIndex, c, direction=GSLTR) -> None:
@@ -90,89 +127,2901 @@ def handleException(composedLayers, layerIndex, c, direction=GSLTR) -> None:
         layer2.setPreviousKerningExeption_forLayer_direction_(False, layer1, direction)
 
 
-class DragToKern(SelectTool):
-    @objc.python_method
-    def settings(self) -> None:
-        self.name = Glyphs.localize(
-            {
-                "en": "Mouse Kerning and Spacing",
-                "de": "Unterschneidung und Zurichtung per Maus",
-            }
+def exceptionPairs(composedLayers, indices, c, direction=GSLTR) -> list[int]:
+    """
+    Return the indices of the layers in the given range whose pair with the
+    layer to the left of them should get the exception for the key c. Pairs
+    that would change the same kerning pair are only returned once.
+    """
+    pairs = []
+    seen = set()
+    for layerIndex in indices:
+        if layerIndex < 1 or layerIndex >= len(composedLayers):
+            continue
+        layer1 = composedLayers[layerIndex - 1]
+        layer2 = composedLayers[layerIndex]
+        glyph1 = layer1.parent
+        glyph2 = layer2.parent
+        if glyph1 is None or glyph2 is None or layer2.master != layer1.master:
+            # Line breaks and pairs between different masters can't be kerned
+            continue
+        masterId = layer2.associatedMasterId
+        left, right, _ = resolveKerningPair(
+            glyph2.parent, masterId, glyph1, glyph2, direction
         )
-        self.keyboardShortcut = "k"
-        self.stdCursor = NSCursor.resizeLeftRightCursor()
-        self.lckCursor = NSCursor.operationNotAllowedCursor()
-        self.cursor = self.stdCursor
-        self.colorSBOuter = NSColor.colorWithCalibratedRed_green_blue_alpha_(
-            COLOR_R, COLOR_G, COLOR_B, COLOR_ALPHA
+        # The key of the pair after the exception has been made
+        if c == "a":
+            key = (masterId, glyph1.name, right)
+        elif c == "s":
+            key = (masterId, left, glyph2.name)
+        elif c == "d":
+            key = (masterId, glyph1.name, glyph2.name)
+        else:
+            key = (masterId, left, right)
+        if key not in seen:
+            seen.add(key)
+            pairs.append(layerIndex)
+    return pairs
+
+
+def lineRange(composedLayers, layerIndex) -> range:
+    """
+    Return the range of layer indices of the line that contains the layer.
+    """
+    start = layerIndex
+    while start > 0 and composedLayers[start - 1].parent is not None:
+        start -= 1
+    end = layerIndex
+    while end < len(composedLayers) and composedLayers[end].parent is not None:
+        end += 1
+    return range(start, end)
+
+
+def masterMetricsAreLocked(master) -> bool:
+    """
+    Return True if the master's metrics are linked to another master.
+    """
+    cp1 = "Link Metrics With First Master"
+    cp2 = "Link Metrics With Master"
+    return cp1 in master.customParameters or cp2 in master.customParameters
+
+
+def fontStamp(font) -> tuple:
+    """
+    Return a cheap fingerprint of the masters of a font and the number of
+    first keys in their kerning, to notice changes that were made outside of
+    the tool.
+    """
+    kerning = font.kerning
+    return tuple(
+        (master.id, len(kerning.get(master.id) or ())) for master in font.masters
+    )
+
+
+def kerningKeys(glyph1, glyph2, direction=GSLTR) -> list[tuple[str, str]]:
+    """
+    Return the possible kerning keys for a glyph pair in the order in which
+    Glyphs looks them up: glyph-glyph, glyph-group, group-glyph, group-group.
+    Group keys are prefixed with "@".
+    """
+    # Use the groups of the sides that face each other
+    if direction == GSLTR:
+        group1 = glyph1.rightKerningGroup
+        group2 = glyph2.leftKerningGroup
+    else:
+        group1 = glyph1.leftKerningGroup
+        group2 = glyph2.rightKerningGroup
+    lefts = [glyph1.name]
+    if group1:
+        lefts.append("@" + group1)
+    rights = [glyph2.name]
+    if group2:
+        rights.append("@" + group2)
+    return [(left, right) for left in lefts for right in rights]
+
+
+def resolveKerningPair(
+    font, masterId, glyph1, glyph2, direction=GSLTR
+) -> tuple[str, str, float | None]:
+    """
+    Return the left key, right key and value of the kerning pair that applies
+    to the glyph pair. If no pair exists, the keys of the pair that would be
+    created are returned with the value None.
+    """
+    keys = kerningKeys(glyph1, glyph2, direction)
+    for left, right in keys:
+        value = font.kerningForPair(masterId, left, right, direction)
+        # Glyphs 3 returns "no kerning" as None
+        if value is not None and value <= 0xFFFF:
+            return left, right, value
+    left, right = keys[-1]
+    return left, right, None
+
+
+def kerningDictKey(font, key: str, first: bool) -> str | None:
+    """
+    Return the key that Glyphs uses in font.kerning for a kerning key like "T"
+    or "@T" on the first or second side of a pair.
+    """
+    if key.startswith("@"):
+        return ("@MMK_L_" if first else "@MMK_R_") + key[1:]
+    glyph = font.glyphs[key]
+    return None if glyph is None else glyph.id
+
+
+def kerningSideKeys(font, groupIndex, key: str, first: bool) -> list[tuple]:
+    """
+    Return the font.kerning keys of the glyphs that a kerning key like "T" or
+    "@T" applies to on the first or second side of a pair, as tuples of the
+    glyph's key and the key of its group on that side, or None.
+    """
+    if key.startswith("@"):
+        groupKey = kerningDictKey(font, key, first)
+        sides = []
+        for name in groupIndex.dependents.get(groupKey, ()):
+            glyph = font.glyphs[name]
+            if glyph is not None:
+                sides.append((glyph.id, groupKey))
+        return sides
+    glyph = font.glyphs[key]
+    if glyph is None:
+        return []
+    group = glyph.rightKerningGroup if first else glyph.leftKerningGroup
+    if not group:
+        return [(glyph.id, None)]
+    return [(glyph.id, kerningDictKey(font, "@" + group, first))]
+
+
+def isRedundantPair(font, groupIndex, masterId, left, right) -> bool:
+    """
+    Return True if a kerning pair exists, but removing it doesn't change the
+    kerning of any glyph pair: a group pair with the value 0, or an exception
+    with the same value as the pair that applies without it. Only the kerning
+    for left-to-right text is considered.
+    """
+    kerning = font.kerning.get(masterId) or {}
+
+    def value(first, second):
+        row = kerning.get(first)
+        return None if row is None else row.get(second)
+
+    first = kerningDictKey(font, left, True)
+    second = kerningDictKey(font, right, False)
+    current = value(first, second)
+    if current is None:
+        return False
+    if left.startswith("@") and right.startswith("@"):
+        # There is nothing to fall back to
+        return current == 0
+
+    lefts = kerningSideKeys(font, groupIndex, left, True)
+    rights = kerningSideKeys(font, groupIndex, right, False)
+    if not lefts or not rights:
+        # Keep pairs of glyphs that are not in the font
+        return False
+    for glyph1, group1 in lefts:
+        for glyph2, group2 in rights:
+            # The same order as in kerningKeys()
+            keys = [
+                (a, b)
+                for a in (glyph1, group1)
+                for b in (glyph2, group2)
+                if a is not None and b is not None
+            ]
+            i = keys.index((first, second))
+            if any(value(*key) is not None for key in keys[:i]):
+                # A more specific pair applies to this glyph pair
+                continue
+            fallback = 0
+            for key in keys[i + 1 :]:
+                v = value(*key)
+                if v is not None:
+                    fallback = v
+                    break
+            if fallback != current:
+                return False
+    return True
+
+
+def kerningPairs(font) -> list[tuple[str, str, str]]:
+    """
+    Return all kerning pairs of the font for left-to-right text as master id,
+    left key and right key, with keys like "T" or "@T".
+    """
+    names = {glyph.id: glyph.name for glyph in font.glyphs}
+
+    def key(rawKey):
+        if rawKey.startswith("@MMK_"):
+            return "@" + rawKey[7:]
+        return names.get(rawKey)
+
+    pairs = []
+    for masterId, kerning in font.kerning.items():
+        for rawLeft, row in kerning.items():
+            left = key(rawLeft)
+            for rawRight in row.keys():
+                right = key(rawRight)
+                if left is not None and right is not None:
+                    pairs.append((masterId, left, right))
+    return pairs
+
+
+def snapshotMetrics(layer) -> tuple:
+    """
+    Return an undo snapshot of the layer's spacing.
+    """
+    return ("metrics", layer, layer.LSB, layer.width)
+
+
+def snapshotKerning(font, masterId, left, right, direction=GSLTR) -> tuple:
+    """
+    Return an undo snapshot of a kerning pair.
+    """
+    value = font.kerningForPair(masterId, left, right, direction)
+    if value is not None and value > 0xFFFF:
+        value = None
+    return ("kern", font, masterId, left, right, direction, value)
+
+
+def snapshotFont(snapshot: list[tuple]):
+    """
+    Return the font that an undo snapshot belongs to.
+    """
+    entry = snapshot[0]
+    if entry[0] == "kern":
+        return entry[1]
+    return entry[1].parent.parent
+
+
+def restoreSnapshot(snapshot: list[tuple]) -> list[tuple]:
+    """
+    Restore the values from an undo snapshot. Returns the snapshot of the
+    values before they were restored, which can be used for redo.
+    """
+    inverse = []
+    for entry in reversed(snapshot):
+        if entry[0] == "metrics":
+            _, layer, lsb, width = entry
+            inverse.append(snapshotMetrics(layer))
+            layer.LSB = lsb
+            layer.width = width
+        elif entry[0] == "kern":
+            _, font, masterId, left, right, direction, value = entry
+            inverse.append(snapshotKerning(font, masterId, left, right, direction))
+            if value is None:
+                font.removeKerningForPair(masterId, left, right, direction)
+            else:
+                font.setKerningForPair(masterId, left, right, value, direction)
+    return inverse
+
+
+def snapshotChanged(snapshot: list[tuple]) -> bool:
+    """
+    Return whether any of the values in an undo snapshot differ from the
+    current values in the font.
+    """
+    for entry in snapshot:
+        if entry[0] == "metrics":
+            if snapshotMetrics(entry[1]) != entry:
+                return True
+        elif entry[0] == "kern":
+            if snapshotKerning(*entry[1:6]) != entry:
+                return True
+    return False
+
+
+def applyOperation(
+    font, operation, snapshot: dict, lockedMasters: dict[str, bool], direction=GSLTR
+) -> bool:
+    """
+    Apply one operation of a batch to the font, following the same rules as
+    the interactive tool. The values that the operation changes are added to
+    the snapshot dict before they are changed. Returns False if the operation
+    was skipped because a glyph or layer doesn't exist or the master's metrics
+    are locked.
+    """
+    kind = operation[0]
+    if kind in ("kernPair", "kernNewPair"):
+        masterId, left, right, delta = operation[1:5]
+        # The kerning of linked metrics comes from the other master
+        if lockedMasters.get(masterId):
+            return False
+        if kind == "kernNewPair":
+            step = operation[7] if len(operation) > 7 else 1
+        else:
+            step = operation[5] if len(operation) > 5 else 1
+        if (masterId, left, right) not in snapshot:
+            snapshot[masterId, left, right] = snapshotKerning(
+                font, masterId, left, right, direction
+            )
+        value = font.kerningForPair(masterId, left, right, direction)
+        # Glyphs 3 returns "no kerning" as None
+        if value is None or value > 0xFFFF:
+            value = 0
+            if kind == "kernNewPair":
+                # The new pair starts from the value that applies to the
+                # glyphs so far, e.g. from their groups
+                glyph1 = font.glyphs[operation[5]]
+                glyph2 = font.glyphs[operation[6]]
+                if glyph1 is not None and glyph2 is not None:
+                    _, _, value = resolveKerningPair(
+                        font, masterId, glyph1, glyph2, direction
+                    )
+                    if value is None:
+                        value = 0
+        value = int(round((value + delta) / step) * step)
+        font.setKerningForPair(masterId, left, right, value, direction)
+        return True
+
+    if kind in ("kern", "setKern", "exception"):
+        masterId, name1, name2 = operation[1:4]
+        if lockedMasters.get(masterId):
+            return False
+        glyph1 = font.glyphs[name1]
+        glyph2 = font.glyphs[name2]
+        if glyph1 is None or glyph2 is None:
+            return False
+        # Remember all keys the pair could end up with
+        for left, right in kerningKeys(glyph1, glyph2, direction):
+            if (masterId, left, right) not in snapshot:
+                snapshot[masterId, left, right] = snapshotKerning(
+                    font, masterId, left, right, direction
+                )
+        if kind == "exception":
+            layer1 = glyph1.layers[masterId]
+            layer2 = glyph2.layers[masterId]
+            if layer1 is None or layer2 is None:
+                return False
+            handleException([layer1, layer2], 1, operation[4], direction)
+            return True
+
+        left, right, value = resolveKerningPair(
+            font, masterId, glyph1, glyph2, direction
         )
-        self.colorSBInner = NSColor.colorWithCalibratedRed_green_blue_alpha_(
-            COLOR_R, COLOR_G, COLOR_B, 0.0
+        step = operation[5] if len(operation) > 5 else 1
+        if kind == "kern":
+            # Add the delta, a missing pair counts as 0
+            value = (0 if value is None else value) + operation[4]
+        else:
+            value = operation[4]
+        value = int(round(value / step) * step)
+        font.setKerningForPair(masterId, left, right, value, direction)
+        return True
+
+    if kind in ("LSB", "RSB", "move"):
+        masterId, name, delta = operation[1:4]
+        glyph = font.glyphs[name]
+        layer = None if glyph is None else glyph.layers[masterId]
+        if layer is None:
+            return False
+        # Only "move" can be applied for linked metrics
+        if kind != "move" and lockedMasters.get(masterId):
+            return False
+        if (masterId, name) not in snapshot:
+            snapshot[masterId, name] = snapshotMetrics(layer)
+        # Metrics are changed by whole units
+        delta = int(round(delta))
+        if kind == "move":
+            width = layer.width
+            layer.LSB += delta
+            layer.width = width
+        elif kind == "LSB":
+            layer.LSB += delta
+        else:
+            layer.RSB += delta
+        return True
+
+    raise ValueError("Unknown operation: %r" % (kind,))
+
+
+def journalEdits(snapshot: list[tuple]) -> list[list]:
+    """
+    Return the current values of the kerning pairs and layers in an undo
+    snapshot as journal edits.
+    """
+    edits = []
+    for entry in snapshot:
+        if entry[0] == "metrics":
+            layer = entry[1]
+            edits.append(
+                ["m", layer.layerId, layer.parent.name, layer.LSB, layer.width]
+            )
+        elif entry[0] == "kern":
+            _, font, masterId, left, right, direction, _ = entry
+            value = snapshotKerning(font, masterId, left, right, direction)[-1]
+            edits.append(["k", masterId, left, right, direction, value])
+    return edits
+
+
+def journalSnapshot(font, edits: list[list]) -> list[tuple]:
+    """
+    Return journal edits as an undo snapshot, so they can be applied with
+    restoreSnapshot(). Edits for glyphs or layers that don't exist are left
+    out.
+    """
+    snapshot = []
+    for edit in edits:
+        if edit[0] == "m":
+            _, layerId, name, lsb, width = edit
+            glyph = font.glyphs[name]
+            layer = None if glyph is None else glyph.layers[layerId]
+            if layer is not None:
+                snapshot.append(("metrics", layer, lsb, width))
+        elif edit[0] == "k":
+            _, masterId, left, right, direction, value = edit
+            snapshot.append(("kern", font, masterId, left, right, direction, value))
+    return snapshot
+
+
+def journalPath(font) -> str | None:
+    """
+    Return the path of the journal file next to the font's document, or None if
+    the font hasn't been saved yet.
+    """
+    if font is None or not font.filepath:
+        return None
+    return font.filepath + JOURNAL_SUFFIX
+
+
+def mapMasters(font, names: list[str]) -> list[str | None]:
+    """
+    Return the ids of the font's masters that correspond to the masters with
+    the given names in another font: the master with the same name, or else
+    the master at the same index if it has not been matched by name.
+    """
+    masters = list(font.masters)
+    byName = {master.name: master.id for master in masters}
+    masterIds = [byName.get(name) for name in names]
+    matched = set(masterIds)
+    for index, masterId in enumerate(masterIds):
+        if masterId is None and index < len(masters):
+            if masters[index].id not in matched:
+                masterIds[index] = masters[index].id
+                matched.add(masters[index].id)
+    return masterIds
+
+
+def deltaOperations(font, data: dict):
+    """
+    Yield the operations for applyOperations() that apply the changes from a
+    delta file to the font. Kerning is applied to the same keys if the font has
+    the glyphs and groups, or else to the pair that applies to the glyphs the
+    change was made with. A pair that was added, e.g. an exception, is added
+    with the change applied to the value that applied to the glyphs before.
+    """
+    if data.get("format") != DELTA_FORMAT:
+        raise ValueError("Not a DragToKern delta file")
+    masterIds = mapMasters(font, data["masters"])
+
+    # Resolve the group keys once for the whole file
+    lefts = set()
+    rights = set()
+    for glyph in font.glyphs:
+        lefts.add(glyph.name)
+        rights.add(glyph.name)
+        if glyph.rightKerningGroup:
+            lefts.add("@" + glyph.rightKerningGroup)
+        if glyph.leftKerningGroup:
+            rights.add("@" + glyph.leftKerningGroup)
+
+    for entry in data["kerning"]:
+        masterIndex, left, right, delta, glyph1, glyph2 = entry[:6]
+        # Version 1 files don't say whether the pair was added
+        new = len(entry) > 6 and entry[6]
+        masterId = masterIds[masterIndex]
+        if masterId is None:
+            continue
+        if left in lefts and right in rights:
+            if new:
+                yield ("kernNewPair", masterId, left, right, delta, glyph1, glyph2)
+            else:
+                yield ("kernPair", masterId, left, right, delta)
+        else:
+            yield ("kern", masterId, glyph1, glyph2, delta)
+    for masterIndex, name, lsb, rsb in data["metrics"]:
+        masterId = masterIds[masterIndex]
+        if masterId is None:
+            continue
+        if lsb:
+            yield ("LSB", masterId, name, lsb)
+        if rsb:
+            yield ("RSB", masterId, name, rsb)
+
+
+def frameInterval() -> float:
+    """
+    Return the duration of one display frame of the main screen in seconds.
+    """
+    screen = NSScreen.mainScreen()
+    fps = 0
+    if screen is not None and screen.respondsToSelector_("maximumFramesPerSecond"):
+        fps = screen.maximumFramesPerSecond()
+    return 1.0 / (fps or DEFAULT_FRAME_RATE)
+
+
+def metricsKeyReferences(glyph) -> set[str]:
+    """
+    Return the names of the glyphs that the metrics keys of the glyph and its
+    layers refer to.
+    """
+    keys = [glyph.leftMetricsKey, glyph.rightMetricsKey, glyph.widthMetricsKey]
+    for layer in glyph.layers:
+        keys.append(layer.leftMetricsKey)
+        keys.append(layer.rightMetricsKey)
+        keys.append(layer.widthMetricsKey)
+    names = set()
+    for key in keys:
+        if key:
+            names.update(METRICS_KEY_NAME.findall(key))
+    names.discard(glyph.name)
+    return names
+
+
+def componentReferences(glyph) -> set[tuple[str, str]]:
+    """
+    Return the master ids and names of the glyphs that the master layers of
+    the glyph use as components.
+    """
+    references = set()
+    for layer in glyph.layers:
+        masterId = layer.associatedMasterId
+        if layer.layerId != masterId:
+            # Only master layers
+            continue
+        for component in layer.components:
+            references.add((masterId, component.componentName))
+    return references
+
+
+def visibleGlyphNames(composedLayers, masterId: str) -> set[str]:
+    """
+    Return the names of the glyphs that are shown in the Edit view in the
+    master.
+    """
+    names = set()
+    for layer in composedLayers:
+        glyph = layer.parent
+        if glyph is not None and layer.associatedMasterId == masterId:
+            names.add(glyph.name)
+    return names
+
+
+def outlineSignature(layer) -> int | None:
+    """
+    Return a hash of the outline of a layer that doesn't depend on the
+    position of the outline inside the layer, or None if the layer has no
+    outline.
+    """
+    bounds = layer.bounds
+    if bounds.size.width <= 0:
+        return None
+    x0 = bounds.origin.x
+    items = []
+    for path in layer.paths:
+        items.append(
+            tuple(
+                (node.position.x - x0, node.position.y, node.type)
+                for node in path.nodes
+            )
         )
-        self.colorLabel = NSColor.textColor()
-        self.colorBox = NSColor.textBackgroundColor()
+    for component in layer.components:
+        m11, m12, m21, m22, tx, ty = component.transform
+        items.append(
+            (
+                component.componentName,
+                (m11, m12, m21, m22, tx - x0, ty),
+                # The outline of the base glyph may have changed
+                component.component.lastChange,
+            )
+        )
+    return hash(tuple(items))
+
+
+def outlineStamp(layer, seen: frozenset = frozenset()):
+    """
+    Return the last change of the glyph of a layer, together with those of the
+    glyphs that its components use. The outline of a composite changes with
+    its base glyphs, while its own last change stays the same.
+    """
+    glyph = layer.parent
+    components = layer.components
+    if not components:
+        return glyph.lastChange
+    # Guard against components that refer to each other
+    seen = seen | {glyph.name}
+    masterId = layer.associatedMasterId
+    bases = []
+    for component in components:
+        base = component.component
+        baseLayer = None
+        if base is not None and base.name not in seen:
+            baseLayer = base.layers[masterId]
+        bases.append(None if baseLayer is None else outlineStamp(baseLayer, seen))
+    return (glyph.lastChange, tuple(bases))
+
+
+def marginProfile(
+    layer, bottom: float, top: float, samples: int = OPTICAL_SAMPLES
+) -> list[tuple[float, float]]:
+    """
+    Return the distances from the left and right edge of the layer's bounds to
+    its outline on a number of scanlines between bottom and top. Scanlines
+    that don't hit the outline have NaN margins.
+    """
+    bounds = layer.bounds
+    xMin = bounds.origin.x
+    xMax = xMin + bounds.size.width
+    step = (top - bottom) / samples
+    profile = []
+    for i in range(samples):
+        y = bottom + (i + 0.5) * step
+        # The first and last point are the start and end of the line
+        points = layer.intersectionsBetweenPoints(
+            (xMin - 1, y), (xMax + 1, y), components=True
+        )[1:-1]
+        if points:
+            xs = [point.x for point in points]
+            profile.append((min(xs) - xMin, xMax - max(xs)))
+        else:
+            profile.append((math.nan, math.nan))
+    return profile
+
+
+def whiteSpace(profile: list[tuple[float, float]], depth: float) -> tuple[float, float]:
+    """
+    Return the mean white space between the bounds and the outline on the left
+    and right side of a margin profile. Each margin is clipped to depth, and
+    scanlines without outline count as the full depth.
+    """
+    if numpy is not None:
+        # fmin() ignores the NaN margins
+        margins = numpy.fmin(numpy.array(profile, dtype=float), depth)
+        left, right = margins.mean(axis=0)
+        return float(left), float(right)
+
+    def clip(margin):
+        return depth if math.isnan(margin) else min(margin, depth)
+
+    count = len(profile)
+    return (
+        sum(clip(left) for left, _ in profile) / count,
+        sum(clip(right) for _, right in profile) / count,
+    )
+
+
+def layerContours(
+    layer, transform=(1, 0, 0, 1, 0, 0), seen: frozenset = frozenset()
+) -> list[tuple[bool, list[tuple[float, float, str]]]]:
+    """
+    Return the paths of a layer and of its components as (closed, nodes)
+    tuples, with the nodes as (x, y, type) tuples in the coordinates of the
+    layer. This reads the outline on the main thread, so that the worker
+    threads only get plain data.
+    """
+    m11, m12, m21, m22, tx, ty = transform
+    contours = []
+    for path in layer.paths:
+        nodes = []
+        for node in path.nodes:
+            x, y = node.position.x, node.position.y
+            nodes.append((m11 * x + m21 * y + tx, m12 * x + m22 * y + ty, node.type))
+        contours.append((path.closed, nodes))
+    glyph = layer.parent
+    # Guard against components that refer to each other
+    seen = seen | {glyph.name}
+    for component in layer.components:
+        base = component.component
+        if base is None or base.name in seen:
+            continue
+        baseLayer = base.layers[layer.associatedMasterId]
+        if baseLayer is None:
+            continue
+        c11, c12, c21, c22, ctx, cty = component.transform
+        contours.extend(
+            layerContours(
+                baseLayer,
+                (
+                    c11 * m11 + c12 * m21,
+                    c11 * m12 + c12 * m22,
+                    c21 * m11 + c22 * m21,
+                    c21 * m12 + c22 * m22,
+                    ctx * m11 + cty * m21 + tx,
+                    ctx * m12 + cty * m22 + ty,
+                ),
+                seen,
+            )
+        )
+    return contours
+
+
+def flattenContour(
+    closed: bool, nodes: list[tuple[float, float, str]], steps: int
+) -> list[tuple[float, float]]:
+    """
+    Return the points of a contour with its curves replaced by line segments.
+    Cubic curves are split into steps segments, quadratic curves with any
+    number of off-curve points into steps segments per implied curve.
+    """
+    start = next((i for i, node in enumerate(nodes) if node[2] != GSOFFCURVE), None)
+    if start is None:
+        return []
+    x0, y0 = nodes[start][:2]
+    rest = nodes[start + 1 :]
+    if closed:
+        rest += nodes[: start + 1]
+    points = [(x0, y0)]
+    controls = []
+    ts = [i / steps for i in range(1, steps)]
+    for x, y, type in rest:
+        if type == GSOFFCURVE:
+            controls.append((x, y))
+            continue
+        if type == GSCURVE and len(controls) == 2:
+            (x1, y1), (x2, y2) = controls
+            for t in ts:
+                mt = 1 - t
+                a, b, c, d = mt * mt * mt, 3 * mt * mt * t, 3 * mt * t * t, t * t * t
+                points.append(
+                    (
+                        a * x0 + b * x1 + c * x2 + d * x,
+                        a * y0 + b * y1 + c * y2 + d * y,
+                    )
+                )
+        elif controls:
+            # TrueType curves have an implied on-curve point between two
+            # off-curve points
+            for i, (x1, y1) in enumerate(controls):
+                if i + 1 < len(controls):
+                    x2 = (x1 + controls[i + 1][0]) / 2
+                    y2 = (y1 + controls[i + 1][1]) / 2
+                else:
+                    x2, y2 = x, y
+                for t in ts:
+                    mt = 1 - t
+                    a, b, c = mt * mt, 2 * mt * t, t * t
+                    points.append((a * x0 + b * x1 + c * x2, a * y0 + b * y1 + c * y2))
+                points.append((x2, y2))
+                x0, y0 = x2, y2
+            controls = []
+            continue
+        points.append((x, y))
+        controls = []
+        x0, y0 = x, y
+    return points
+
+
+def sideProfile(contours, xMin: float, xMax: float, bottom: float, top: float):
+    """
+    Return the margin profile of an outline for the gap readout, as an array
+    if NumPy is available. Runs in a worker thread, so it only gets the plain
+    data from layerContours() and the bounds of the layer. The scanlines are
+    the same as in marginProfile().
+    """
+    segments = []
+    for closed, nodes in contours:
+        points = flattenContour(closed, nodes, SIDE_PROFILE_CURVE_STEPS)
+        segments.extend(zip(points, points[1:]))
+    step = (top - bottom) / SIDE_PROFILE_SAMPLES
+    if numpy is not None:
+        ys = bottom + (numpy.arange(SIDE_PROFILE_SAMPLES) + 0.5) * step
+        profile = numpy.full((SIDE_PROFILE_SAMPLES, 2), numpy.nan)
+        if not segments:
+            return profile
+        x0, y0, x1, y1 = numpy.array(
+            [(a[0], a[1], b[0], b[1]) for a, b in segments], dtype=float
+        ).T
+        scan = ys[:, None]
+        hits = ((y0 <= scan) & (scan < y1)) | ((y1 <= scan) & (scan < y0))
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            xs = x0 + (scan - y0) / (y1 - y0) * (x1 - x0)
+        found = hits.any(axis=1)
+        profile[found, 0] = numpy.where(hits, xs, numpy.inf).min(axis=1)[found] - xMin
+        profile[found, 1] = xMax - numpy.where(hits, xs, -numpy.inf).max(axis=1)[found]
+        return profile
+    profile = []
+    for i in range(SIDE_PROFILE_SAMPLES):
+        y = bottom + (i + 0.5) * step
+        xs = [
+            ax + (y - ay) / (by - ay) * (bx - ax)
+            for (ax, ay), (bx, by) in segments
+            if ay <= y < by or by <= y < ay
+        ]
+        if xs:
+            profile.append((min(xs) - xMin, xMax - max(xs)))
+        else:
+            profile.append((math.nan, math.nan))
+    return profile
+
+
+def minimumGap(first, second) -> float | None:
+    """
+    Return the smallest sum of the right margin of the first and the left
+    margin of the second side profile at the same height, or None if the
+    outlines don't share any height.
+    """
+    if numpy is not None:
+        sums = first[:, 1] + second[:, 0]
+        if numpy.isnan(sums).all():
+            return None
+        return float(numpy.nanmin(sums))
+    sums = [a[1] + b[0] for a, b in zip(first, second)]
+    sums = [value for value in sums if not math.isnan(value)]
+    return min(sums) if sums else None
+
+
+def interpolate(matrix, values: list[float]) -> list[float]:
+    """
+    Return the values of the instances from the values of the masters and an
+    instance × master weight matrix.
+    """
+    if numpy is not None:
+        return (matrix @ numpy.array(values, dtype=float)).tolist()
+    return [sum(w * v for w, v in zip(row, values)) for row in matrix]
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """
+    Return the p-th percentile of the sorted samples (nearest rank).
+    """
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, int(round(p / 100 * len(samples))) - 1))
+    return samples[rank]
+
+
+def latencyStats(samples: list[float], count: int) -> dict[str, float]:
+    """
+    Return the event count and latency percentiles of the samples in
+    milliseconds.
+    """
+    samples = sorted(samples)
+    return {
+        "count": count,
+        "p50": percentile(samples, 50) * 1000,
+        "p95": percentile(samples, 95) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "max": samples[-1] * 1000 if samples else 0.0,
+    }
+
+
+def profiled(name: str):
+    """
+    Record the run time of the decorated tool method in the tool's profiler.
+    When profiling is off, the only cost is the check for the profiler.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args):
+            profiler = self.profiler
+            if profiler is None:
+                return method(self, *args)
+            start = perf_counter()
+            try:
+                return method(self, *args)
+            finally:
+                profiler.record(name, perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class Profiler:
+    """
+    Latency samples of the tool's hot paths. The last PROFILE_BUFFER_SIZE
+    samples of each path are kept in a ring buffer, so that recording doesn't
+    allocate and the memory use is bounded.
+
+    A drag session remembers the sample counts at mouse down. At mouse up, the
+    samples recorded in between are summarized per path.
+    """
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE) -> None:
+        self.size = size
+        self.buffers: dict[str, list[float]] = {}
+        self.counts: dict[str, int] = {}
+        self.sessions: deque[dict[str, Any]] = deque(maxlen=PROFILE_SESSIONS)
+        self.session: tuple[str, float, dict[str, int]] | None = None
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Add a latency sample for the named path.
+        """
+        count = self.counts.get(name)
+        if count is None:
+            self.buffers[name] = [0.0] * self.size
+            count = 0
+        self.buffers[name][count % self.size] = seconds
+        self.counts[name] = count + 1
+
+    def samples(self, name: str, since: int = 0) -> list[float]:
+        """
+        Return the samples of the named path recorded after the given count, as
+        far as they are still in the ring buffer.
+        """
+        count = self.counts.get(name, 0)
+        n = min(count - since, self.size)
+        if n <= 0:
+            return []
+        buffer = self.buffers[name]
+        end = count % self.size
+        if n <= end:
+            return buffer[end - n : end]
+        return buffer[end - n :] + buffer[:end]
+
+    def beginSession(self, mode: str) -> None:
+        self.session = (mode, monotonic(), dict(self.counts))
+
+    def endSession(self) -> None:
+        """
+        Summarize the samples of the current drag session.
+        """
+        if self.session is None:
+            return
+        mode, start, counts = self.session
+        self.session = None
+        events = {}
+        for name, count in self.counts.items():
+            since = counts.get(name, 0)
+            if count > since:
+                events[name] = latencyStats(self.samples(name, since), count - since)
+        self.sessions.append(
+            {
+                "mode": mode,
+                "duration": (monotonic() - start) * 1000,
+                "events": events,
+            }
+        )
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Return the latency percentiles in milliseconds and event counts of all
+        paths, and of the recent drag sessions.
+        """
+        return {
+            "paths": {
+                name: latencyStats(self.samples(name), count)
+                for name, count in sorted(self.counts.items())
+            },
+            "sessions": list(self.sessions),
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+class Journal:
+    """
+    An append-only file of the edits made with the tool since the font was
+    last saved. Each line is a JSON list of absolute values, so a record can
+    be replayed more than once. Lines are flushed when they are written, but
+    synced to disk at most every JOURNAL_SYNC_INTERVAL seconds.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = None
+        self.dirty = False
+        self.lastSync = 0.0
+        # Records from a previous session that may not be in the font
+        self.pending = os.path.exists(path) and os.path.getsize(path) > 0
+
+    def append(self, edits: list[list]) -> None:
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(edits, separators=(",", ":")) + "\n")
+        self.file.flush()
+        self.dirty = True
+
+    def isDue(self) -> bool:
+        return monotonic() - self.lastSync >= JOURNAL_SYNC_INTERVAL
+
+    def sync(self) -> None:
+        if self.file is not None and self.dirty:
+            os.fsync(self.file.fileno())
+            self.dirty = False
+        self.lastSync = monotonic()
+
+    def records(self):
+        """
+        Yield the records of the journal file in the order they were written.
+        """
+        if self.file is not None:
+            self.file.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A record that was cut off by a crash
+                    continue
+
+    def truncate(self) -> None:
+        """
+        Remove the journal file, because its edits are now in the saved font.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.dirty = False
+        self.pending = False
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class DeltaRecorder:
+    """
+    The kerning pairs and glyphs of a font that were changed with the tool,
+    with their values before the first change. The net changes are taken
+    from the current values in the font, so that changes which were undone or
+    redone later, with the tool or by Glyphs, are exported as they are now.
+    """
+
+    def __init__(self, font) -> None:
+        self.font = font
+        # (masterId, left, right) -> [value, origin, glyph1, glyph2]
+        self.kerning: dict[tuple[str, str, str], list] = {}
+        # (masterId, glyph name) -> [LSB, width]
+        self.metrics: dict[tuple[str, str], list[float]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.kerningDeltas() or self.metricsDeltas())
+
+    def addKerning(self, masterId, left, right, value, origin, glyph1, glyph2) -> None:
+        """
+        Remember the value of a pair before it is changed. The value is None
+        if the font didn't have the pair, the origin is the value that applied
+        to the glyphs anyway, e.g. from a group pair before an exception was
+        added. Later changes of the same pair keep the first value.
+        """
+        if (masterId, left, right) not in self.kerning:
+            self.kerning[masterId, left, right] = [value, origin, glyph1, glyph2]
+
+    def addMetrics(self, masterId, name, lsb, width) -> None:
+        """
+        Remember the LSB and width of a layer before it is changed. Later
+        changes of the same layer keep the first values.
+        """
+        if (masterId, name) not in self.metrics:
+            self.metrics[masterId, name] = [lsb, width]
+
+    def kerningDeltas(self) -> list[tuple[str, str, str, float, str, str, bool]]:
+        """
+        Return the net kerning changes. The last item is True if the pair was
+        added, in which case the delta is relative to the value that applied
+        to the glyphs before.
+        """
+        font = self.font
+        deltas = []
+        for (masterId, left, right), entry in self.kerning.items():
+            value, origin, glyph1, glyph2 = entry
+            current = snapshotKerning(font, masterId, left, right)[-1]
+            # A missing pair has the value that applies instead
+            delta = (origin if current is None else current) - (
+                origin if value is None else value
+            )
+            if delta:
+                deltas.append(
+                    (masterId, left, right, delta, glyph1, glyph2, value is None)
+                )
+        return deltas
+
+    def metricsDeltas(self) -> list[tuple[str, str, float, float]]:
+        font = self.font
+        deltas = []
+        for (masterId, name), (lsb, width) in self.metrics.items():
+            glyph = font.glyphs[name]
+            layer = None if glyph is None else glyph.layers[masterId]
+            if layer is None:
+                continue
+            lsbDelta = layer.LSB - lsb
+            # The outline doesn't change, so the RSB takes up the rest
+            rsbDelta = layer.width - width - lsbDelta
+            if lsbDelta or rsbDelta:
+                deltas.append((masterId, name, lsbDelta, rsbDelta))
+        return deltas
+
+    def export(self) -> dict:
+        """
+        Return the changes as the contents of a delta file. Masters are
+        referred to by their index in the list of master names.
+        """
+        font = self.font
+        masterIds = [master.id for master in font.masters]
+        kerning = []
+        for masterId, left, right, delta, glyph1, glyph2, new in self.kerningDeltas():
+            if masterId in masterIds:
+                kerning.append(
+                    [
+                        masterIds.index(masterId),
+                        left,
+                        right,
+                        delta,
+                        glyph1,
+                        glyph2,
+                        new,
+                    ]
+                )
+        metrics = []
+        for masterId, name, lsb, rsb in self.metricsDeltas():
+            if masterId in masterIds:
+                metrics.append([masterIds.index(masterId), name, lsb, rsb])
+        return {
+            "format": DELTA_FORMAT,
+            "version": 2,
+            "masters": [master.name for master in font.masters],
+            "kerning": kerning,
+            "metrics": metrics,
+        }
+
+
+class KerningValueIndex:
+    """
+    The kerning values of a font by second key, so that the values of all pairs
+    with the same second key can be found without going through all pairs.
+    The index for a master is built on first use. Changes made with the tool are
+    added with update(). The index for a master is built again when the number
+    of its first keys has changed in another way, which doesn't touch the
+    other masters.
+    """
+
+    def __init__(self, font) -> None:
+        self.font = font
+        # masterId -> second key -> first key -> value
+        self.columns: dict[str, dict[str, dict[str, float]]] = {}
+        # masterId -> number of first keys that the column index is valid for
+        self.sizes: dict[str, int] = {}
+
+    def column(self, masterId: str) -> dict[str, dict[str, float]]:
+        kerning = self.font.kerning.get(masterId) or {}
+        columns = self.columns.get(masterId)
+        if columns is None or self.sizes[masterId] != len(kerning):
+            columns = self.columns[masterId] = {}
+            for left, row in kerning.items():
+                for right, value in row.items():
+                    columns.setdefault(right, {})[left] = value
+            self.sizes[masterId] = len(kerning)
+        return columns
+
+    def candidates(self, masterId: str, left: str, right: str) -> list[float]:
+        """
+        Return the sorted values of the pairs that are related to a pair: the
+        pairs with the same first key, with the same second key, and the same
+        pair in the other masters.
+        """
+        font = self.font
+        first = kerningDictKey(font, left, True)
+        second = kerningDictKey(font, right, False)
+        values = set()
+        kerning = font.kerning
+        row = (kerning.get(masterId) or {}).get(first) or {}
+        values.update(value for key, value in row.items() if key != second)
+        column = self.column(masterId).get(second) or {}
+        values.update(value for key, value in column.items() if key != first)
+        for master in font.masters:
+            if master.id != masterId:
+                row = (kerning.get(master.id) or {}).get(first) or {}
+                value = row.get(second)
+                if value is not None:
+                    values.add(value)
+        return sorted(values)
+
+    def update(self, masterId: str, left: str, right: str, old, new) -> None:
+        """
+        Update the index after the value of a pair was changed from old to new.
+        None means that the pair doesn't exist.
+        """
+        if masterId not in self.columns or old == new:
+            return
+        first = kerningDictKey(self.font, left, True)
+        second = kerningDictKey(self.font, right, False)
+        column = self.columns[masterId].setdefault(second, {})
+        if new is None:
+            column.pop(first, None)
+        else:
+            column[first] = new
+        # The change may have added or removed a first key
+        self.sizes[masterId] = len(self.font.kerning.get(masterId) or {})
+
+
+class SidebearingSuggestions:
+    """
+    Suggested sidebearings that give a glyph about as much white space at its
+    sides as the reference glyph of its case, "H" for uppercase and "n" for all
+    other glyphs. The white space is measured from the margin profile of the
+    outline inside the cap height or x-height, with each margin clipped to a
+    maximum depth so that open shapes aren't pushed into their neighbours.
+
+    The white space only depends on the outline and the zone, not on the
+    sidebearings. It is kept in a bounded LRU by the outline signature and the
+    zone, so that hovering over the glyphs of a long text measures every
+    outline only once. The signature itself is only computed again when the
+    glyph or one of the glyphs that its components use was changed.
+    """
+
+    def __init__(self, size: int = OPTICAL_CACHE_SIZE) -> None:
+        self.size = size
+        # (glyph name, layerId) -> (outline stamp, signature)
+        self.signatures: OrderedDict[tuple[str, str], tuple[Any, int | None]] = (
+            OrderedDict()
+        )
+        # (signature, bottom, top) -> (left, right)
+        self.white: OrderedDict[tuple, tuple[float, float]] = OrderedDict()
+
+    def clear(self) -> None:
+        self.signatures.clear()
+        self.white.clear()
+
+    def signature(self, layer) -> int | None:
+        key = (layer.parent.name, layer.layerId)
+        stamp = outlineStamp(layer)
+        cached = self.signatures.get(key)
+        if cached is not None and cached[0] == stamp:
+            self.signatures.move_to_end(key)
+            return cached[1]
+        signature = outlineSignature(layer)
+        self.signatures[key] = (stamp, signature)
+        if len(self.signatures) > self.size:
+            self.signatures.popitem(last=False)
+        return signature
+
+    def whiteSpace(
+        self, layer, bottom: float, top: float
+    ) -> tuple[float, float] | None:
+        """
+        Return the mean white space at the left and right side of the layer's
+        outline between bottom and top, or None if it has no outline.
+        """
+        signature = self.signature(layer)
+        if signature is None:
+            return None
+        key = (signature, bottom, top)
+        white = self.white.get(key)
+        if white is not None:
+            self.white.move_to_end(key)
+            return white
+        profile = marginProfile(layer, bottom, top)
+        white = whiteSpace(profile, (top - bottom) * OPTICAL_DEPTH)
+        self.white[key] = white
+        if len(self.white) > self.size:
+            self.white.popitem(last=False)
+        return white
+
+    def suggest(self, layer, metric: str) -> int | None:
+        """
+        Return the suggested value of the LSB or RSB of the layer, or None if
+        there is no suggestion.
+        """
+        glyph = layer.parent
+        font = glyph.parent
+        try:
+            master = layer.master
+        except KeyError:
+            return None
+        if glyph.case == GSUppercase:
+            reference, top = font.glyphs["H"], master.capHeight
+        else:
+            reference, top = font.glyphs["n"], master.xHeight
+        if reference is None or top <= 0:
+            return None
+        referenceLayer = reference.layers[layer.associatedMasterId]
+        if referenceLayer is None:
+            return None
+        referenceWhite = self.whiteSpace(referenceLayer, 0, top)
+        white = self.whiteSpace(layer, 0, top)
+        if referenceWhite is None or white is None:
+            return None
+        if metric == "LSB":
+            return int(round(referenceLayer.LSB + referenceWhite[0] - white[0]))
+        return int(round(referenceLayer.RSB + referenceWhite[1] - white[1]))
+
+
+class SideProfiles:
+    """
+    The side profiles of the layers in the Edit view, for the gap readout
+    while kerning. They are computed in a pool of worker threads when the
+    layers are prefetched, so that a drag only has to look them up. A profile
+    that isn't ready yet is simply not shown.
+
+    The profiles are relative to the bounds of the outline, so they stay valid
+    when only the sidebearings change. They are kept in a bounded LRU by
+    glyph, layer, the outlineStamp() of the layer, and the master's vertical
+    metrics.
+    """
+
+    def __init__(self, size: int = OPTICAL_CACHE_SIZE) -> None:
+        self.size = size
+        self.executor: ThreadPoolExecutor | None = None
+        self.futures: OrderedDict[tuple, Future] = OrderedDict()
+
+    def key(self, layer) -> tuple | None:
+        glyph = layer.parent
+        if glyph is None:
+            # A line break
+            return None
+        try:
+            master = layer.master
+        except KeyError:
+            return None
+        return (
+            glyph.name,
+            layer.layerId,
+            outlineStamp(layer),
+            master.descender,
+            master.ascender,
+        )
+
+    def prefetch(self, layers) -> None:
+        """
+        Start computing the profiles of the layers that aren't cached yet.
+        """
+        for layer in layers:
+            key = self.key(layer)
+            if key is None:
+                continue
+            if key in self.futures:
+                self.futures.move_to_end(key)
+                continue
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=SIDE_PROFILE_WORKERS,
+                    thread_name_prefix="DragToKern",
+                )
+            # Read the outline here, the layer must not be used in the workers
+            bounds = layer.bounds
+            xMin = bounds.origin.x
+            self.futures[key] = self.executor.submit(
+                sideProfile,
+                layerContours(layer),
+                xMin,
+                xMin + bounds.size.width,
+                key[3],
+                key[4],
+            )
+            if len(self.futures) > self.size:
+                self.futures.popitem(last=False)
+
+    def profile(self, layer):
+        """
+        Return the profile of the layer if it has been computed, or None.
+        """
+        future = self.futures.get(self.key(layer))
+        if future is None or not future.done() or future.cancelled():
+            return None
+        if future.exception() is not None:
+            return None
+        return future.result()
+
+    def gap(self, layer1, layer2) -> float | None:
+        """
+        Return the smallest horizontal distance between the outlines of two
+        layers that are set next to each other without kerning, or None if a
+        profile isn't ready or the outlines don't share any height.
+        """
+        first = self.profile(layer1)
+        second = self.profile(layer2)
+        if first is None or second is None:
+            return None
+        gap = minimumGap(first, second)
+        if gap is None:
+            return None
+        return gap + layer1.RSB + layer2.LSB
+
+    def wait(self) -> None:
+        """
+        Wait until all profiles have been computed.
+        """
+        for future in list(self.futures.values()):
+            if not future.cancelled():
+                future.exception()
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker threads. Profiles that weren't computed yet are
+        dropped.
+        """
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        for key, future in list(self.futures.items()):
+            if not future.done() or future.cancelled():
+                del self.futures[key]
+
+
+class InstanceWeights:
+    """
+    The interpolation weights of the exported instances of each font, as an
+    instance × master matrix, so that the kerning of a pair in all instances
+    can be computed from its values in the masters at once. The matrix of a
+    font is built again when its masters or instances have changed.
+    """
+
+    def __init__(self) -> None:
+        # font -> (signature, instance names, master ids, matrix)
+        self.fonts: dict[Any, tuple] = {}
+
+    def signature(self, font) -> tuple:
+        return (
+            tuple((master.id, tuple(master.axes)) for master in font.masters),
+            tuple(
+                (instance.name, tuple(instance.axes), instance.exports)
+                for instance in font.instances
+            ),
+        )
+
+    def weights(self, font) -> tuple[list[str], list[str], Any]:
+        """
+        Return the names of the exported instances, the master ids, and the
+        weight matrix of a font.
+        """
+        signature = self.signature(font)
+        cached = self.fonts.get(font)
+        if cached is not None and cached[0] == signature:
+            return cached[1:]
+        masterIds = [master.id for master in font.masters]
+        names = []
+        rows = []
+        for instance in font.instances:
+            if not instance.exports:
+                continue
+            factors = instance.instanceInterpolations or {}
+            names.append(instance.name)
+            rows.append([float(factors.get(masterId, 0)) for masterId in masterIds])
+        matrix = rows
+        if numpy is not None:
+            matrix = numpy.array(rows, dtype=float).reshape(len(rows), len(masterIds))
+        self.fonts[font] = (signature, names, masterIds, matrix)
+        return names, masterIds, matrix
+
+
+class PairIndex:
+    """
+    The positions of the glyph pairs in the text of an Edit view by master and
+    glyph names, so that the places where a kerning pair applies can be found
+    without resolving every pair of the text. The index is built again when
+    the text has changed.
+    """
+
+    def __init__(self) -> None:
+        self.signature: tuple | None = None
+        # (masterId, glyph name, glyph name) -> (glyph, glyph, [layer index])
+        self.pairs: dict[tuple[str, str, str], tuple[Any, Any, list[int]]] = {}
+
+    def update(self, composedLayers) -> None:
+        glyphs = [layer.parent for layer in composedLayers]
+        # The layers are compared by glyph name and master, because PyObjC may
+        # return new proxy objects for the same layers
+        signature = tuple(
+            (None if glyph is None else glyph.name, layer.associatedMasterId)
+            for glyph, layer in zip(glyphs, composedLayers)
+        )
+        if signature == self.signature:
+            return
+        pairs = {}
+        glyph1 = None
+        name1 = masterId1 = None
+        for index, (glyph2, (name2, masterId2)) in enumerate(zip(glyphs, signature)):
+            if glyph1 is not None and glyph2 is not None and masterId1 == masterId2:
+                entry = pairs.get((masterId2, name1, name2))
+                if entry is None:
+                    entry = pairs[masterId2, name1, name2] = (glyph1, glyph2, [])
+                entry[2].append(index)
+            glyph1 = glyph2
+            name1 = name2
+            masterId1 = masterId2
+        self.pairs = pairs
+        self.signature = signature
+
+    def occurrences(
+        self, font, keys: set[tuple[str, str, str]], direction=GSLTR
+    ) -> list[int]:
+        """
+        Return the indices of the layers whose pair with the layer before them
+        resolves to one of the kerning pairs, given as (masterId, left key,
+        right key).
+        """
+        indices = []
+        for (masterId, _, _), (glyph1, glyph2, positions) in self.pairs.items():
+            candidates = [key for key in keys if key[0] == masterId]
+            if not candidates:
+                continue
+            # Only pairs that could use one of the keys need to be resolved
+            possible = kerningKeys(glyph1, glyph2, direction)
+            if not any(key[1:] in possible for key in candidates):
+                continue
+            left, right, _ = resolveKerningPair(
+                font, masterId, glyph1, glyph2, direction
+            )
+            if (masterId, left, right) in keys:
+                indices.extend(positions)
+        return indices
+
+
+class GlyphIndex(ABC):
+    """
+    A reverse index of references between the glyphs of a font, e.g. from
+    metrics keys or components. For each referenced key, it holds the names of
+    the glyphs that refer to it.
+
+    The index is built on first use. Later, only the glyphs that were changed
+    since the last update are read again, so that references that were added
+    or removed in the meantime are picked up.
+    """
+
+    def __init__(self, font) -> None:
+        self.font = font
+        self.references: dict[str, set[Any]] = {}
+        self.dependents: dict[Any, set[str]] = {}
+        self.stamps: dict[str, Any] = {}
+
+    @abstractmethod
+    def referencesOf(self, glyph) -> set[Any]:
+        """
+        Return the keys that the glyph refers to.
+        """
+
+    def update(self) -> None:
+        """
+        Read the references of all glyphs that were changed since the last
+        update.
+        """
+        seen = set()
+        for glyph in self.font.glyphs:
+            name = glyph.name
+            seen.add(name)
+            stamp = glyph.lastChange
+            if name in self.stamps and self.stamps[name] == stamp:
+                continue
+            self.stamps[name] = stamp
+            self.setReferences(name, self.referencesOf(glyph))
+        for name in [name for name in self.stamps if name not in seen]:
+            # The glyph was deleted or renamed
+            del self.stamps[name]
+            self.setReferences(name, set())
+
+    def setReferences(self, name: str, references: set[Any]) -> None:
+        old = self.references.get(name, set())
+        for reference in old - references:
+            self.dependents[reference].discard(name)
+        for reference in references - old:
+            self.dependents.setdefault(reference, set()).add(name)
+        if references:
+            self.references[name] = references
+        else:
+            self.references.pop(name, None)
+
+
+def dependencyOrder(names, dependentsOf, referencesOf) -> list[str]:
+    """
+    Return the names of all glyphs that depend directly or indirectly on the
+    given glyphs, sorted so that each glyph comes after all glyphs it refers
+    to. Glyphs with circular references are left out.
+    """
+    found = set()
+    stack = list(names)
+    while stack:
+        for dependent in dependentsOf(stack.pop()):
+            if dependent not in found and dependent not in names:
+                found.add(dependent)
+                stack.append(dependent)
+
+    waiting = {
+        name: sum(1 for reference in referencesOf(name) if reference in found)
+        for name in found
+    }
+    ready = sorted(name for name, count in waiting.items() if count == 0)
+    order = []
+    while ready:
+        name = ready.pop()
+        order.append(name)
+        for dependent in dependentsOf(name):
+            if dependent in waiting:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+    return order
+
+
+class MetricsIndex(GlyphIndex):
+    """
+    The glyphs whose LSB, RSB or width keys refer to each glyph.
+    """
+
+    def referencesOf(self, glyph) -> set[str]:
+        return metricsKeyReferences(glyph)
+
+    def dependentsOf(self, names: set[str]) -> list[str]:
+        """
+        Return the names of all glyphs that depend directly or indirectly on
+        the given glyphs, in the order in which their metrics must be updated.
+        """
+        return dependencyOrder(
+            names,
+            lambda name: self.dependents.get(name, ()),
+            lambda name: self.references.get(name, ()),
+        )
+
+
+class ComponentIndex(GlyphIndex):
+    """
+    The composite glyphs that use each glyph as a component, per master. The
+    keys are tuples of master id and glyph name.
+    """
+
+    def referencesOf(self, glyph) -> set[tuple[str, str]]:
+        return componentReferences(glyph)
+
+    def compositesOf(self, masterId: str, names: set[str]) -> list[str]:
+        """
+        Return the names of all glyphs that use the given glyphs as
+        components in the master, directly or nested, with the bases before
+        the composites.
+        """
+        return dependencyOrder(
+            names,
+            lambda name: self.dependents.get((masterId, name), ()),
+            lambda name: [
+                base for m, base in self.references.get(name, ()) if m == masterId
+            ],
+        )
+
+
+class KerningGroupIndex(GlyphIndex):
+    """
+    The glyphs in each kerning group. The keys are the group keys of
+    font.kerning, e.g. "@MMK_L_T" for the glyphs whose right side is in the
+    group T, which are on the first side of a pair.
+    """
+
+    def referencesOf(self, glyph) -> set[str]:
+        groups = set()
+        if glyph.rightKerningGroup:
+            groups.add("@MMK_L_" + glyph.rightKerningGroup)
+        if glyph.leftKerningGroup:
+            groups.add("@MMK_R_" + glyph.leftKerningGroup)
+        return groups
+
+
+class RenderCache:
+    """
+    Drawing resources that are created once and reused for every frame, so
+    that drawing handles and labels doesn't allocate Objective-C objects while
+    hovering or dragging. Resources that depend on the appearance (dark or
+    light mode) are rebuilt when it changes.
+    """
+
+    def __init__(self, colorOuter, colorInner) -> None:
+        self.gradient = NSGradient.alloc().initWithStartingColor_endingColor_(
+            colorOuter, colorInner
+        )
+        self.transform = NSAffineTransform.transform()
+        self.font = NSFont.monospacedDigitSystemFontOfSize_weight_(
+            LABEL_TEXT_SIZE, NSFontWeightRegular
+        )
+        self.appearance = None
+        self.colorLabel = None
+        self.colorBox = None
+        self.attrs = None
+        self.labels: OrderedDict[str, tuple[Any, float, float, Any]] = OrderedDict()
+
+    def update(self, appearance) -> None:
+        """
+        Rebuild the appearance-dependent resources if the appearance has
+        changed.
+        """
+        if appearance == self.appearance and self.attrs is not None:
+            return
+
+        self.appearance = appearance
+        self.colorLabel = NSColor.textColor()
+        self.colorBox = NSColor.textBackgroundColor()
+        self.attrs = NSDictionary.dictionaryWithDictionary_(
+            {
+                NSFontAttributeName: self.font,
+                NSForegroundColorAttributeName: self.colorLabel,
+            }
+        )
+        self.labels.clear()
+
+    def label(self, text: str) -> tuple[Any, float, float, Any]:
+        """
+        Return the string object, width, height and background path for a
+        label text. The least recently used labels are evicted when the cache
+        is full.
+        """
+        entry = self.labels.get(text)
+        if entry is not None:
+            self.labels.move_to_end(text)
+            return entry
+
+        string = NSString.stringWithString_(text)
+        bbox = string.sizeWithAttributes_(self.attrs)
+        bw = bbox.width
+        bh = bbox.height
+        box = NSBezierPath.bezierPathWithRoundedRect_xRadius_yRadius_(
+            NSRect(origin=(-2, -1), size=(bw + 4, bh + 2)), 4, 4
+        )
+        entry = (string, bw, bh, box)
+        self.labels[text] = entry
+        if len(self.labels) > LABEL_CACHE_SIZE:
+            self.labels.popitem(last=False)
+        return entry
+
+    def concat(self, scale: float, x: float, y: float) -> None:
+        """
+        Scale and translate the current graphics context, reusing the cached
+        transform object.
+        """
+        self.transform.setTransformStruct_((scale, 0.0, 0.0, scale, x, y))
+        self.transform.concat()
+
+
+class KerningOverlay:
+    """
+    The kerning pairs of the layers on the visible lines of the Edit view, by
+    layer position, and their values by master and pair key. The pairs are
+    found in one pass per layout, and the keys and values are kept until the
+    font changes.
+    """
+
+    def __init__(self) -> None:
+        # Rounded layer origin -> (masterId, left key, right key, descender)
+        self.pairs: dict[tuple[float, float], tuple | None] = {}
+        self.values: dict[tuple[str, str, str], float | None] = {}
+        # (masterId, glyph name, glyph name) -> (masterId, left key, right key)
+        self.keys: dict[tuple[str, str, str], tuple[str, str, str]] = {}
+        # Line -> sorted x positions of the dragged pairs before the drag
+        self.dragged: dict[float, list[float]] = {}
+        # The range of lines that the pairs were found for
+        self.bottom = 0.0
+        self.top = -1.0
+
+    def clear(self) -> None:
+        self.clearPairs()
+        self.keys.clear()
+        self.values.clear()
+
+    def clearPairs(self) -> None:
+        self.pairs.clear()
+        self.dragged.clear()
+        self.bottom = 0.0
+        self.top = -1.0
+
+    def startDrag(self, keys: set[tuple[str, str, str]]) -> None:
+        """
+        Remember where the pairs with the dragged keys are, because the layers
+        after them move while the kerning is dragged.
+        """
+        self.dragged = {}
+        for (x, y), entry in self.pairs.items():
+            if entry is not None and entry[:3] in keys:
+                self.dragged.setdefault(y, []).append(x)
+        for xs in self.dragged.values():
+            xs.sort()
+
+    def pairDuringDrag(self, x: float, y: float, shift: float) -> tuple | None:
+        """
+        Return the pair of a layer while the dragged pairs have moved the
+        layers after them by shift each.
+        """
+        count = 0
+        for i, x0 in enumerate(self.dragged.get(round(y, 1), ()), 1):
+            if x < x0 + i * shift - 0.05:
+                break
+            count = i
+        return self.pair(x - count * shift, y)
+
+    def build(self, font, layers, positions, direction=GSLTR, extend=False) -> None:
+        """
+        Find the pairs and values for the layers at the given positions, which
+        are (index, origin) tuples. If extend is True, they are added to the
+        pairs that were found before.
+        """
+        pairs = self.pairs if extend else {}
+        keys = self.keys
+        values = self.values
+        for index, origin in positions:
+            position = (round(origin.x, 1), round(origin.y, 1))
+            # Layers without a pair are remembered as None
+            pairs[position] = None
+            if index == 0:
+                continue
+            layer1 = layers[index - 1]
+            layer2 = layers[index]
+            glyph1 = layer1.parent
+            glyph2 = layer2.parent
+            if glyph1 is None or glyph2 is None:
+                continue
+            master = layer2.master
+            if master is None or layer1.master != master:
+                continue
+            # The same glyph pair often occurs more than once
+            pair = (master.id, glyph1.name, glyph2.name)
+            key = keys.get(pair)
+            if key is None:
+                left, right, value = resolveKerningPair(
+                    font, master.id, glyph1, glyph2, direction
+                )
+                key = keys[pair] = (master.id, left, right)
+                values[key] = value
+            pairs[position] = key + (master.descender,)
+        self.pairs = pairs
+
+    def pair(self, x: float, y: float) -> tuple | None:
+        return self.pairs.get((round(x, 1), round(y, 1)))
+
+
+class DragSession:
+    """
+    The state of one drag operation. The mouse movement is collected in
+    memory and written to the font at most once per display frame, because
+    every write makes Glyphs invalidate the kerning and lay out the line again.
+
+    The movement is accumulated as an exact offset from the value at mouse
+    down, so that slow drags and precision mode don't lose the fractions that
+    would be rounded away on every single event. The font is only written to
+    when the rounded value actually changes.
+
+    In preview mode, the font is not modified at all during the drag. The
+    value is only shown as an overlay, and written to the font on mouse up.
+    When kerning, the occurrences are the origins of the layers where the
+    dragged pair applies in the text, and the lines are the rects of the lines
+    that contain them, which are the only parts of the view that change.
+
+    When kerning, the targets hold the resolved key and original value of the
+    pair in each master that is kerned, so that the keys are only looked up
+    once per drag. When spacing several glyphs at once, they hold each layer
+    with its original metric and width. The snapshot holds their undo
+    information.
+
+    When snapping is on, the candidates are the sorted values of the pairs that
+    are related to the dragged pair, or the suggested value of the dragged
+    sidebearing. A value within the tolerance of one of them snaps to it.
+
+    The dependents are the layers whose metrics keys refer to the dragged
+    layers and that are visible in the Edit view, or needed to update a
+    visible one. They are updated with every write. The deferred dependents
+    are only updated on mouse up. In the same way, the composites that use the
+    dragged layers as their base are updated on mouse up, and the live
+    composites also with every write.
+
+    When kerning, the gap is the smallest distance between the outlines of the
+    pair without kerning, once their side profiles are available. The
+    instances hold the instance names, the index of each master, the weight
+    matrix and the value of the pair in each master at mouse down.
+    """
+
+    __slots__ = (
+        "candidates",
+        "composites",
+        "deferred",
+        "dependents",
+        "gap",
+        "instances",
+        "interval",
+        "lines",
+        "lastWrite",
+        "liveComposites",
+        "mode",
+        "occurrences",
+        "offset",
+        "origin",
+        "preview",
+        "scheduled",
+        "snapshot",
+        "step",
+        "targets",
+        "tolerance",
+        "written",
+    )
+
+    def __init__(
+        self, mode: str, origin: float, interval: float, preview: bool = False
+    ) -> None:
+        self.mode = mode
+        self.origin = origin
+        self.interval = interval
+        self.preview = preview
+        self.candidates: list[float] = []
+        self.composites: list[tuple[Any, Any, bool]] = []
+        self.deferred: list[Any] = []
+        self.dependents: list[Any] = []
+        self.gap: float | None = None
+        self.instances: tuple | None = None
+        self.lastWrite = 0.0
+        self.lines: list[NSRect] = []
+        self.occurrences: set[tuple[float, float]] = set()
+        self.liveComposites: list[tuple[Any, Any, bool]] = []
+        self.offset = 0.0
+        self.scheduled = False
+        self.snapshot: list[tuple] = []
+        self.step = 1
+        self.targets: list[tuple] = []
+        self.tolerance = 0.0
+        self.written = origin
+
+    def add(self, delta: float, step: int) -> None:
+        """
+        Add the mouse movement in font units to the offset.
+        """
+        self.offset += delta
+        self.step = step
+
+    def value(self) -> float:
+        """
+        Return the value that the dragged metric or kerning pair should have.
+        Kerning is rounded to the current step, metrics to whole units.
+        """
+        return self.valueFor(self.origin)
+
+    def valueFor(self, origin: float) -> float:
+        """
+        Return the value for a metric or kerning pair that had the given value
+        at mouse down.
+        """
+        if self.mode == "kern":
+            if self.candidates:
+                value = self.snap(self.origin + self.offset)
+                if value is not None:
+                    # Other masters are changed by the same amount
+                    return origin + value - self.origin
+            step = self.step
+            return int(round((origin + self.offset) / step) * step)
+        if self.candidates:
+            value = self.snap(self.origin + self.offset)
+            if value is not None:
+                # Other glyphs are changed by the same amount
+                return origin + value - self.origin
+        return origin + int(round(self.offset))
+
+    def snap(self, value: float) -> float | None:
+        """
+        Return the candidate nearest to the value if it is within the
+        tolerance.
+        """
+        candidates = self.candidates
+        i = bisect_left(candidates, value)
+        nearest = None
+        for candidate in candidates[max(0, i - 1) : i + 1]:
+            if nearest is None or abs(candidate - value) < abs(nearest - value):
+                nearest = candidate
+        if nearest is not None and abs(nearest - value) <= self.tolerance:
+            return nearest
+        return None
+
+    def hasPending(self) -> bool:
+        """
+        Return True if the value differs from the last written value.
+        """
+        return self.value() != self.written
+
+    def shift(self) -> float:
+        """
+        Return the difference between the current value and the value at mouse
+        down.
+        """
+        return self.value() - self.origin
+
+    def isDue(self) -> bool:
+        """
+        Return True if enough time has passed since the last write to the font.
+        """
+        return monotonic() - self.lastWrite >= self.interval
+
+    def take(self) -> float:
+        """
+        Return the value and mark it as written.
+        """
+        self.written = self.value()
+        self.lastWrite = monotonic()
+        return self.written
+
+
+class Hover:
+    """
+    The sidebearing handle under the mouse pointer. It is resolved once per
+    mouse move, so the draw callback only has to compare the drawn layer and
+    its position to find out whether to draw the handle. The suggestion is the
+    x position of the suggested sidebearing in the view, if any.
+    """
+
+    __slots__ = ("layer", "layerIndex", "origin", "scale", "result", "suggestion")
+
+    def __init__(
+        self, layer, layerIndex, origin, scale, result, suggestion=None
+    ) -> None:
+        self.layer = layer
+        self.layerIndex = layerIndex
+        self.origin = (origin.x, origin.y)
+        self.scale = scale
+        self.result = result
+        self.suggestion = suggestion
+
+    def matches(self, layer, layerOrigin) -> bool:
+        """
+        Return True if the hovered handle belongs to the layer drawn at
+        layerOrigin. The same layer may appear more than once in the text, so
+        the origin must match as well.
+        """
+        return (
+            layer is self.layer
+            and layerOrigin.x == self.origin[0]
+            and layerOrigin.y == self.origin[1]
+        )
+
+    def isSameHandle(self, other: Hover | None) -> bool:
+        """
+        Return True if other shows the same handle, i.e. the view doesn't need
+        to be updated when the hover changes from self to other.
+        """
+        if other is None:
+            return False
+        return (
+            self.layer is other.layer
+            and self.origin == other.origin
+            and self.scale == other.scale
+            and self.result[0][0] == other.result[0][0]
+        )
+
+    def rect(self) -> NSRect:
+        """
+        Return the rect that is covered by the handle's gradient and the
+        suggestion, with some extra space for antialiasing.
+        """
+        metric, handle_x, _ = self.result
+        pos, w = handle_x
+        end = pos + w
+        if self.suggestion is not None:
+            pos = min(pos, self.suggestion)
+            end = max(end, self.suggestion + DRAGGING_HANDLE_WIDTH)
+        desc, asc = metric[3], metric[4]
+        return NSRect(
+            origin=(
+                pos - HANDLE_INVALIDATION_MARGIN,
+                desc - HANDLE_INVALIDATION_MARGIN,
+            ),
+            size=(
+                end - pos + 2 * HANDLE_INVALIDATION_MARGIN,
+                asc - desc + 2 * HANDLE_INVALIDATION_MARGIN,
+            ),
+        )
+
+
+class DragToKern(SelectTool):
+    @objc.python_method
+    def settings(self) -> None:
+        self.name = Glyphs.localize(
+            {
+                "en": "Mouse Kerning and Spacing",
+                "de": "Unterschneidung und Zurichtung per Maus",
+            }
+        )
+        self.keyboardShortcut = "k"
+        self.stdCursor = NSCursor.resizeLeftRightCursor()
+        self.lckCursor = NSCursor.operationNotAllowedCursor()
+        self.cursor = self.stdCursor
+        self.colorSBOuter = NSColor.colorWithCalibratedRed_green_blue_alpha_(
+            COLOR_R, COLOR_G, COLOR_B, COLOR_ALPHA
+        )
+        self.colorSBInner = NSColor.colorWithCalibratedRed_green_blue_alpha_(
+            COLOR_R, COLOR_G, COLOR_B, 0.0
+        )
+        self.colorPreview = NSColor.colorWithCalibratedRed_green_blue_alpha_(
+            COLOR_R, COLOR_G, COLOR_B, PREVIEW_ALPHA
+        )
+        self.render = RenderCache(self.colorSBOuter, self.colorSBInner)
+
+    def standardCursor(self):
+        return self.cursor
+
+    @objc.python_method
+    def start(self) -> None:
+        self.mode: str | None = None
+        self.mouse_position = (0, 0)
+        self.drag_start = None
+        self.direction = GSLTR
+        self.active_metric = None
+        self.orig_value = None
+        self.handle_x = None
+        self.width = None
+        self.layer1 = None
+        self.layer2 = None
+        self.kerningPair: tuple[str, str] | None = None
+        self.hover: Hover | None = None
+        self.session: DragSession | None = None
+        self.drawMeasurements = Glyphs.defaults[
+            "com.lucasfonts.DragToKern.measurements"
+        ]
+        if self.drawMeasurements is None:
+            self.drawMeasurements = False
+        self.previewDrag = bool(Glyphs.defaults["com.lucasfonts.DragToKern.preview"])
+        self.spacingScope = Glyphs.defaults["com.lucasfonts.DragToKern.spacingScope"]
+        if self.spacingScope not in SPACING_SCOPES:
+            self.spacingScope = "single"
+        self.excludedMasters: list[str] = list(
+            Glyphs.defaults["com.lucasfonts.DragToKern.excludedMasters"] or ()
+        )
+        self.profiler: Profiler | None = None
+        if Glyphs.defaults["com.lucasfonts.DragToKern.profiling"]:
+            self.profiler = Profiler()
+        self.layer2Origin = None
+        self.previewPath = None
+        self.lockedMasters: dict[str, bool] = {}
+        self.metricsIndex: MetricsIndex | None = None
+        self.componentIndex: ComponentIndex | None = None
+        self.liveComposites = bool(
+            Glyphs.defaults["com.lucasfonts.DragToKern.liveComposites"]
+        )
+        self.journals: dict[str, Journal] = {}
+        self.recorders: dict[Any, DeltaRecorder] = {}
+        self.kerningValueIndex: KerningValueIndex | None = None
+        self.snapKerning = bool(
+            Glyphs.defaults["com.lucasfonts.DragToKern.snapKerning"]
+        )
+        self.showKerning = bool(
+            Glyphs.defaults["com.lucasfonts.DragToKern.showKerning"]
+        )
+        self.kerningOverlay = KerningOverlay()
+        # The fontStamp() of the font that the cached values belong to
+        self.cacheStamp: tuple | None = None
+        self.suggestSpacing = bool(
+            Glyphs.defaults["com.lucasfonts.DragToKern.suggestSpacing"]
+        )
+        self.sidebearingSuggestions = SidebearingSuggestions()
+        self.showGap = bool(Glyphs.defaults["com.lucasfonts.DragToKern.showGap"])
+        self.sideProfiles = SideProfiles()
+        self.showInstances = bool(
+            Glyphs.defaults["com.lucasfonts.DragToKern.showInstances"]
+        )
+        self.instanceWeights = InstanceWeights()
+        self.pairIndex = PairIndex()
+        self.kerningGroupIndex: KerningGroupIndex | None = None
+        # Pairs that the tool has changed and that are redundant, by font
+        self.redundantPairs: dict[Any, set[tuple[str, str, str]]] = {}
+        self.journalSyncScheduled = False
+        # Fonts can be saved while another tool is active
+        Glyphs.addCallback(self.documentWasSaved, DOCUMENTWASSAVED)
+
+    @objc.python_method
+    def activate(self) -> None:
+        Glyphs.addCallback(self.mouseDidMove, MOUSEMOVED)
+        Glyphs.addCallback(self.fontDidChange, DOCUMENTACTIVATED)
+        Glyphs.addCallback(self.interfaceDidUpdate, UPDATEINTERFACE)
+        self.updateLockedMasters()
+        if Glyphs.font is not None:
+            self.componentIndexForFont(Glyphs.font)
+        if self.showGap:
+            self.prefetchSideProfiles()
+        self.drawMeasurements = Glyphs.defaults[
+            "com.lucasfonts.DragToKern.measurements"
+        ]
+        self.previewDrag = bool(Glyphs.defaults["com.lucasfonts.DragToKern.preview"])
+
+    @objc.python_method
+    def deactivate(self) -> None:
+        Glyphs.removeCallback(self.mouseDidMove, MOUSEMOVED)
+        Glyphs.removeCallback(self.fontDidChange, DOCUMENTACTIVATED)
+        Glyphs.removeCallback(self.interfaceDidUpdate, UPDATEINTERFACE)
+        self.checkRedundantPairs()
+        self.sideProfiles.shutdown()
+        Glyphs.defaults["com.lucasfonts.DragToKern.measurements"] = (
+            self.drawMeasurements
+        )
+        Glyphs.defaults["com.lucasfonts.DragToKern.preview"] = self.previewDrag
+        Glyphs.defaults["com.lucasfonts.DragToKern.profiling"] = (
+            self.profiler is not None
+        )
+        Glyphs.defaults["com.lucasfonts.DragToKern.spacingScope"] = self.spacingScope
+        Glyphs.defaults["com.lucasfonts.DragToKern.liveComposites"] = (
+            self.liveComposites
+        )
+        Glyphs.defaults["com.lucasfonts.DragToKern.snapKerning"] = self.snapKerning
+        Glyphs.defaults["com.lucasfonts.DragToKern.showKerning"] = self.showKerning
+        Glyphs.defaults["com.lucasfonts.DragToKern.suggestSpacing"] = (
+            self.suggestSpacing
+        )
+        Glyphs.defaults["com.lucasfonts.DragToKern.showGap"] = self.showGap
+        Glyphs.defaults["com.lucasfonts.DragToKern.showInstances"] = self.showInstances
+        Glyphs.defaults["com.lucasfonts.DragToKern.excludedMasters"] = (
+            self.excludedMasters
+        )
+
+    @objc.python_method
+    def fontDidChange(self, notification) -> None:
+        """
+        Forget the cached master states and kerning values when another
+        document is activated.
+        """
+        self.forgetFontCaches()
+        self.kerningValueIndex = None
+        self.cacheStamp = None
+
+    @objc.python_method
+    def interfaceDidUpdate(self, notification) -> None:
+        """
+        Find the kerning pairs of the visible layers again after the layout
+        has changed. Their keys and values are kept, unless the masters or the
+        kerning of the font were changed outside of the tool, e.g. in Font
+        Info. Edits elsewhere that only change the value of a pair are picked
+        up when the document is activated again.
+        """
+        if self.session is not None:
+            # Our own modifications trigger interface updates, the overlay
+            # follows the drag by itself
+            return
+        self.kerningOverlay.clearPairs()
+        font = Glyphs.font
+        if font is None:
+            return
+        stamp = fontStamp(font)
+        if stamp != self.cacheStamp:
+            if self.cacheStamp is not None:
+                self.forgetFontCaches()
+            self.cacheStamp = stamp
+
+    @objc.python_method
+    def forgetFontCaches(self) -> None:
+        # The value index checks by itself whether it is still valid
+        self.lockedMasters.clear()
+        self.kerningOverlay.clear()
+
+    @objc.python_method
+    def documentWasSaved(self, notification) -> None:
+        """
+        Empty the journal of a font when it was saved.
+        """
+        document = notification.object()
+        path = journalPath(getattr(document, "font", None))
+        if path is None:
+            return
+        journal = self.journals.pop(path, None) or Journal(path)
+        try:
+            journal.truncate()
+        except OSError as e:
+            Glyphs.showNotification(
+                "Mouse Kerning and Spacing",
+                "Can't remove the journal %s: %s" % (path, e),
+            )
+
+    @objc.python_method
+    def journalForFont(self, font) -> Journal | None:
+        path = journalPath(font)
+        if path is None:
+            return None
+        journal = self.journals.get(path)
+        if journal is None:
+            journal = self.journals[path] = Journal(path)
+        return journal
+
+    @objc.python_method
+    def writeJournal(self, font, snapshot: list[tuple]) -> None:
+        """
+        Append the current values of everything in the snapshot to the font's
+        journal.
+        """
+        journal = self.journalForFont(font)
+        if journal is None or not snapshot:
+            return
+        try:
+            journal.append(journalEdits(snapshot))
+            if journal.isDue():
+                journal.sync()
+            elif not self.journalSyncScheduled:
+                self.journalSyncScheduled = True
+                self.performSelector_withObject_afterDelay_(
+                    "syncJournals:", None, JOURNAL_SYNC_INTERVAL
+                )
+        except OSError as e:
+            Glyphs.showNotification(
+                "Mouse Kerning and Spacing",
+                "Can't write the journal %s: %s" % (journal.path, e),
+            )
+            self.journals.pop(journal.path, None)
+
+    @objc.python_method
+    def recordSession(self) -> None:
+        """
+        Add the pairs or layers of the finished drag to the font's delta
+        recorder, with their values at mouse down.
+        """
+        session = self.session
+        font = self.layer2.parent.parent
+        recorder = self.recorders.get(font)
+        if recorder is None:
+            recorder = self.recorders[font] = DeltaRecorder(font)
+        if session.mode == "kern":
+            if self.direction != GSLTR:
+                # Only left-to-right kerning is exported
+                return
+            values = {
+                entry[2:5]: entry[-1]
+                for entry in session.snapshot
+                if entry[0] == "kern"
+            }
+            glyph1 = self.layer1.parent.name
+            glyph2 = self.layer2.parent.name
+            for masterId, left, right, origin in session.targets:
+                recorder.addKerning(
+                    masterId,
+                    left,
+                    right,
+                    values.get((masterId, left, right)),
+                    origin,
+                    glyph1,
+                    glyph2,
+                )
+            return
+
+        if session.targets:
+            metrics = {
+                entry[1]: entry[2:]
+                for entry in session.snapshot
+                if entry[0] == "metrics"
+            }
+            for layer, _, _ in session.targets:
+                lsb, width = metrics[layer]
+                recorder.addMetrics(
+                    layer.associatedMasterId, layer.parent.name, lsb, width
+                )
+            return
+
+        layer = self.layer2
+        shift = session.shift()
+        if session.mode == "move":
+            lsb, width = layer.LSB - shift, layer.width
+        elif session.mode == "LSB":
+            lsb, width = layer.LSB - shift, layer.width - shift
+        else:
+            lsb, width = layer.LSB, layer.width - shift
+        recorder.addMetrics(layer.associatedMasterId, layer.parent.name, lsb, width)
+
+    def exportDeltas_(self, sender=None) -> None:
+        """
+        Save the changes recorded in the current font to a delta file.
+        """
+        font = Glyphs.font
+        recorder = self.recorders.get(font)
+        if not recorder:
+            return
+        path = GetSaveFile(
+            message="Export Kerning and Spacing Changes",
+            ProposedFileName="DragToKern-changes.json",
+            filetypes=["json"],
+        )
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(recorder.export(), f, separators=(",", ":"))
+
+    def applyDeltaFile_(self, sender=None) -> None:
+        """
+        Apply the changes from a delta file to the current font.
+        """
+        font = Glyphs.font
+        if font is None:
+            return
+        path = GetOpenFile(
+            message="Apply Kerning and Spacing Changes",
+            filetypes=["json"],
+        )
+        if path:
+            try:
+                self.applyDeltas(font, path)
+            except (OSError, ValueError) as e:
+                Glyphs.showNotification(
+                    "Mouse Kerning and Spacing",
+                    "Can't apply the changes from %s: %s" % (os.path.basename(path), e),
+                )
+                return
+            Glyphs.redraw()
+
+    @objc.python_method
+    def applyDeltas(self, font, path: str) -> int:
+        """
+        Apply the changes from a delta file to the font as one change with one
+        undo step. Returns the number of operations that were applied. Raises
+        ValueError if the file is not a valid delta file.
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        try:
+            # Read the whole file before anything in the font is changed
+            operations = list(deltaOperations(font, data))
+        except (AttributeError, IndexError, KeyError, TypeError) as e:
+            raise ValueError("Not a valid delta file") from e
+        return self.applyOperations(font, operations)
+
+    def syncJournals_(self, sender) -> None:
+        self.journalSyncScheduled = False
+        for path, journal in list(self.journals.items()):
+            try:
+                journal.sync()
+            except OSError as e:
+                Glyphs.showNotification(
+                    "Mouse Kerning and Spacing",
+                    "Can't write the journal %s: %s" % (path, e),
+                )
+                self.journals.pop(path, None)
+
+    def replayJournal_(self, sender=None) -> None:
+        """
+        Apply the edits from the journal of the current font as one change.
+        """
+        font = Glyphs.font
+        journal = self.journalForFont(font)
+        if journal is None:
+            return
+        inverse = []
+        undoManager = font.undoManager()
+        undoManager.beginUndoGrouping()
+        font.disableUpdateInterface()
+        try:
+            for record in journal.records():
+                inverse.extend(restoreSnapshot(journalSnapshot(font, record)))
+        finally:
+            font.enableUpdateInterface()
+            if inverse:
+                undoManager.registerUndoWithTarget_selector_object_(
+                    self, "restoreSnapshot:", inverse
+                )
+                undoManager.setActionName_("Replay Unsaved Edits")
+            undoManager.endUndoGrouping()
+        journal.pending = False
+        Glyphs.redraw()
+
+    @objc.python_method
+    def updateLockedMasters(self) -> None:
+        """
+        Fill the cache of master lock states for the current font.
+        """
+        self.lockedMasters.clear()
+        font = Glyphs.font
+        if font is None:
+            return
+        for master in font.masters:
+            self.lockedMasters[master.id] = masterMetricsAreLocked(master)
+
+    @objc.python_method
+    def conditionalContextMenus(self) -> list[dict[str, Any]]:
+        menus = []
+        evc = self.editViewController()
+        gv = None if evc is None else evc.graphicView()
+        if self.drawMeasurements:
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Hide Measurements While Spacing",
+                        }
+                    ),
+                    "action": self.toggleMeasurements_,
+                }
+            )
+        else:
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Show Measurements While Spacing",
+                        }
+                    ),
+                    "action": self.toggleMeasurements_,
+                }
+            )
+        for scope, name, action in (
+            ("single", "Space Only the Dragged Glyph", self.spaceSingleGlyph_),
+            ("selection", "Space Selected Glyphs Together", self.spaceSelection_),
+            ("group", "Space Kerning Group Together", self.spaceKerningGroup_),
+        ):
+            if gv is not None and self.doSpacing(gv) and scope != self.spacingScope:
+                menus.append(
+                    {
+                        "name": Glyphs.localize({"en": name}),
+                        "action": action,
+                    }
+                )
+        if gv is not None and self.doSpacing(gv):
+            if self.liveComposites:
+                name = "Update Composites on Mouse Up"
+            else:
+                name = "Update Composites While Dragging"
+            menus.append(
+                {
+                    "name": Glyphs.localize({"en": name}),
+                    "action": self.toggleLiveComposites_,
+                }
+            )
+            if self.suggestSpacing:
+                name = "Hide Optical Sidebearing Suggestions"
+            else:
+                name = "Show Optical Sidebearing Suggestions"
+            menus.append(
+                {
+                    "name": Glyphs.localize({"en": name}),
+                    "action": self.toggleSpacingSuggestions_,
+                }
+            )
+        if gv is not None and self.doKerning(gv):
+            if self.showKerning:
+                name = "Hide Kerning Values"
+            else:
+                name = "Show Kerning Values"
+            menus.append(
+                {
+                    "name": Glyphs.localize({"en": name}),
+                    "action": self.toggleKerningValues_,
+                }
+            )
+            if self.showGap:
+                name = "Hide Gap While Kerning"
+            else:
+                name = "Show Gap While Kerning"
+            menus.append(
+                {
+                    "name": Glyphs.localize({"en": name}),
+                    "action": self.toggleGap_,
+                }
+            )
+            if self.showInstances:
+                name = "Hide Kerning in Instances"
+            else:
+                name = "Show Kerning in Instances"
+            menus.append(
+                {
+                    "name": Glyphs.localize({"en": name}),
+                    "action": self.toggleInstances_,
+                }
+            )
+            count = len(self.redundantPairs.get(Glyphs.font) or ())
+            if count:
+                menus.append(
+                    {
+                        "name": Glyphs.localize(
+                            {
+                                "en": "Remove Redundant Kerning Pairs Made by Dragging (%i)"
+                                % count,
+                            }
+                        ),
+                        "action": self.pruneSessionKerning_,
+                    }
+                )
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Remove Redundant Kerning Pairs in Font",
+                        }
+                    ),
+                    "action": self.pruneFontKerning_,
+                }
+            )
+            if self.snapKerning:
+                name = "Don’t Snap Kerning to Related Values"
+            else:
+                name = "Snap Kerning to Related Values"
+            menus.append(
+                {
+                    "name": Glyphs.localize({"en": name}),
+                    "action": self.toggleSnapKerning_,
+                }
+            )
+        master = self.currentMaster()
+        if master is not None and self.doKerning(gv):
+            if master.name in self.excludedMasters:
+                menus.append(
+                    {
+                        "name": Glyphs.localize(
+                            {
+                                "en": "Include “%s” in Multi-Master Kerning"
+                                % master.name,
+                            }
+                        ),
+                        "action": self.toggleMasterExclusion_,
+                    }
+                )
+            else:
+                menus.append(
+                    {
+                        "name": Glyphs.localize(
+                            {
+                                "en": "Exclude “%s” from Multi-Master Kerning"
+                                % master.name,
+                            }
+                        ),
+                        "action": self.toggleMasterExclusion_,
+                    }
+                )
+        journal = self.journalForFont(Glyphs.font)
+        if journal is not None and journal.pending:
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Replay Unsaved Edits",
+                        }
+                    ),
+                    "action": self.replayJournal_,
+                }
+            )
+        if self.recorders.get(Glyphs.font):
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Export Kerning and Spacing Changes…",
+                        }
+                    ),
+                    "action": self.exportDeltas_,
+                }
+            )
+        menus.append(
+            {
+                "name": Glyphs.localize(
+                    {
+                        "en": "Apply Kerning and Spacing Changes…",
+                    }
+                ),
+                "action": self.applyDeltaFile_,
+            }
+        )
+        if self.profiler is None:
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Start Profiling",
+                        }
+                    ),
+                    "action": self.toggleProfiling_,
+                }
+            )
+        else:
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Stop Profiling",
+                        }
+                    ),
+                    "action": self.toggleProfiling_,
+                }
+            )
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Save Profile…",
+                        }
+                    ),
+                    "action": self.saveProfile_,
+                }
+            )
+        if self.previewDrag:
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Apply Changes While Dragging",
+                        }
+                    ),
+                    "action": self.togglePreview_,
+                }
+            )
+        else:
+            menus.append(
+                {
+                    "name": Glyphs.localize(
+                        {
+                            "en": "Preview Changes While Dragging",
+                        }
+                    ),
+                    "action": self.togglePreview_,
+                }
+            )
+        return menus
+
+    def toggleMeasurements_(self, sender=None) -> None:
+        self.drawMeasurements = not self.drawMeasurements
+
+    def togglePreview_(self, sender=None) -> None:
+        self.previewDrag = not self.previewDrag
+
+    def spaceSingleGlyph_(self, sender=None) -> None:
+        self.spacingScope = "single"
+
+    def spaceSelection_(self, sender=None) -> None:
+        self.spacingScope = "selection"
+
+    def spaceKerningGroup_(self, sender=None) -> None:
+        self.spacingScope = "group"
+
+    def toggleKerningValues_(self, sender=None) -> None:
+        self.showKerning = not self.showKerning
+
+    def toggleSnapKerning_(self, sender=None) -> None:
+        self.snapKerning = not self.snapKerning
+
+    def toggleLiveComposites_(self, sender=None) -> None:
+        self.liveComposites = not self.liveComposites
+
+    def toggleSpacingSuggestions_(self, sender=None) -> None:
+        self.suggestSpacing = not self.suggestSpacing
+
+    def toggleGap_(self, sender=None) -> None:
+        self.showGap = not self.showGap
+        if self.showGap:
+            self.prefetchSideProfiles()
+        else:
+            self.sideProfiles.shutdown()
+
+    def toggleInstances_(self, sender=None) -> None:
+        self.showInstances = not self.showInstances
+
+    def pruneSessionKerning_(self, sender=None) -> None:
+        font = Glyphs.font
+        pairs = self.redundantPairs.pop(font, None)
+        if font is None or not pairs:
+            return
+        self.pruneKerning(font, sorted(pairs))
+
+    def pruneFontKerning_(self, sender=None) -> None:
+        font = Glyphs.font
+        if font is None:
+            return
+        count = self.pruneKerning(font, kerningPairs(font))
+        self.redundantPairs.pop(font, None)
+        Glyphs.showNotification(
+            "Mouse Kerning and Spacing",
+            "Removed %i redundant kerning pairs." % count,
+        )
+
+    @objc.python_method
+    def kerningGroupIndexForFont(self, font) -> KerningGroupIndex:
+        """
+        Return the up-to-date kerning group index of the font.
+        """
+        index = self.kerningGroupIndex
+        if index is None or index.font is not font:
+            index = self.kerningGroupIndex = KerningGroupIndex(font)
+        index.update()
+        return index
 
-    def standardCursor(self):
-        return self.cursor
+    @objc.python_method
+    def noteRedundantPairs(self, font, snapshot: list[tuple]) -> None:
+        """
+        Remember which of the kerning pairs in the snapshot of a committed
+        change are redundant now, e.g. because a drag ended at 0 or an
+        exception has the same value as its group pair.
+        """
+        pairs = {
+            entry[2:5] for entry in snapshot if entry[0] == "kern" and entry[5] == GSLTR
+        }
+        if not pairs:
+            return
+        index = self.kerningGroupIndexForFont(font)
+        redundant = self.redundantPairs.setdefault(font, set())
+        for pair in pairs:
+            if isRedundantPair(font, index, *pair):
+                redundant.add(pair)
+            else:
+                redundant.discard(pair)
 
     @objc.python_method
-    def start(self) -> None:
-        self.mode: str | None = None
-        self.mouse_position = (0, 0)
-        self.drag_start = None
-        self.direction = GSLTR
-        self.active_metric = None
-        self.orig_value = None
-        self.handle_x = None
-        self.width = None
-        self.layer1 = None
-        self.layer2 = None
-        self.drawMeasurements = Glyphs.defaults[
-            "com.lucasfonts.DragToKern.measurements"
-        ]
-        if self.drawMeasurements is None:
-            self.drawMeasurements = False
+    def checkRedundantPairs(self) -> None:
+        """
+        Forget the remembered redundant pairs that were changed since, or
+        whose font was closed.
+        """
+        for font in list(self.redundantPairs):
+            if font not in Glyphs.fonts:
+                del self.redundantPairs[font]
+                continue
+            index = self.kerningGroupIndexForFont(font)
+            pairs = self.redundantPairs[font]
+            for pair in [p for p in pairs if not isRedundantPair(font, index, *p)]:
+                pairs.discard(pair)
 
     @objc.python_method
-    def activate(self) -> None:
-        Glyphs.addCallback(self.mouseDidMove, MOUSEMOVED)
-        self.drawMeasurements = Glyphs.defaults[
-            "com.lucasfonts.DragToKern.measurements"
-        ]
+    def pruneKerning(self, font, pairs) -> int:
+        """
+        Remove those of the kerning pairs that are redundant, as one change
+        that can be undone in one step. Each pair is checked against the
+        kerning with the pairs before it already removed. Returns the number of
+        removed pairs.
+        """
+        index = self.kerningGroupIndexForFont(font)
+        snapshot = []
+        undoManager = font.undoManager()
+        undoManager.beginUndoGrouping()
+        font.disableUpdateInterface()
+        try:
+            for masterId, left, right in pairs:
+                if isRedundantPair(font, index, masterId, left, right):
+                    snapshot.append(snapshotKerning(font, masterId, left, right))
+                    font.removeKerningForPair(masterId, left, right)
+        finally:
+            font.enableUpdateInterface()
+            if snapshot:
+                undoManager.registerUndoWithTarget_selector_object_(
+                    self, "restoreSnapshot:", snapshot
+                )
+                undoManager.setActionName_("Remove Redundant Kerning")
+            undoManager.endUndoGrouping()
+        if snapshot:
+            self.updateKerningValueIndex(snapshot)
+            self.writeJournal(font, snapshot)
+            # The keys of the pairs in the Edit view may have changed
+            self.kerningOverlay.clear()
+        return len(snapshot)
 
     @objc.python_method
-    def deactivate(self) -> None:
-        Glyphs.removeCallback(self.mouseDidMove, MOUSEMOVED)
-        Glyphs.defaults["com.lucasfonts.DragToKern.measurements"] = (
-            self.drawMeasurements
+    def prefetchSideProfiles(self) -> None:
+        """
+        Start computing the side profiles of the layers on the visible lines of
+        the Edit view. The profiles of other layers are computed when one of
+        their pairs is dragged.
+        """
+        evc = self.editViewController()
+        if evc is None:
+            return
+        layers = evc.composedLayers
+        if not layers:
+            return
+        gv = evc.graphicView()
+        font = evc.representedObject()
+        # Include the lines whose glyphs reach into the visible part
+        margin = font.upm * gv.scale()
+        visible = gv.visibleRect()
+        bottom = visible.origin.y - margin
+        top = visible.origin.y + visible.size.height + margin
+        self.sideProfiles.prefetch(
+            layer
+            for index, layer in enumerate(layers)
+            if bottom <= gv.cachedPositionAtIndex_(index).y <= top
         )
 
+    def toggleMasterExclusion_(self, sender=None) -> None:
+        master = self.currentMaster()
+        if master is None:
+            return
+        if master.name in self.excludedMasters:
+            self.excludedMasters.remove(master.name)
+        else:
+            self.excludedMasters.append(master.name)
+
     @objc.python_method
-    def conditionalContextMenus(self) -> list[dict[str, Any]]:
-        if self.drawMeasurements:
-            return [
-                {
-                    "name": Glyphs.localize(
-                        {
-                            "en": "Hide Measurements While Spacing",
-                        }
-                    ),
-                    "action": self.toggleMeasurements_,
-                }
-            ]
-        return [
-            {
-                "name": Glyphs.localize(
-                    {
-                        "en": "Show Measurements While Spacing",
-                    }
-                ),
-                "action": self.toggleMeasurements_,
-            }
-        ]
+    def currentMaster(self):
+        """
+        Return the master that is shown in the current Edit view.
+        """
+        evc = self.editViewController()
+        if evc is None:
+            return None
+        font = evc.font
+        if font is None:
+            return None
+        return font.masters[evc.masterIndex]
 
-    def toggleMeasurements_(self, sender=None) -> None:
-        self.drawMeasurements = not self.drawMeasurements
+    def toggleProfiling_(self, sender=None) -> None:
+        if self.profiler is None:
+            self.profiler = Profiler()
+        else:
+            self.profiler = None
+
+    def saveProfile_(self, sender=None) -> None:
+        if self.profiler is None:
+            return
+        path = GetSaveFile(
+            message="Save Profile",
+            ProposedFileName="DragToKern-profile.json",
+            filetypes=["json"],
+        )
+        if path:
+            self.profiler.dump(path)
 
     @objc.python_method
     def doKerning(self, graphicView) -> bool:
@@ -183,7 +3032,8 @@ class DragToKern(SelectTool):
         return not graphicView.doKerning() and graphicView.doSpacing()
 
     def keyDown_(self, theEvent) -> None:
-        c = theEvent.characters()
+        # Option is used to apply the shortcut to the whole line
+        c = theEvent.charactersIgnoringModifiers()
         if c in ("a", "s", "d", "A", "S", "D"):
             # Get the mouse location and convert it to local coordinates
             evc = self.editViewController()
@@ -192,15 +3042,117 @@ class DragToKern(SelectTool):
             # Which layer is at the mouse click location?
             layerIndex = gv.layerIndexForPoint_(loc)
             composedLayers = evc.composedLayers
-            handleException(composedLayers, layerIndex, c, self.direction)
+            if self.session is not None and self.session.mode == "kern":
+                self.handleSessionException(composedLayers, layerIndex, c)
+                return
+            indices = self.exceptionRange(gv, composedLayers, layerIndex)
+            if indices is None:
+                handleException(composedLayers, layerIndex, c, self.direction)
+                if 0 < layerIndex < len(composedLayers):
+                    snapshot = self.exceptionSnapshot(composedLayers, [layerIndex])
+                    if snapshot:
+                        font = snapshotFont(snapshot)
+                        self.updateKerningValueIndex(snapshot)
+                        self.kerningOverlay.clear()
+                        self.writeJournal(font, snapshot)
+                        self.noteRedundantPairs(font, snapshot)
+            else:
+                self.handleRangeException(composedLayers, indices, c)
             return
 
         # Other keys are handled by the super class
         objc.super().keyDown_(theEvent)
 
     @objc.python_method
+    @profiled("mouseDidMove")
     def mouseDidMove(self, notification) -> None:
-        Glyphs.redraw()
+        previous = self.hover
+        self.updateHover()
+        hover = self.hover
+        if hover is None:
+            if previous is None:
+                return
+        elif hover.isSameHandle(previous):
+            return
+
+        # Only redraw the regions of the old and the new handle
+        evc = self.editViewController()
+        if evc is None:
+            return
+
+        gv = evc.graphicView()
+        for h in (previous, hover):
+            if h is not None:
+                gv.setNeedsDisplayInRect_(h.rect())
+
+    @objc.python_method
+    def updateHover(self) -> None:
+        """
+        Find the layer under the mouse pointer and check if the pointer is at
+        one of its sidebearing handles. Called once per mouse move instead of
+        once per drawn layer.
+        """
+        self.hover = None
+        if self.drag_start is not None:
+            return
+
+        evc = self.editViewController()
+        if evc is None:
+            return
+
+        gv = evc.graphicView()
+        if not self.doSpacing(gv):
+            return
+
+        theEvent = Glyphs.currentEvent()
+        if theEvent is None:
+            return
+
+        self.mouse_position = gv.convertPoint_fromView_(
+            theEvent.locationInWindow(), None
+        )
+        layerIndex = gv.layerIndexForPoint_(self.mouse_position)
+        if layerIndex > 0xFFFF:
+            return
+
+        layer = evc.composedLayers[layerIndex]
+        layerOrigin = gv.cachedPositionAtIndex_(layerIndex)
+        result = self.checkHandleLocation(self.mouse_position, gv, layer, layerOrigin)
+        if result is None:
+            return
+
+        suggestion = None
+        if self.suggestSpacing:
+            metric = result[0]
+            value = self.suggestSidebearing(layer, metric[0])
+            if value is not None:
+                suggestion = self.suggestionPosition(
+                    metric[0], value, metric[1], layer.width, layerOrigin.x, gv.scale()
+                )
+        self.hover = Hover(
+            layer, layerIndex, layerOrigin, gv.scale(), result, suggestion
+        )
+
+    @objc.python_method
+    @profiled("suggestSidebearing")
+    def suggestSidebearing(self, layer, metric: str) -> int | None:
+        """
+        Return the optically balanced value of the LSB or RSB of the layer.
+        """
+        return self.sidebearingSuggestions.suggest(layer, metric)
+
+    @objc.python_method
+    def suggestionPosition(
+        self, metric: str, value: float, current: float, width: float, x: float, scale
+    ) -> float:
+        """
+        Return the x position in the view where the edge of the layer drawn at
+        x would be if the metric had the suggested value instead of the current
+        one.
+        """
+        if metric == "LSB":
+            return x + (current - value) * scale
+        return x + (width - current + value) * scale
 
     def mouseDown_(self, theEvent) -> None:
         """
@@ -235,11 +3187,13 @@ class DragToKern(SelectTool):
         composedLayers = evc.composedLayers
         self.layer2 = composedLayers[layerIndex]
         layerOrigin = gv.cachedPositionAtIndex_(layerIndex)
+        self.layer2Origin = (layerOrigin.x, layerOrigin.y)
 
         # What should be modified? Kerning, LSB, RSB, or both SBs?
 
         spacing = self.doSpacing(gv)
         kerning = self.doKerning(gv)
+        allMasters = False
         if spacing:
             # Check if the click was at a sidebearing handle
             result = self.checkHandleLocation(loc, gv, self.layer2, layerOrigin)
@@ -251,6 +3205,10 @@ class DragToKern(SelectTool):
 
             if self.windowController().CommandKey():
                 self.mode = "move"
+                if self.layer2 is None:
+                    return
+                self.orig_value = self.layer2.LSB
+                self.width = self.layer2.width
             elif self.active_metric == "LSB":
                 self.mode = "LSB"
                 if self.layer2 is None:
@@ -272,9 +3230,65 @@ class DragToKern(SelectTool):
         elif kerning:
             if not self.setupKerning(composedLayers, layerIndex):
                 return
+            # Apply the kerning to the pair in all masters
+            allMasters = self.windowController().CommandKey()
 
-        if self.layer2 is not None:
-            self.layer2.parent.beginUndo()
+        self.hover = None
+        if self.mode is not None:
+            self.session = DragSession(
+                self.mode, self.orig_value, frameInterval(), self.previewDrag
+            )
+            if self.mode == "kern":
+                targets = self.kerningTargets(allMasters)
+                self.session.targets = targets
+                font = self.layer2.parent.parent
+                self.session.snapshot = [
+                    snapshotKerning(font, masterId, left, right, self.direction)
+                    for masterId, left, right, _ in targets
+                ]
+                if self.showKerning:
+                    self.kerningOverlay.startDrag({target[:3] for target in targets})
+                if self.showGap:
+                    # Layers that were added to the text since the last
+                    # prefetch; the gap is shown once they are ready
+                    self.sideProfiles.prefetch((self.layer1, self.layer2))
+                if self.showInstances:
+                    self.setupInstances(font)
+                if self.previewDrag:
+                    self.setupOccurrences(gv, composedLayers, targets)
+                if self.snapKerning and self.direction == GSLTR:
+                    masterId, left, right, _ = targets[0]
+                    index = self.kerningValueIndexForFont(font)
+                    self.session.candidates = index.candidates(masterId, left, right)
+                    self.session.tolerance = KERNING_SNAP_TOLERANCE / evc.scale
+            elif self.mode in ("LSB", "RSB") and self.suggestSpacing:
+                value = self.suggestSidebearing(self.layer2, self.mode)
+                if value is not None:
+                    self.session.candidates = [value]
+                    self.session.tolerance = SIDEBEARING_SNAP_TOLERANCE / evc.scale
+            if self.mode != "kern" and self.spacingScope != "single":
+                targets = self.spacingTargets()
+                if len(targets) > 1:
+                    self.session.targets = targets
+                    self.session.snapshot = [
+                        snapshotMetrics(layer) for layer, _, _ in targets
+                    ]
+            if self.mode != "kern":
+                self.setupDependents(composedLayers)
+                self.setupComposites(composedLayers)
+            if self.previewDrag:
+                # Fetch the outline for the overlay only once per drag
+                self.previewPath = self.layer2.completeBezierPath
+            if self.profiler is not None:
+                self.profiler.beginSession(self.mode)
+        if self.layer2 is not None and not self.previewDrag:
+            if self.session is not None and self.session.snapshot:
+                # Changes to more than one glyph are undone from the font, so
+                # that it works even if the modified glyph is not the current
+                # glyph
+                self.layer2.parent.parent.undoManager().beginUndoGrouping()
+            else:
+                self.layer2.parent.beginUndo()
         Glyphs.redraw()
 
     @objc.python_method
@@ -289,17 +3303,573 @@ class DragToKern(SelectTool):
             self.cancel_operation()
             return False
 
-        # Find out which layers should be kerned
-        self.layer1 = composedLayers[layerIndex - 1]
-        # self.layer2 = composedLayers[layerIndex]
-        if self.layer2.master != self.layer1.master:
-            # Can't add kerning between different masters
-            self.setLockedCursor()
-            self.cancel_operation()
-            return False
+        # Find out which layers should be kerned
+        self.layer1 = composedLayers[layerIndex - 1]
+        # self.layer2 = composedLayers[layerIndex]
+        if self.layer2.master != self.layer1.master:
+            # Can't add kerning between different masters
+            self.setLockedCursor()
+            self.cancel_operation()
+            return False
+
+        self.mode = "kern"
+        # Find the key of the pair once, it is fixed for the whole drag
+        left, right, value = resolveKerningPair(
+            self.layer2.parent.parent,
+            self.layer2.associatedMasterId,
+            self.layer1.parent,
+            self.layer2.parent,
+            self.direction,
+        )
+        if value is None:
+            value = 0
+        self.kerningPair = (left, right)
+        self.orig_value = value
+        return True
+
+    @objc.python_method
+    def setupOccurrences(self, gv, composedLayers, targets) -> None:
+        """
+        Find the places in the text where the dragged kerning pairs apply, and
+        the rects of their lines.
+        """
+        session = self.session
+        font = self.layer2.parent.parent
+        try:
+            master = self.layer2.master
+        except KeyError:
+            return
+        self.pairIndex.update(composedLayers)
+        indices = self.pairIndex.occurrences(
+            font, {target[:3] for target in targets}, self.direction
+        )
+        scale = gv.scale()
+        # Room for the kerning values below and the readouts above the glyphs
+        labelHeight = 2 * (LABEL_TEXT_SIZE + LABEL_DIST)
+        labels = int(self.showGap)
+        if session.instances is not None:
+            labels += len(session.instances[0])
+        below = master.descender * scale - labelHeight
+        above = master.ascender * scale + labelHeight * (labels + 1)
+        bounds = gv.bounds()
+        lines = set()
+        for index in indices:
+            origin = gv.cachedPositionAtIndex_(index)
+            session.occurrences.add((origin.x, origin.y))
+            lines.add(origin.y)
+        session.lines = [
+            NSRect(
+                origin=(bounds.origin.x, y + below),
+                size=(bounds.size.width, above - below),
+            )
+            for y in sorted(lines)
+        ]
+
+    @objc.python_method
+    def redrawDrag(self) -> None:
+        """
+        Redraw the view after the dragged value has changed. In preview mode,
+        only the lines where the dragged kerning pair applies are redrawn.
+        Live drags write to the font, and Glyphs lays out and redraws the whole
+        text after every write anyway, so the whole view is redrawn.
+        """
+        session = self.session
+        evc = self.editViewController()
+        if session is not None and session.lines:
+            gv = evc.graphicView()
+            for rect in session.lines:
+                gv.setNeedsDisplayInRect_(rect)
+            return
+        evc.forceRedraw()
+
+    @objc.python_method
+    def setupInstances(self, font) -> None:
+        """
+        Gather the values of the dragged pair in all masters for the instance
+        readout.
+        """
+        names, masterIds, matrix = self.instanceWeights.weights(font)
+        if not names:
+            return
+        values = []
+        for masterId in masterIds:
+            _, _, value = resolveKerningPair(
+                font,
+                masterId,
+                self.layer1.parent,
+                self.layer2.parent,
+                self.direction,
+            )
+            values.append(value or 0)
+        index = {masterId: i for i, masterId in enumerate(masterIds)}
+        self.session.instances = (names, index, matrix, values)
+
+    @objc.python_method
+    def instanceKerning(self) -> list[tuple[str, float]]:
+        """
+        Return the name and the kerning of the dragged pair in each instance,
+        with the current values of the dragged masters.
+        """
+        session = self.session
+        names, index, matrix, values = session.instances
+        values = list(values)
+        for masterId, _, _, origin in session.targets:
+            i = index.get(masterId)
+            if i is not None:
+                values[i] = session.valueFor(origin)
+        return list(zip(names, interpolate(matrix, values)))
+
+    @objc.python_method
+    def kerningValueIndexForFont(self, font) -> KerningValueIndex:
+        index = self.kerningValueIndex
+        if index is None or index.font is not font:
+            index = self.kerningValueIndex = KerningValueIndex(font)
+        return index
+
+    @objc.python_method
+    def updateKerningValueIndex(self, snapshot: list[tuple]) -> None:
+        """
+        Add the kerning changes of a finished drag to the value index, so it
+        doesn't need to be built again for the next drag. The font stamp is
+        taken again, so that the changes aren't mistaken for changes that were
+        made outside of the tool.
+        """
+        if snapshot:
+            font = snapshotFont(snapshot)
+            if font is Glyphs.font:
+                self.cacheStamp = fontStamp(font)
+        index = self.kerningValueIndex
+        if index is None:
+            return
+        for entry in snapshot:
+            if entry[0] != "kern" or entry[1] is not index.font:
+                continue
+            _, font, masterId, left, right, direction, old = entry
+            if direction != GSLTR:
+                continue
+            new = snapshotKerning(font, masterId, left, right, direction)[-1]
+            index.update(masterId, left, right, old, new)
+
+    @objc.python_method
+    def kerningTargets(self, allMasters=False) -> list[tuple[str, str, str, float]]:
+        """
+        Return the master id, left key, right key and current value of the
+        dragged kerning pair. If allMasters is True, the pair is resolved in
+        every master that is not excluded from multi-master kerning. Masters
+        whose metrics are linked to another master are left out, like when
+        kerning them alone.
+        """
+        masterId = self.layer2.associatedMasterId
+        left, right = self.kerningPair
+        targets = [(masterId, left, right, self.orig_value)]
+        if not allMasters:
+            return targets
+
+        glyph1 = self.layer1.parent
+        glyph2 = self.layer2.parent
+        font = glyph2.parent
+        for master in font.masters:
+            if master.id == masterId or master.name in self.excludedMasters:
+                continue
+            if self.masterIsLocked(master):
+                continue
+            left, right, value = resolveKerningPair(
+                font, master.id, glyph1, glyph2, self.direction
+            )
+            targets.append((master.id, left, right, 0 if value is None else value))
+        return targets
+
+    @objc.python_method
+    def spacingTargets(self) -> list[tuple[Any, float, float]]:
+        """
+        Return the layers that are spaced together with the dragged layer,
+        with their current metric and width. The dragged layer comes first.
+        Depending on the spacing scope, these are the selected layers in the
+        Edit view, or the glyphs that share the kerning group of the dragged
+        side.
+        """
+        layer2 = self.layer2
+        glyph2 = layer2.parent
+        font = glyph2.parent
+        masterId = layer2.associatedMasterId
+        if self.spacingScope == "selection":
+            layers = font.selectedLayers or []
+            if not any(layer is layer2 for layer in layers):
+                # An unselected glyph is dragged on its own
+                layers = []
+        else:
+            # The groups of the dragged side, or both for moving
+            groups = []
+            if self.mode in ("LSB", "move"):
+                groups.append(("leftKerningGroup", glyph2.leftKerningGroup))
+            if self.mode in ("RSB", "move"):
+                groups.append(("rightKerningGroup", glyph2.rightKerningGroup))
+            layers = []
+            if all(group for _, group in groups):
+                for glyph in font.glyphs:
+                    if all(getattr(glyph, key) == group for key, group in groups):
+                        layers.append(glyph.layers[masterId])
+
+        targets = [(layer2, self.orig_value, layer2.width)]
+        seen = {id(glyph2)}
+        for layer in layers:
+            glyph = layer.parent
+            if id(glyph) in seen or layer.associatedMasterId != masterId:
+                continue
+            seen.add(id(glyph))
+            if self.mode == "RSB":
+                value = layer.RSB
+            else:
+                value = layer.LSB
+            targets.append((layer, value, layer.width))
+        return targets
+
+    @objc.python_method
+    def metricsIndexForFont(self, font) -> MetricsIndex:
+        """
+        Return the up-to-date metrics key index of the font.
+        """
+        index = self.metricsIndex
+        if index is None or index.font is not font:
+            index = self.metricsIndex = MetricsIndex(font)
+        index.update()
+        return index
+
+    @objc.python_method
+    def setupDependents(self, composedLayers) -> None:
+        """
+        Find the layers whose metrics keys depend on the dragged layers, and
+        split them into those that are updated while dragging and those that
+        can wait until mouse up.
+        """
+        session = self.session
+        font = self.layer2.parent.parent
+        masterId = self.layer2.associatedMasterId
+        index = self.metricsIndexForFont(font)
+        names = [
+            name
+            for name in index.dependentsOf(self.draggedGlyphNames())
+            if font.glyphs[name]
+        ]
+        if not names:
+            return
+
+        # The visible glyphs, and the glyphs they depend on, are updated live
+        visible = visibleGlyphNames(composedLayers, masterId)
+        live = {name for name in names if name in visible}
+        for name in reversed(names):
+            if name in live:
+                live.update(index.references.get(name, ()))
+
+        for name in names:
+            layer = font.glyphs[name].layers[masterId]
+            if layer is None:
+                continue
+            if name in live:
+                session.dependents.append(layer)
+            else:
+                session.deferred.append(layer)
+        self.addToSnapshot(session.dependents + session.deferred)
+
+    @objc.python_method
+    def draggedGlyphNames(self) -> set[str]:
+        """
+        Return the names of the glyphs whose spacing is dragged.
+        """
+        session = self.session
+        if session.targets:
+            return {layer.parent.name for layer, _, _ in session.targets}
+        return {self.layer2.parent.name}
+
+    @objc.python_method
+    def addToSnapshot(self, layers) -> None:
+        """
+        Add the spacing of layers that are changed along with the dragged layer
+        to the undo snapshot of the drag.
+        """
+        session = self.session
+        if not session.snapshot:
+            session.snapshot = [snapshotMetrics(self.layer2)]
+        session.snapshot.extend(snapshotMetrics(layer) for layer in layers)
+
+    @objc.python_method
+    def componentIndexForFont(self, font) -> ComponentIndex:
+        """
+        Return the up-to-date component index of the font.
+        """
+        index = self.componentIndex
+        if index is None or index.font is not font:
+            index = self.componentIndex = ComponentIndex(font)
+        index.update()
+        return index
+
+    @objc.python_method
+    def setupComposites(self, composedLayers) -> None:
+        """
+        Find the composites that are built on the dragged layers and follow
+        their spacing: with automatic alignment, or with the same width as
+        their base.
+        """
+        session = self.session
+        font = self.layer2.parent.parent
+        masterId = self.layer2.associatedMasterId
+        sources = self.draggedGlyphNames()
+        names = self.componentIndexForFont(font).compositesOf(masterId, sources)
+        if not names:
+            return
+
+        affected = set(sources)
+        bases = {}
+        for name in names:
+            glyph = font.glyphs[name]
+            layer = None if glyph is None else glyph.layers[masterId]
+            if layer is None or not layer.components:
+                continue
+            # Only the first component determines the spacing
+            component = layer.components[0]
+            base = component.componentName
+            if base not in affected:
+                continue
+            baseLayer = font.glyphs[base].layers[masterId]
+            automatic = bool(component.automaticAlignment)
+            if not automatic and layer.width != baseLayer.width:
+                # The composite has its own spacing
+                continue
+            affected.add(name)
+            bases[name] = base
+            session.composites.append((layer, baseLayer, automatic))
+
+        if not session.composites:
+            return
+
+        if self.liveComposites:
+            # The visible composites, and the composites they are built on
+            visible = visibleGlyphNames(composedLayers, masterId)
+            live = {name for name in bases if name in visible}
+            for name in reversed(names):
+                if name in live and name in bases:
+                    live.add(bases[name])
+            session.liveComposites = [
+                entry for entry in session.composites if entry[0].parent.name in live
+            ]
+        self.addToSnapshot(layer for layer, _, _ in session.composites)
+
+    @objc.python_method
+    def updateComposites(self, composites) -> None:
+        """
+        Update the spacing of composites from their base layers.
+        """
+        font = self.layer2.parent.parent
+        font.disableUpdateInterface()
+        try:
+            for layer, baseLayer, automatic in composites:
+                if automatic:
+                    layer.updateMetrics()
+                else:
+                    layer.width = baseLayer.width
+        finally:
+            font.enableUpdateInterface()
+
+    @objc.python_method
+    def syncDependents(self, layers) -> None:
+        """
+        Update the metrics of the given layers from their metrics keys.
+        """
+        font = self.layer2.parent.parent
+        font.disableUpdateInterface()
+        try:
+            for layer in layers:
+                layer.syncMetrics()
+        finally:
+            font.enableUpdateInterface()
+
+    @objc.python_method
+    def handleSessionException(self, composedLayers, layerIndex, c) -> None:
+        """
+        Add or remove an exception while a kerning pair is dragged. The keys of
+        the dragged pair are resolved again, because the exception may have
+        changed them.
+        """
+        session = self.session
+        glyph1 = self.layer1.parent
+        glyph2 = self.layer2.parent
+        font = glyph2.parent
+
+        # Remember the state of all keys the pair could end up with, so that
+        # undo also removes an exception that was added while dragging
+        known = {(entry[2], entry[3], entry[4]) for entry in session.snapshot}
+        for masterId, _, _, _ in session.targets:
+            for left, right in kerningKeys(glyph1, glyph2, self.direction):
+                if (masterId, left, right) not in known:
+                    session.snapshot.append(
+                        snapshotKerning(font, masterId, left, right, self.direction)
+                    )
+
+        handleException(composedLayers, layerIndex, c, self.direction)
+
+        # The new key was copied from the value that is in the font, which
+        # doesn't include the part of the drag that is pending or previewed
+        shift = 0 if session.preview else session.written - session.origin
+        targets = []
+        for masterId, _, _, _ in session.targets:
+            left, right, value = resolveKerningPair(
+                font, masterId, glyph1, glyph2, self.direction
+            )
+            # Continue the drag from the value of the new key
+            origin = (0 if value is None else value) - shift
+            targets.append((masterId, left, right, origin))
+
+        # The drag only changes the pair at its new key. Give back the value
+        # that was dragged at the old key, and remove the pairs that were only
+        # created on the way to the new key.
+        keys = {(masterId, left, right) for masterId, left, right, _ in targets}
+        restore = []
+        for entry in session.snapshot:
+            if entry[2:5] in keys:
+                continue
+            current = snapshotKerning(*entry[1:6])
+            if current[-1] is not None and current != entry:
+                restore.append(entry)
+        if restore:
+            font.disableUpdateInterface()
+            try:
+                restoreSnapshot(restore)
+            finally:
+                font.enableUpdateInterface()
+
+        session.targets = targets
+        session.origin = targets[0][3]
+        if session.preview:
+            # The written value is the one that is shown
+            session.written = session.value()
+        else:
+            session.written = session.origin + shift
+        self.kerningPair = targets[0][1:3]
+
+    @objc.python_method
+    def applyOperations(self, font, operations) -> int:
+        """
+        Apply kerning and spacing operations to the font as one change with one
+        interface update and one undo step. Operations can be any iterable,
+        including a generator, of tuples:
+
+        - ("kern", masterId, glyphName1, glyphName2, delta[, step])
+        - ("kernPair", masterId, leftKey, rightKey, delta[, step])
+        - ("kernNewPair", masterId, leftKey, rightKey, delta, glyphName1,
+          glyphName2[, step])
+        - ("setKern", masterId, glyphName1, glyphName2, value[, step])
+        - ("exception", masterId, glyphName1, glyphName2, key)
+        - ("LSB", masterId, glyphName, delta)
+        - ("RSB", masterId, glyphName, delta)
+        - ("move", masterId, glyphName, delta)
+
+        Kerning is applied to the pair that applies to the two glyphs, or to
+        the pair with the given keys, and rounded to the step like when
+        dragging. If the font doesn't have the pair of a "kernNewPair" yet, it
+        is added with the delta applied to the value of the pair that applies
+        to the two glyphs. The key of an exception is one
+        of the shortcut keys "a", "s", "d", "A", "S" or "D". Like in the tool,
+        only "move" is applied to masters whose metrics are linked to another
+        master. Returns the number of operations that were applied.
+        """
+        # Only the previous value of each changed pair or layer is kept
+        snapshot = {}
+        lockedMasters = {
+            master.id: masterMetricsAreLocked(master) for master in font.masters
+        }
+        count = 0
+        undoManager = font.undoManager()
+        undoManager.beginUndoGrouping()
+        font.disableUpdateInterface()
+        try:
+            for operation in operations:
+                if applyOperation(
+                    font, operation, snapshot, lockedMasters, self.direction
+                ):
+                    count += 1
+        finally:
+            font.enableUpdateInterface()
+            if snapshot:
+                undoManager.registerUndoWithTarget_selector_object_(
+                    self, "restoreSnapshot:", list(snapshot.values())
+                )
+                undoManager.setActionName_("Kerning and Spacing")
+            undoManager.endUndoGrouping()
+        if snapshot:
+            self.updateKerningValueIndex(list(snapshot.values()))
+            self.kerningOverlay.clear()
+        return count
+
+    @objc.python_method
+    def exceptionRange(self, gv, composedLayers, layerIndex) -> range | None:
+        """
+        Return the range of layer indices that a kerning exception shortcut
+        applies to: the selected glyphs, or the whole line if Option is held.
+        Return None if it only applies to the pair at the mouse location.
+        """
+        selection = gv.cachedLayerSelectionRange()
+        if selection.length > 1 and selection.location < len(composedLayers):
+            # Only the pairs inside the selection
+            return range(selection.location + 1, selection.location + selection.length)
+        if self.windowController().AltKey():
+            if layerIndex < 0 or layerIndex >= len(composedLayers):
+                return None
+            return lineRange(composedLayers, layerIndex)
+        return None
 
-        self.mode = "kern"
-        return True
+    @objc.python_method
+    def handleRangeException(self, composedLayers, indices, c) -> None:
+        """
+        Add or remove exceptions for all pairs in the range as one change.
+        """
+        pairs = exceptionPairs(composedLayers, indices, c, self.direction)
+        if not pairs:
+            return
+
+        # Remember all keys the pairs could end up with, so that undo also
+        # removes the new exceptions
+        snapshot = self.exceptionSnapshot(composedLayers, pairs)
+        font = snapshotFont(snapshot)
+        undoManager = font.undoManager()
+        undoManager.beginUndoGrouping()
+        font.disableUpdateInterface()
+        try:
+            for layerIndex in pairs:
+                handleException(composedLayers, layerIndex, c, self.direction)
+        finally:
+            font.enableUpdateInterface()
+            undoManager.registerUndoWithTarget_selector_object_(
+                self, "restoreSnapshot:", snapshot
+            )
+            undoManager.setActionName_("Kerning Exceptions")
+            undoManager.endUndoGrouping()
+        self.updateKerningValueIndex(snapshot)
+        self.kerningOverlay.clear()
+        self.writeJournal(font, snapshot)
+        self.noteRedundantPairs(font, snapshot)
+
+    @objc.python_method
+    def exceptionSnapshot(self, composedLayers, pairs) -> list[tuple]:
+        """
+        Return an undo snapshot of all kerning keys that the pairs of the
+        layers with their left neighbours could use.
+        """
+        snapshot = {}
+        for layerIndex in pairs:
+            layer1 = composedLayers[layerIndex - 1]
+            layer2 = composedLayers[layerIndex]
+            glyph1 = layer1.parent
+            glyph2 = layer2.parent
+            if glyph1 is None or glyph2 is None or layer2.master != layer1.master:
+                continue
+            font = glyph2.parent
+            masterId = layer2.associatedMasterId
+            for left, right in kerningKeys(glyph1, glyph2, self.direction):
+                if (masterId, left, right) not in snapshot:
+                    snapshot[masterId, left, right] = snapshotKerning(
+                        font, masterId, left, right, self.direction
+                    )
+        return list(snapshot.values())
 
     def cancelOperation_(self, sender) -> None:
         wc = self.windowController()
@@ -307,10 +3877,16 @@ class DragToKern(SelectTool):
 
     @objc.python_method
     def cancel_operation(self) -> None:
+        self.cancelScheduledWrite()
         self.layer1 = None
         self.layer2 = None
+        self.kerningPair = None
         self.drag_start = None
         self.orig_value = None
+        self.width = None
+        self.layer2Origin = None
+        self.previewPath = None
+        self.session = None
 
     @objc.python_method
     def setLockedCursor(self) -> None:
@@ -331,31 +3907,92 @@ class DragToKern(SelectTool):
 
         needsRedraw = self.handleDrag(theEvent)
         if needsRedraw:
-            self.editViewController().forceRedraw()
+            self.redrawDrag()
 
     def mouseUp_(self, theEvent) -> None:
         """
         End the undo and reset variables when the mouse is released
         """
-        if self.layer2 is not None:
-            self.layer2.parent.endUndo()
+        session = self.session
+        if session is not None and session.preview:
+            self.commitPreview()
+        else:
+            if session is not None and session.hasPending():
+                # Commit the final value
+                self.writeDrag()
+
+            # Compare with the font, because an exception that was added
+            # during the drag changes it even if the value doesn't change
+            if session is None:
+                changed = False
+            elif session.snapshot:
+                changed = snapshotChanged(session.snapshot)
+            else:
+                changed = session.written != session.origin
+
+            if session is not None and session.snapshot:
+                if changed:
+                    if session.deferred:
+                        self.syncDependents(session.deferred)
+                    if session.composites:
+                        self.updateComposites(session.composites)
+                self.endTargets()
+            elif self.layer2 is not None:
+                self.layer2.parent.endUndo()
+
+            if changed:
+                self.recordSession()
+                self.updateKerningValueIndex(session.snapshot)
+                self.writeJournal(
+                    self.layer2.parent.parent,
+                    session.snapshot or [snapshotMetrics(self.layer2)],
+                )
+            if session is not None and session.mode == "kern":
+                # A drag that ends at its start value may still have created
+                # a pair
+                self.noteRedundantPairs(self.layer2.parent.parent, session.snapshot)
+
+        if session is not None and session.mode == "kern":
+            # Keep the other values, only the layout has changed
+            overlay = self.kerningOverlay
+            glyph1 = self.layer1.parent.name
+            glyph2 = self.layer2.parent.name
+            for masterId, left, right, origin in session.targets:
+                overlay.values[masterId, left, right] = session.valueFor(origin)
+                # An exception may have changed the key
+                overlay.keys.pop((masterId, glyph1, glyph2), None)
+            overlay.clearPairs()
+
+        if self.profiler is not None:
+            self.profiler.endSession()
 
         self.direction = GSLTR
         self.mode = None
         self.cancel_operation()
         self.setStdCursor()
         self.active_metric = None
+        self.updateHover()
         Glyphs.redraw()
 
     @objc.python_method
     def metricsAreLocked(self, layer) -> bool:
-        cp1 = "Link Metrics With First Master"
-        cp2 = "Link Metrics With Master"
-        if cp1 in layer.master.customParameters or cp2 in layer.master.customParameters:
-            return True
-        return False
+        masterId = layer.associatedMasterId
+        locked = self.lockedMasters.get(masterId)
+        if locked is None:
+            locked = masterMetricsAreLocked(layer.master)
+            self.lockedMasters[masterId] = locked
+        return locked
+
+    @objc.python_method
+    def masterIsLocked(self, master) -> bool:
+        locked = self.lockedMasters.get(master.id)
+        if locked is None:
+            locked = masterMetricsAreLocked(master)
+            self.lockedMasters[master.id] = locked
+        return locked
 
     @objc.python_method
+    @profiled("handleDrag")
     def handleDrag(self, theEvent) -> bool:
         """
         Get the current location while the mouse is dragging. Returns True if
@@ -386,29 +4023,260 @@ class DragToKern(SelectTool):
         delta = (loc.x - self.drag_start.x) / evc.scale * mouseZoom
 
         self.drag_start = loc
-        if delta != 0.0:
-            # Only "move" can be applied for linked metrics
-            if self.mode == "move":
-                self.layer2.LSB += int(round(delta))
-                self.layer2.width -= int(round(delta))
-                return True
+        if delta == 0.0:
+            return False
 
-            if self.metricsAreLocked(self.layer2):
-                return False
+        # Only "move" can be applied for linked metrics
+        if self.mode != "move" and self.metricsAreLocked(self.layer2):
+            return False
 
-            if self.mode == "kern":
-                applyKerning(self.layer1, self.layer2, delta, step, self.direction)
-                return False  # Kerning changes already trigger a redraw
+        session = self.session
+        if session is None:
+            return False
 
-            if self.mode == "LSB":
-                self.layer2.LSB += int(round(delta))
-                return True
+        session.add(delta, step)
+        if not session.hasPending():
+            # The change is too small to show up in the font yet
+            return False
 
-            if self.mode == "RSB":
-                self.layer2.RSB += int(round(delta))
-                return True
+        if not session.isDue():
+            # Write the change with the next frame
+            self.scheduleWrite()
+            return False
 
-        return False
+        return self.writeDrag()
+
+    @objc.python_method
+    def writeDrag(self) -> bool:
+        """
+        Write the value of the drag session to the font if it has changed.
+        Returns True if the view needs a redraw.
+        """
+        self.cancelScheduledWrite()
+        session = self.session
+        if session is None or self.layer2 is None:
+            return False
+
+        if not session.hasPending():
+            return False
+
+        value = session.take()
+        if session.preview:
+            # Only the overlay needs to be redrawn
+            return True
+
+        return self.applyDragValue(value)
+
+    @objc.python_method
+    @profiled("applyDragValue")
+    def applyDragValue(self, value) -> bool:
+        """
+        Write the dragged value to the font. Returns True if the view needs a
+        redraw.
+        """
+        if self.mode == "kern":
+            self.applyKerningTargets()
+            return False  # Kerning changes already trigger a redraw
+
+        session = self.session
+        if session is not None and (session.dependents or session.liveComposites):
+            # Write the layers and keep the linked glyphs and composites in the
+            # Edit view in sync with only one interface update
+            font = self.layer2.parent.parent
+            font.disableUpdateInterface()
+            try:
+                self.applySpacing(value)
+                if session.dependents:
+                    self.syncDependents(session.dependents)
+                if session.liveComposites:
+                    self.updateComposites(session.liveComposites)
+            finally:
+                font.enableUpdateInterface()
+            return True
+
+        self.applySpacing(value)
+        return True
+
+    @objc.python_method
+    def applySpacing(self, value) -> None:
+        """
+        Write the dragged metric to the dragged layer, or to all target layers
+        when spacing several glyphs at once.
+        """
+        session = self.session
+        if session is not None and session.targets:
+            self.applySpacingTargets()
+        elif self.mode == "move":
+            self.layer2.LSB = value
+            self.layer2.width = self.width
+        elif self.mode == "LSB":
+            self.layer2.LSB = value
+        elif self.mode == "RSB":
+            self.layer2.RSB = value
+
+    @objc.python_method
+    def applyKerningTargets(self) -> None:
+        """
+        Write the dragged kerning directly to the resolved key of the pair in
+        all target masters, with only one interface update for all of them.
+        """
+        session = self.session
+        font = self.layer2.parent.parent
+        if len(session.targets) == 1:
+            masterId, left, right, origin = session.targets[0]
+            font.setKerningForPair(
+                masterId, left, right, session.valueFor(origin), self.direction
+            )
+            return
+
+        font.disableUpdateInterface()
+        try:
+            for masterId, left, right, origin in session.targets:
+                font.setKerningForPair(
+                    masterId, left, right, session.valueFor(origin), self.direction
+                )
+        finally:
+            font.enableUpdateInterface()
+
+    @objc.python_method
+    def applySpacingTargets(self) -> None:
+        """
+        Apply the dragged change to the spacing of all target layers in one
+        pass, with only one interface update for all of them.
+        """
+        session = self.session
+        mode = self.mode
+        font = self.layer2.parent.parent
+        font.disableUpdateInterface()
+        try:
+            for layer, origin, width in session.targets:
+                value = session.valueFor(origin)
+                if mode == "move":
+                    layer.LSB = value
+                    layer.width = width
+                elif mode == "LSB":
+                    layer.LSB = value
+                elif mode == "RSB":
+                    layer.RSB = value
+        finally:
+            font.enableUpdateInterface()
+
+    @objc.python_method
+    def endTargets(self) -> None:
+        """
+        Close the undo group of a kerning or batch spacing drag.
+        """
+        session = self.session
+        undoManager = self.layer2.parent.parent.undoManager()
+        if snapshotChanged(session.snapshot):
+            undoManager.registerUndoWithTarget_selector_object_(
+                self, "restoreSnapshot:", session.snapshot
+            )
+            undoManager.setActionName_("Kerning" if self.mode == "kern" else "Spacing")
+        undoManager.endUndoGrouping()
+
+    @objc.python_method
+    def commitPreview(self) -> None:
+        """
+        Write the value of a preview drag to the font as one change in one
+        undo group.
+        """
+        session = self.session
+        if session is None or self.layer2 is None:
+            return
+
+        value = session.value()
+        if value == session.origin and not (
+            # An exception may have been added during the drag
+            session.snapshot
+            and snapshotChanged(session.snapshot)
+        ):
+            return
+
+        layer2 = self.layer2
+        glyph = layer2.parent
+        font = glyph.parent
+        if session.snapshot:
+            snapshot = session.snapshot
+            actionName = "Kerning" if self.mode == "kern" else "Spacing"
+        else:
+            snapshot = [snapshotMetrics(layer2)]
+            actionName = "Spacing"
+
+        undoManager = font.undoManager()
+        undoManager.beginUndoGrouping()
+        glyph.beginUndo()
+        try:
+            self.applyDragValue(value)
+            if session.deferred:
+                self.syncDependents(session.deferred)
+            if session.composites:
+                self.updateComposites(session.composites)
+        finally:
+            glyph.endUndo()
+            # Register the undo with the font, so it works even if the
+            # modified glyph is not the current glyph
+            undoManager.registerUndoWithTarget_selector_object_(
+                self, "restoreSnapshot:", snapshot
+            )
+            undoManager.setActionName_(actionName)
+            undoManager.endUndoGrouping()
+        self.recordSession()
+        self.updateKerningValueIndex(snapshot)
+        self.writeJournal(font, snapshot)
+        self.noteRedundantPairs(font, snapshot)
+
+    def restoreSnapshot_(self, snapshot) -> None:
+        """
+        Undo or redo a change that was committed by the tool.
+        """
+        inverse = restoreSnapshot(list(snapshot))
+        if inverse:
+            font = snapshotFont(inverse)
+            font.undoManager().registerUndoWithTarget_selector_object_(
+                self, "restoreSnapshot:", inverse
+            )
+            self.updateKerningValueIndex(inverse)
+            # Undo may also remove an exception, which changes the keys
+            self.kerningOverlay.clear()
+            # The journal must not bring back what was undone
+            self.writeJournal(font, inverse)
+        Glyphs.redraw()
+
+    @objc.python_method
+    def scheduleWrite(self) -> None:
+        """
+        Make sure a deferred change is written even if no more drag events
+        arrive.
+        """
+        session = self.session
+        if session is None or session.scheduled:
+            return
+
+        session.scheduled = True
+        self.performSelector_withObject_afterDelay_(
+            "writeScheduledDrag:", None, session.interval
+        )
+
+    @objc.python_method
+    def cancelScheduledWrite(self) -> None:
+        session = self.session
+        if session is None or not session.scheduled:
+            return
+
+        session.scheduled = False
+        NSObject.cancelPreviousPerformRequestsWithTarget_selector_object_(
+            self, "writeScheduledDrag:", None
+        )
+
+    def writeScheduledDrag_(self, sender) -> None:
+        session = self.session
+        if session is None:
+            return
+
+        session.scheduled = False
+        if self.writeDrag():
+            self.redrawDrag()
 
     def drawLayer_atPoint_asActive_attributes_(
         self, layer, layerOrigin, active, attributes
@@ -417,41 +4285,240 @@ class DragToKern(SelectTool):
         gv.drawLayer_atPoint_asActive_attributes_(
             layer, layerOrigin, active, attributes
         )
-        if not self.doSpacing(gv):
-            # Not in spacing mode
+        profiler = self.profiler
+        if profiler is None:
+            self.drawToolLayer(gv, layer, layerOrigin)
             return
+        start = perf_counter()
+        self.drawToolLayer(gv, layer, layerOrigin)
+        profiler.record("draw", perf_counter() - start)
+
+    @objc.python_method
+    def drawToolLayer(self, gv, layer, layerOrigin) -> None:
+        """
+        Draw the handles, preview and measurements of the tool for a layer.
+        """
+        if self.showKerning:
+            session = self.session
+            if session is None:
+                kerning = self.doKerning(gv)
+            else:
+                kerning = session.mode == "kern"
+            if kerning:
+                self.drawKerningValue(gv, layer, layerOrigin)
 
         if self.drag_start is None:
-            result = self.checkHandles(gv, layer, layerOrigin)
-            if result is not None:
-                metric, handle_x, width = result
-                self._drawHandle(handle_x, metric)
-        elif self.drawMeasurements:
+            hover = self.hover
+            if hover is None or not hover.matches(layer, layerOrigin):
+                # Not the hovered layer, nothing else to check
+                return
+
+            if hover.scale != gv.scale() or not self.doSpacing(gv):
+                # The view was zoomed or the mode was changed since the last
+                # mouse move
+                return
+
+            metric, handle_x, width = hover.result
+            self.renderResources(gv)
+            self._drawHandle(handle_x, metric)
+            if hover.suggestion is not None:
+                self._drawSuggestion(hover.suggestion, metric[3], metric[4])
+            return
+
+        self.renderResources(gv)
+        if self.session is not None and self.session.preview:
+            if not self.isDraggedLayer(layer, layerOrigin):
+                return
+            self._drawPreview(gv, layer, layerOrigin)
+
+        if self.drawMeasurements and self.doSpacing(gv):
             self._drawDraggingMeasurements(self.mode, gv, layer, layerOrigin)
 
-    def drawMetricsForLayer_atPoint_asActive_(self, layer, layerOrigin, active) -> None:
-        pass
+        session = self.session
+        if (
+            self.showGap
+            and session is not None
+            and session.mode == "kern"
+            and self.isDraggedLayer(layer, layerOrigin)
+        ):
+            self._drawGap(gv, layer, layerOrigin)
+
+        if (
+            session is not None
+            and session.instances is not None
+            and self.isDraggedLayer(layer, layerOrigin)
+        ):
+            self._drawInstances(gv, layer, layerOrigin)
+
+        if (
+            session is not None
+            and session.mode in ("LSB", "RSB")
+            and session.candidates
+            and self.isDraggedLayer(layer, layerOrigin)
+        ):
+            self._drawDraggingSuggestion(gv, layer, layerOrigin)
 
     @objc.python_method
-    def checkHandles(
-        self, graphicView, layer, layerOrigin
-    ) -> tuple[tuple[str, float, float, float, float], tuple[float, float], int] | None:
+    def drawKerningValue(self, gv, layer, layerOrigin) -> None:
         """
-        Check if the mouse pointer is at a possible metrics handle location.
-        Called on MOUSEMOVED via drawLayer_atPoint_asActive_attributes_.
+        Draw the value of the kerning pair of the layer and the layer before
+        it. The dragged pair is highlighted.
         """
-        theEvent = Glyphs.currentEvent()
-        if theEvent is None:
-            return None
+        overlay = self.kerningOverlay
+        session = self.session
+        kerning = session is not None and session.mode == "kern"
+        x = layerOrigin.x
+        y = layerOrigin.y
+        if kerning and not session.preview:
+            # The layers after the dragged pairs have moved with the kerning
+            shift = (session.written - session.origin) * gv.scale()
+            if self.direction != GSLTR:
+                shift = -shift
+            entry = overlay.pairDuringDrag(x, y, shift)
+        else:
+            entry = overlay.pair(x, y)
+        position = (round(x, 1), round(y, 1))
+        if entry is None and not kerning and position not in overlay.pairs:
+            self.buildKerningOverlay(gv, y)
+            entry = overlay.pair(x, y)
+            if entry is None:
+                # Don't look for this layer again until the layout changes
+                overlay.pairs[position] = None
+        if entry is None:
+            return
 
-        self.mouse_position = graphicView.convertPoint_fromView_(
-            theEvent.locationInWindow(), None
+        masterId, left, right, descender = entry
+        dragged = False
+        value = overlay.values.get((masterId, left, right))
+        if kerning:
+            for target in session.targets:
+                if target[:3] == (masterId, left, right):
+                    value = session.valueFor(target[3])
+                    dragged = True
+                    break
+        if value is None:
+            return
+
+        render = self.renderResources(gv)
+        string, bw, bh, box = render.label("%g" % value)
+        scale = gv.scale()
+        if self.direction == GSLTR:
+            edge = layerOrigin.x
+        else:
+            edge = layerOrigin.x + layer.width * scale
+        textX = edge - bw * 0.5
+        textY = y + descender * scale - LABEL_DIST - bh
+        NSGraphicsContext.saveGraphicsState()
+        render.concat(1.0, textX, textY)
+        if dragged:
+            self.colorSBOuter.set()
+        else:
+            render.colorBox.set()
+        box.fill()
+        NSGraphicsContext.restoreGraphicsState()
+        string.drawInRect_withAttributes_(
+            NSRect(origin=(textX, textY), size=(bw, bh)), render.attrs
         )
-        return self.checkHandleLocation(
-            self.mouse_position, graphicView, layer, layerOrigin
+
+    @objc.python_method
+    def buildKerningOverlay(self, gv, y: float) -> None:
+        """
+        Find the kerning pairs of the layers on the visible lines and on the
+        line at y. If that line is outside of the lines that were found before,
+        they are kept, otherwise the layout has changed.
+        """
+        evc = self.editViewController()
+        layers = evc.composedLayers
+        if not layers:
+            return
+        font = evc.representedObject()
+        overlay = self.kerningOverlay
+        # Include the lines whose glyphs reach into the visible part
+        margin = font.upm * gv.scale()
+        if overlay.pairs and not overlay.bottom <= y <= overlay.top:
+            # A line that was not visible when the pairs were found
+            bottom = y - margin
+            top = y + margin
+            extend = True
+        else:
+            visible = gv.visibleRect()
+            bottom = min(visible.origin.y, y) - margin
+            top = max(visible.origin.y + visible.size.height, y) + margin
+            extend = False
+        positions = []
+        for index in range(len(layers)):
+            origin = gv.cachedPositionAtIndex_(index)
+            if bottom <= origin.y <= top:
+                positions.append((index, origin))
+        overlay.build(font, layers, positions, evc.direction, extend)
+        overlay.bottom = min(overlay.bottom, bottom) if extend else bottom
+        overlay.top = max(overlay.top, top) if extend else top
+
+    @objc.python_method
+    def renderResources(self, graphicView) -> RenderCache:
+        """
+        Return the cached drawing resources, updated for the current
+        appearance of the view.
+        """
+        self.render.update(graphicView.effectiveAppearance().name())
+        return self.render
+
+    @objc.python_method
+    def isDraggedLayer(self, layer, layerOrigin) -> bool:
+        """
+        Return True if layer is the layer being dragged. In preview mode, the
+        layout doesn't change while dragging, so only the occurrence of the
+        layer that was clicked is considered, and when kerning, the other
+        occurrences of the dragged pair.
+        """
+        if layer != self.layer2 or self.layer2 is None:
+            return False
+        if self.session is None or not self.session.preview:
+            return True
+        origin = (layerOrigin.x, layerOrigin.y)
+        return origin == self.layer2Origin or origin in self.session.occurrences
+
+    @objc.python_method
+    def previewGeometry(self) -> tuple[float, float, float]:
+        """
+        Return how a preview drag changes the dragged layer in font units: the
+        shift of the layer origin, the shift of the outline inside the layer,
+        and the change of the layer width.
+        """
+        session = self.session
+        if session is None or not session.preview:
+            return 0, 0, 0
+
+        shift = session.shift()
+        if self.mode == "kern":
+            if self.direction == GSLTR:
+                return shift, 0, 0
+            return -shift, 0, 0
+        if self.mode == "LSB":
+            return 0, shift, shift
+        if self.mode == "RSB":
+            return 0, 0, shift
+        if self.mode == "move":
+            return 0, shift, 0
+        return 0, 0, 0
+
+    @objc.python_method
+    def draggedMetrics(self) -> tuple[float, float]:
+        """
+        Return the LSB and RSB of the dragged layer, including the change of a
+        preview drag.
+        """
+        _, outlineShift, widthDelta = self.previewGeometry()
+        return (
+            self.layer2.LSB + outlineShift,
+            self.layer2.RSB + widthDelta - outlineShift,
         )
 
+    def drawMetricsForLayer_atPoint_asActive_(self, layer, layerOrigin, active) -> None:
+        pass
+
     @objc.python_method
+    @profiled("checkHandleLocation")
     def checkHandleLocation(
         self, location, graphicView, layer, layerOrigin
     ) -> tuple[tuple[str, float, float, float, float], tuple[float, float], int] | None:
@@ -523,22 +4590,182 @@ class DragToKern(SelectTool):
 
         pos, w = handle_x
         metric_name, value, layer, desc, asc = metric
-        gradient = NSGradient.alloc().initWithStartingColor_endingColor_(
-            self.colorSBOuter, self.colorSBInner
-        )
         rect = NSRect(
             origin=(pos, desc),
             size=(w, asc - desc),
         )
         angle = -180 if metric_name == "RSB" else 0
-        bezierPath = NSBezierPath.bezierPathWithRect_(rect)
-        gradient.drawInBezierPath_angle_(bezierPath, angle)
+        self.render.gradient.drawInRect_angle_(rect, angle)
+
+    @objc.python_method
+    def kerningGap(self) -> float | None:
+        """
+        Return the smallest distance between the outlines of the dragged pair
+        with the current kerning. Negative values mean that they collide.
+        """
+        session = self.session
+        if session.gap is None:
+            if self.direction == GSLTR:
+                session.gap = self.sideProfiles.gap(self.layer1, self.layer2)
+            else:
+                session.gap = self.sideProfiles.gap(self.layer2, self.layer1)
+            if session.gap is None:
+                return None
+        return session.gap + session.value()
+
+    @objc.python_method
+    def _drawGap(self, graphicView, layer, layerOrigin) -> None:
+        """
+        Draw the gap between the dragged pair above the point where the two
+        glyphs meet.
+        """
+        gap = self.kerningGap()
+        if gap is None:
+            return
+
+        try:
+            master = layer.master
+        except KeyError:
+            return
+
+        scale = graphicView.scale()
+        originShift, _, _ = self.previewGeometry()
+        x = layerOrigin.x + originShift * scale
+        if self.direction != GSLTR:
+            x += layer.width * scale
+        if gap < 0:
+            text = "⚠︎ %g" % round(gap)
+        else:
+            text = "%g" % round(gap)
+        y = layerOrigin.y + master.ascender * scale + LABEL_DIST
+        self._drawLabel(text, x, y, 0.5)
+
+    @objc.python_method
+    def _drawInstances(self, graphicView, layer, layerOrigin) -> None:
+        """
+        Draw the kerning of the dragged pair in each instance as a column of
+        labels above the point where the two glyphs meet, the first instance
+        at the top.
+        """
+        try:
+            master = layer.master
+        except KeyError:
+            return
+
+        scale = graphicView.scale()
+        originShift, _, _ = self.previewGeometry()
+        x = layerOrigin.x + originShift * scale
+        if self.direction != GSLTR:
+            x += layer.width * scale
+        y = layerOrigin.y + master.ascender * scale + LABEL_DIST
+        if self.showGap:
+            # Leave room for the gap
+            y += LABEL_TEXT_SIZE + 2 * LABEL_DIST
+        for name, value in reversed(self.instanceKerning()):
+            _, h = self._drawLabel("%s %g" % (name, round(value)), x, y, 0)
+            y += h + 2
+
+    @objc.python_method
+    def _drawLabel(self, text, x, y, align) -> tuple[float, float]:
+        """
+        Draw a label with its lower edge at y. The align factor moves the
+        label to the left by that fraction of its width. Returns the size of
+        the label.
+        """
+        render = self.render
+        myString, bw, bh, box = render.label(text)
+        x -= bw * align
+        rect = NSRect(origin=(x, y), size=(bw, bh))
+        NSGraphicsContext.saveGraphicsState()
+        render.concat(1.0, x, y)
+        render.colorBox.set()
+        box.fill()
+        NSGraphicsContext.restoreGraphicsState()
+        myString.drawInRect_withAttributes_(rect, render.attrs)
+        return bw, bh
+
+    @objc.python_method
+    def _drawSuggestion(self, x, desc, asc) -> None:
+        """
+        Draw the suggested position of a sidebearing as a thin line.
+        """
+        self.colorSBOuter.set()
+        NSBezierPath.fillRect_(
+            NSRect(
+                origin=(x - DRAGGING_HANDLE_WIDTH * 0.5, desc),
+                size=(DRAGGING_HANDLE_WIDTH, asc - desc),
+            )
+        )
+
+    @objc.python_method
+    def _drawDraggingSuggestion(self, graphicView, layer, layerOrigin) -> None:
+        """
+        Draw the suggested position of the dragged sidebearing, which moves
+        with the outline while dragging.
+        """
+        try:
+            master = layer.master
+        except KeyError:
+            return
+
+        scale = graphicView.scale()
+        originShift, _, widthDelta = self.previewGeometry()
+        lsb, rsb = self.draggedMetrics()
+        x = self.suggestionPosition(
+            self.mode,
+            self.session.candidates[0],
+            lsb if self.mode == "LSB" else rsb,
+            layer.width + widthDelta,
+            layerOrigin.x + originShift * scale,
+            scale,
+        )
+        self._drawSuggestion(
+            x,
+            layerOrigin.y + master.descender * scale,
+            layerOrigin.y + master.ascender * scale,
+        )
+
+    @objc.python_method
+    def _drawPreview(self, graphicView, layer, layerOrigin) -> None:
+        """
+        Draw the outline and advance width of the dragged layer as they will
+        be after the preview drag is committed.
+        """
+        originShift, outlineShift, widthDelta = self.previewGeometry()
+        if originShift == 0 and outlineShift == 0 and widthDelta == 0:
+            return
+
+        try:
+            master = layer.master
+        except KeyError:
+            return
+
+        scale = graphicView.scale()
+        x = layerOrigin.x + originShift * scale
+        if self.previewPath is not None:
+            NSGraphicsContext.saveGraphicsState()
+            self.render.concat(scale, x + outlineShift * scale, layerOrigin.y)
+            self.colorPreview.set()
+            self.previewPath.fill()
+            NSGraphicsContext.restoreGraphicsState()
+
+        # Mark the new advance width
+        desc = layerOrigin.y + master.descender * scale
+        height = (master.ascender - master.descender) * scale
+        self.colorSBOuter.set()
+        for edge in (x, x + (layer.width + widthDelta) * scale):
+            NSBezierPath.fillRect_(
+                NSRect(
+                    origin=(edge - DRAGGING_HANDLE_WIDTH * 0.5, desc),
+                    size=(DRAGGING_HANDLE_WIDTH, height),
+                )
+            )
 
     @objc.python_method
     def _drawDraggingMeasurements(
         self, metric, graphicView, layer, layerOrigin
     ) -> None:
-        if layer != self.layer2 or self.layer2 is None:
+        if not self.isDraggedLayer(layer, layerOrigin):
             # Only draw labels at the layer being modified
             return
 
@@ -552,23 +4779,20 @@ class DragToKern(SelectTool):
         asc = master.ascender * scale
         asc += layerOrigin.y
         desc += layerOrigin.y
-        layerWidth = layer.width * scale
+        originShift, _, widthDelta = self.previewGeometry()
+        layerX = layerOrigin.x + originShift * scale
+        layerWidth = (layer.width + widthDelta) * scale
         locked = self.metricsAreLocked(self.layer2)
 
         if metric in ("LSB", "RSB", "move"):
             # Draw left and right
-            x1 = layerOrigin.x - DRAGGING_HANDLE_WIDTH * 0.5
-            x2 = layerOrigin.x + layerWidth - DRAGGING_HANDLE_WIDTH * 0.5
+            x1 = layerX - DRAGGING_HANDLE_WIDTH * 0.5
+            x2 = layerX + layerWidth - DRAGGING_HANDLE_WIDTH * 0.5
             self._drawDraggingTextLabel("LSB", x1, asc, locked)
             self._drawDraggingTextLabel("RSB", x2, asc, locked)
             pos = [x1, x2]
-        elif metric == "kern":
-            # FIXME: This code is never called
-            # Draw left
-            x = layerOrigin.x - DRAGGING_HANDLE_WIDTH * 0.5
-            self._drawDraggingTextLabel("LSB", x, asc, locked)
-            pos = [x]
         else:
+            # Kerning values are drawn by drawKerningValue()
             return
 
         self._drawDraggingMeasurement(pos, asc, desc)
@@ -577,21 +4801,20 @@ class DragToKern(SelectTool):
     def _drawDraggingMeasurement(self, xPositions, asc, desc) -> None:
         top = DRAGGING_HANDLE_HEIGHT * LABEL_VERT_INNER_BIAS
         bot = DRAGGING_HANDLE_HEIGHT - top
+        self.colorSBOuter.set()
         for x in xPositions:
-            bezierPath = NSBezierPath.bezierPathWithRect_(
+            NSBezierPath.fillRect_(
                 NSRect(
                     origin=(x, desc - bot),
                     size=(DRAGGING_HANDLE_WIDTH, DRAGGING_HANDLE_HEIGHT),
                 )
             )
-            bezierPath.appendBezierPathWithRect_(
+            NSBezierPath.fillRect_(
                 NSRect(
                     origin=(x, asc - top),
                     size=(DRAGGING_HANDLE_WIDTH, DRAGGING_HANDLE_HEIGHT),
                 )
             )
-            self.colorSBOuter.set()
-            bezierPath.fill()
 
     @objc.python_method
     def _drawDraggingTextLabel(self, metric, xPosition, asc, locked) -> None:
@@ -601,23 +4824,16 @@ class DragToKern(SelectTool):
         if locked:
             shown_value = "🔒︎"
         else:
+            lsb, rsb = self.draggedMetrics()
             if metric == "LSB":
-                shown_value = "%g" % self.layer2.LSB
+                shown_value = "%g" % lsb
             elif metric == "RSB":
-                shown_value = "%g" % self.layer2.RSB
+                shown_value = "%g" % rsb
             else:
                 return
 
-        attrs = {
-            NSFontAttributeName: NSFont.monospacedDigitSystemFontOfSize_weight_(
-                LABEL_TEXT_SIZE, NSFontWeightRegular
-            ),
-            NSForegroundColorAttributeName: self.colorLabel,
-        }
-        myString = NSString.string().stringByAppendingString_(shown_value)
-        bbox = myString.sizeWithAttributes_(attrs)
-        bw = bbox.width
-        bh = bbox.height
+        render = self.render
+        myString, bw, bh, box = render.label(shown_value)
         text_pt = NSPoint()
         text_pt.y = (
             asc
@@ -633,10 +4849,12 @@ class DragToKern(SelectTool):
             return
 
         rect = NSRect(origin=(text_pt.x, text_pt.y), size=(bw, bh))
-        outer = NSRect(origin=(text_pt.x - 2, text_pt.y - 1), size=(bw + 4, bh + 2))
-        self.colorBox.set()
-        NSBezierPath.bezierPathWithRoundedRect_xRadius_yRadius_(outer, 4, 4).fill()
-        myString.drawInRect_withAttributes_(rect, attrs)
+        NSGraphicsContext.saveGraphicsState()
+        render.concat(1.0, text_pt.x, text_pt.y)
+        render.colorBox.set()
+        box.fill()
+        NSGraphicsContext.restoreGraphicsState()
+        myString.drawInRect_withAttributes_(rect, render.attrs)
 
     @objc.python_method
     def __file__(self) -> str:
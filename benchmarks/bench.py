@@ -0,0 +1,738 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hot paths of the DragToKern tool without Glyphs.
+
+The plugin is loaded on top of the headless GlyphsApp and AppKit stand-ins in
+``benchmarks/headless``. Recorded mouse traces from ``benchmarks/traces`` are
+replayed through the tool's event handlers and drawing callbacks against a
+synthetic font, and the latency of every event is reported as percentiles,
+together with the number of calls into the (fake) Glyphs and AppKit APIs.
+
+The time stamps of the trace events drive a virtual clock, so that throttled
+writes and delayed selectors behave like they would at the recorded speed,
+while the measured latencies are real.
+
+    python3 benchmarks/bench.py
+    python3 benchmarks/bench.py --json results.json
+    python3 benchmarks/bench.py --write-traces
+
+Latencies depend on the machine, but the call counts are deterministic. With
+``--baseline``, the counts are compared to ``benchmarks/baseline.json`` and the
+benchmark fails if any of them went up, so that CI catches code paths that
+start to do more work per event.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import random
+import sys
+from collections import defaultdict
+from pathlib import Path
+from time import perf_counter
+
+BENCHMARKS = Path(__file__).resolve().parent
+PLUGIN = (
+    BENCHMARKS.parent / "DragToKern.glyphsTool" / "Contents" / "Resources" / "plugin.py"
+)
+TRACES = BENCHMARKS / "traces"
+BASELINE = BENCHMARKS / "baseline.json"
+
+sys.path.insert(0, str(BENCHMARKS / "headless"))
+
+import AppKit  # noqa: E402
+from AppKit import CALLS, PERFORM_REQUESTS, runPerformRequests  # noqa: E402
+from GlyphsApp import (  # noqa: E402
+    MOUSEMOVED,
+    GSComponent,
+    GSControlLayer,
+    GSEditViewController,
+    GSFont,
+    GSFontMaster,
+    GSGlyph,
+    GSInstance,
+    GSLayer,
+    GSPath,
+    NSEvent,
+    Glyphs,
+)
+
+# Size of the synthetic font and Edit view
+GLYPH_COUNT = 300
+GROUP_COUNT = 40
+PAIR_COUNT = 10000
+TAB_LENGTH = 800
+LINE_LENGTH = 16
+SCALE = 0.5
+VIEW_WIDTH = 5000.0
+VISIBLE_LINES = 12
+INSTANCE_COUNT = 32
+OPERATION_COUNT = 20000
+SEED = 1
+
+# Event rate of the generated traces
+EVENT_RATE = 120.0
+
+
+def loadPlugin():
+    """
+    Import plugin.py as a module. It picks up the headless stand-ins because
+    they come first on sys.path.
+    """
+    spec = importlib.util.spec_from_file_location("plugin", PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class VirtualClock:
+    """
+    A clock that only moves when the replayed trace says so.
+    """
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def rectangle(x0, y0, x1, y1) -> GSPath:
+    return GSPath([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+
+
+def buildFont() -> GSFont:
+    """
+    Build a font with two masters, kerning groups and PAIR_COUNT kerning pairs
+    per master, mixing glyph and group keys.
+    """
+    rng = random.Random(SEED)
+    masters = [GSFontMaster("Light", "m01"), GSFontMaster("Bold", "m02")]
+    font = GSFont(masters)
+    glyphs = []
+    for i in range(GLYPH_COUNT):
+        glyph = GSGlyph(
+            "g%03d" % i,
+            "L%02d" % rng.randrange(GROUP_COUNT),
+            "R%02d" % rng.randrange(GROUP_COUNT),
+        )
+        font.glyphs.append(glyph)
+        for bold, master in enumerate(masters):
+            lsb = rng.randrange(20, 80)
+            stem = rng.randrange(300, 500) + 40 * bold
+            rsb = rng.randrange(20, 80)
+            glyph.layers[master.id] = GSLayer(
+                master.id, lsb + stem + rsb, [rectangle(lsb, 0, lsb + stem, 500)]
+            )
+        glyphs.append(glyph)
+
+    # Chains of glyphs whose sidebearings are linked by metrics keys
+    for i, glyph in enumerate(glyphs):
+        if i % 5:
+            glyph.leftMetricsKey = "=" + glyphs[i - 1].name
+        if i % 7 == 1:
+            glyph.rightMetricsKey = "=|" + glyphs[i - 1].name
+
+    # Composites built on other glyphs, with or without automatic alignment
+    for i, glyph in enumerate(glyphs):
+        if i % 11 == 3:
+            base = glyphs[i - 3]
+            for master in masters:
+                glyph.layers[master.id] = GSLayer(
+                    master.id,
+                    base.layers[master.id].width,
+                    components=[GSComponent(base.name, automaticAlignment=i % 2)],
+                )
+
+    for master in masters:
+        for _ in range(PAIR_COUNT):
+            kind = rng.randrange(4)
+            left = glyphs[rng.randrange(GLYPH_COUNT)]
+            right = glyphs[rng.randrange(GLYPH_COUNT)]
+            leftKey = "@" + left.rightKerningGroup if kind & 2 else left.name
+            rightKey = "@" + right.leftKerningGroup if kind & 1 else right.name
+            font.setKerningForPair(
+                master.id, leftKey, rightKey, rng.randrange(-80, 20, 5)
+            )
+
+    # The reference glyphs for optical sidebearing suggestions
+    for name in ("n", "H"):
+        glyph = GSGlyph(name)
+        font.glyphs.append(glyph)
+        for master in masters:
+            glyph.layers[master.id] = GSLayer(
+                master.id,
+                560,
+                [rectangle(60, 0, 140, 700), rectangle(420, 0, 500, 700)],
+            )
+    # Instances evenly spaced between the masters
+    for i in range(INSTANCE_COUNT):
+        factor = i / (INSTANCE_COUNT - 1)
+        font.instances.append(
+            GSInstance(
+                "Instance %i" % i,
+                {masters[0].id: 1 - factor, masters[1].id: factor},
+                axes=[factor],
+            )
+        )
+
+    Glyphs.fonts = [font]
+    Glyphs.font = font
+    return font
+
+
+def buildTab(font: GSFont) -> GSEditViewController:
+    """
+    Open an Edit view with TAB_LENGTH glyphs of the first master, broken into
+    lines of LINE_LENGTH glyphs, of which VISIBLE_LINES are visible.
+    """
+    rng = random.Random(SEED)
+    masterId = font.masters[0].id
+    layers = []
+    for i in range(TAB_LENGTH):
+        if i and i % LINE_LENGTH == 0:
+            layers.append(GSControlLayer())
+        glyph = font.glyphs[rng.randrange(GLYPH_COUNT)]
+        layers.append(glyph.layers[masterId])
+    evc = GSEditViewController(font, layers, scale=SCALE, viewWidth=VIEW_WIDTH)
+    # Only the top lines are scrolled into the window
+    gv = evc.graphicView()
+    height = VISIBLE_LINES * (gv.LINE_GAP * 1000 * SCALE)
+    gv.visible = AppKit.NSRect(origin=(0, -height), size=(VIEW_WIDTH, height))
+    Glyphs.currentEditViewController = evc
+    return evc
+
+
+class Recorder:
+    """
+    Collect latency samples in seconds per event type.
+    """
+
+    def __init__(self) -> None:
+        self.samples = defaultdict(list)
+
+    def time(self, name, function, *args):
+        start = perf_counter()
+        result = function(*args)
+        self.samples[name].append(perf_counter() - start)
+        return result
+
+    def summary(self) -> dict:
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            result[name] = {
+                "count": len(samples),
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+                "max": samples[-1],
+                "total": sum(samples),
+            }
+        return result
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """
+    Return the p-th percentile of the sorted samples (nearest rank).
+    """
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, int(round(p / 100 * len(samples))) - 1))
+    return samples[rank]
+
+
+def replay(plugin, trace: dict) -> dict:
+    """
+    Replay one trace against a fresh font and tool and return the latency
+    summary and call counts.
+    """
+    clock = VirtualClock()
+    plugin.monotonic = clock
+    AppKit.clock = clock
+    PERFORM_REQUESTS.clear()
+
+    font = buildFont()
+    evc = buildTab(font)
+    gv = evc.graphicView()
+    gv.doKerningFlag = trace["mode"] == "kerning"
+    gv.doSpacingFlag = trace["mode"] == "spacing"
+    # Settings of the tool that the trace was recorded with
+    defaults = trace.get("defaults", {})
+    saved = {key: Glyphs.defaults.get(key) for key in defaults}
+    Glyphs.defaults.update(defaults)
+    tool = plugin.DragToKern()
+    tool.activate()
+    # Side profiles are computed in worker threads; wait for them so that the
+    # call counts don't depend on thread timing
+    tool.sideProfiles.wait()
+    gv.display(tool)
+
+    recorder = Recorder()
+    handlers = {
+        "move": lambda event: Glyphs.post(MOUSEMOVED),
+        "down": tool.mouseDown_,
+        "drag": tool.mouseDragged_,
+        "up": tool.mouseUp_,
+    }
+
+    def draw(callback, *args):
+        recorder.time("draw", callback, *args)
+
+    CALLS.clear()
+    start = clock.now
+    for item in trace["events"]:
+        clock.now = start + item["t"]
+        if PERFORM_REQUESTS:
+            recorder.time("timer", runPerformRequests, clock.now)
+        modifiers = item.get("modifiers", ())
+        evc.windowController.modifiers = set(modifiers)
+        event = NSEvent(item["x"], item["y"], modifiers=modifiers, timestamp=item["t"])
+        Glyphs.currentEventObject = event
+        recorder.time(item["type"], handlers[item["type"]], event)
+        gv.display(tool, draw)
+    runPerformRequests()
+    tool.deactivate()
+    Glyphs.defaults.update(saved)
+
+    result = {
+        "events": len(trace["events"]),
+        "latency": recorder.summary(),
+        "calls": dict(sorted(CALLS.items())),
+    }
+    if tool.profiler is not None:
+        result["profile"] = tool.profiler.summary()
+    return result
+
+
+def benchmarkCheckHandleLocation(plugin) -> dict:
+    """
+    Call checkHandleLocation for points at both sidebearings and in the middle
+    of every layer in the Edit view.
+    """
+    font = buildFont()
+    evc = buildTab(font)
+    gv = evc.graphicView()
+    gv.doKerningFlag = False
+    gv.doSpacingFlag = True
+    tool = plugin.DragToKern()
+    recorder = Recorder()
+    CALLS.clear()
+    for index, layer in enumerate(evc.composedLayers):
+        if isinstance(layer, GSControlLayer):
+            continue
+        origin = gv.cachedPositionAtIndex_(index)
+        width = layer._width * SCALE
+        for dx in (1, width / 2, width - 1):
+            location = AppKit.NSPoint(origin.x + dx, origin.y + 100)
+            recorder.time(
+                "checkHandleLocation",
+                tool.checkHandleLocation,
+                location,
+                gv,
+                layer,
+                origin,
+            )
+    return {
+        "latency": recorder.summary(),
+        "calls": dict(sorted(CALLS.items())),
+    }
+
+
+def benchmarkApplyKerningTargets(plugin) -> dict:
+    """
+    Write small kerning changes to every adjacent pair in the Edit view, the
+    way a drag session writes them.
+    """
+    font = buildFont()
+    evc = buildTab(font)
+    layers = evc.composedLayers
+    tool = plugin.DragToKern()
+    tool.start()
+    recorder = Recorder()
+    CALLS.clear()
+    for delta in (5, -5):
+        for index, (layer1, layer2) in enumerate(zip(layers, layers[1:]), 1):
+            if isinstance(layer1, GSControlLayer) or isinstance(layer2, GSControlLayer):
+                continue
+            tool.layer2 = layer2
+            if not tool.setupKerning(layers, index):
+                continue
+            session = plugin.DragSession("kern", tool.orig_value, 0.0)
+            session.targets = tool.kerningTargets()
+            session.add(delta, 1)
+            tool.session = session
+            recorder.time("applyKerningTargets", tool.applyKerningTargets)
+    tool.session = None
+    return {
+        "latency": recorder.summary(),
+        "calls": dict(sorted(CALLS.items())),
+    }
+
+
+def benchmarkApplyOperations(plugin) -> dict:
+    """
+    Stream a batch of kerning and spacing operations through the tool's batch
+    API, as one transaction.
+    """
+    font = buildFont()
+    buildTab(font)
+    tool = plugin.DragToKern()
+    tool.start()
+    masterIds = [master.id for master in font.masters]
+    names = [glyph.name for glyph in font.glyphs]
+    kinds = ("kern", "kern", "setKern", "LSB", "RSB", "move")
+
+    def operations():
+        rng = random.Random(SEED)
+        for _ in range(OPERATION_COUNT):
+            kind = rng.choice(kinds)
+            masterId = rng.choice(masterIds)
+            if kind in ("kern", "setKern"):
+                yield kind, masterId, rng.choice(names), rng.choice(names), -5, 5
+            else:
+                yield kind, masterId, rng.choice(names), rng.randrange(-5, 6)
+
+    recorder = Recorder()
+    CALLS.clear()
+    recorder.time("applyOperations", tool.applyOperations, font, operations())
+    return {
+        "latency": recorder.summary(),
+        "calls": dict(sorted(CALLS.items())),
+    }
+
+
+def benchmarkPruneKerning(plugin) -> dict:
+    """
+    Remove the redundant kerning pairs of the whole font, as one transaction.
+    """
+    font = buildFont()
+    buildTab(font)
+    tool = plugin.DragToKern()
+    tool.start()
+    recorder = Recorder()
+    CALLS.clear()
+    pairs = plugin.kerningPairs(font)
+    recorder.time("pruneKerning", tool.pruneKerning, font, pairs)
+    return {
+        "latency": recorder.summary(),
+        "calls": dict(sorted(CALLS.items())),
+    }
+
+
+# Trace generation
+
+
+def event(kind, t, x, y, modifiers=()) -> dict:
+    item = {"type": kind, "t": round(t, 4), "x": round(x, 2), "y": round(y, 2)}
+    if modifiers:
+        item["modifiers"] = sorted(modifiers)
+    return item
+
+
+def dragEvents(t, x, y, offsets, modifiers=()) -> tuple[list[dict], float]:
+    """
+    Return the events for a mouse down at x, y, drags by the given offsets and
+    a mouse up, starting at time t.
+    """
+    events = [event("down", t, x, y, modifiers)]
+    for dx in offsets:
+        t += 1 / EVENT_RATE
+        x += dx
+        events.append(event("drag", t, x, y, modifiers))
+    t += 1 / EVENT_RATE
+    events.append(event("up", t, x, y, modifiers))
+    return events, t
+
+
+def writeTraces() -> None:
+    """
+    Generate the traces from the layout of the synthetic Edit view. The traces
+    are checked in, so that the benchmark replays the same events even if the
+    generator changes.
+    """
+    font = buildFont()
+    evc = buildTab(font)
+    gv = evc.graphicView()
+    layers = evc.composedLayers
+    rng = random.Random(SEED)
+
+    def position(index, dx=0):
+        origin = gv.cachedPositionAtIndex_(index)
+        return origin.x + dx, origin.y + 100
+
+    # Hover: sweep the pointer along the third line and back, in a wavy line
+    line = LINE_LENGTH * 2 + 2
+    x0, y = position(line)
+    x1 = gv.cachedPositionAtIndex_(line + LINE_LENGTH - 1).x
+    events = []
+    t = 0.0
+    for i in range(1500):
+        phase = i / 750 if i < 750 else 2 - i / 750
+        t += 1 / EVENT_RATE
+        events.append(event("move", t, x0 + (x1 - x0) * phase, y + (i % 40) - 20))
+    hover = {
+        "description": "Pointer sweeping over a line of glyphs in spacing mode",
+        "mode": "spacing",
+        "events": events,
+    }
+
+    # Kerning: three slow drags with jitter, the last one in precision mode
+    events = []
+    t = 0.0
+    for index, modifiers in ((40, ()), (60, ()), (80, ("option",))):
+        while isinstance(layers[index], GSControlLayer):
+            index += 1
+        x, y = position(index, layers[index]._width * SCALE / 2)
+        offsets = [rng.choice((-1, 0, 1, 1, 2)) * 0.5 for _ in range(400)]
+        drag, t = dragEvents(t + 0.5, x, y, offsets, modifiers)
+        events.extend(drag)
+    kerning = {
+        "description": "Dragging three kerning pairs, the last one with Option",
+        "mode": "kerning",
+        "events": events,
+    }
+
+    # Spacing: drag an LSB, an RSB, and move a glyph with Command
+    events = []
+    t = 0.0
+    for index, side, modifiers in (
+        (41, "LSB", ()),
+        (61, "RSB", ()),
+        (81, "LSB", ("command",)),
+    ):
+        while isinstance(layers[index], GSControlLayer):
+            index += 1
+        dx = 2 if side == "LSB" else layers[index]._width * SCALE - 2
+        x, y = position(index, dx)
+        for i in range(20):
+            t += 1 / EVENT_RATE
+            events.append(event("move", t, x - 20 + i, y))
+        offsets = [rng.choice((-1, 0, 1, 1, 2)) * 0.5 for _ in range(300)]
+        drag, t = dragEvents(t + 0.1, x, y, offsets, modifiers)
+        events.extend(drag)
+    spacing = {
+        "description": "Dragging an LSB and an RSB, and moving a glyph with Command",
+        "mode": "spacing",
+        "events": events,
+    }
+
+    # The LSB drag, applied to all glyphs in the kerning group. The other drags
+    # would miss their handles, because the group drag changes the layout.
+    end = next(i for i, item in enumerate(events) if item["type"] == "up")
+    groupSpacing = {
+        "description": "Dragging an LSB of a whole kerning group",
+        "mode": "spacing",
+        "defaults": {"com.lucasfonts.DragToKern.spacingScope": "group"},
+        "events": events[: end + 1],
+    }
+
+    # The kerning drags, snapping to the values of related pairs
+    snapKerning = {
+        "description": "Dragging three kerning pairs, snapping to related values",
+        "mode": "kerning",
+        "defaults": {"com.lucasfonts.DragToKern.snapKerning": True},
+        "events": kerning["events"],
+    }
+
+    # The kerning drags, showing the kerning values
+    valuesKerning = {
+        "description": "Dragging three kerning pairs, showing the kerning values",
+        "mode": "kerning",
+        "defaults": {"com.lucasfonts.DragToKern.showKerning": True},
+        "events": kerning["events"],
+    }
+
+    # The kerning drags, showing the gap between the outlines
+    gapKerning = {
+        "description": "Dragging three kerning pairs, showing the gap",
+        "mode": "kerning",
+        "defaults": {"com.lucasfonts.DragToKern.showGap": True},
+        "events": kerning["events"],
+    }
+
+    # The kerning drags in preview mode
+    previewKerning = {
+        "description": "Dragging three kerning pairs in preview mode",
+        "mode": "kerning",
+        "defaults": {"com.lucasfonts.DragToKern.preview": True},
+        "events": kerning["events"],
+    }
+
+    # The kerning drags, showing the kerning in all instances
+    instanceKerning = {
+        "description": "Dragging three kerning pairs, showing all instances",
+        "mode": "kerning",
+        "defaults": {"com.lucasfonts.DragToKern.showInstances": True},
+        "events": kerning["events"],
+    }
+
+    # The hover and spacing drags, with optical sidebearing suggestions
+    suggestSpacing = {
+        "description": "Hovering and dragging sidebearings with optical suggestions",
+        "mode": "spacing",
+        "defaults": {"com.lucasfonts.DragToKern.suggestSpacing": True},
+        "events": hover["events"]
+        + [dict(item, t=item["t"] + hover["events"][-1]["t"]) for item in events],
+    }
+
+    # Kerning in all masters: two slow drags with Command, the last one also
+    # in precision mode
+    events = []
+    t = 0.0
+    for index, modifiers in ((100, ("command",)), (120, ("command", "option"))):
+        while isinstance(layers[index], GSControlLayer):
+            index += 1
+        x, y = position(index, layers[index]._width * SCALE / 2)
+        offsets = [rng.choice((-1, 0, 1, 1, 2)) * 0.5 for _ in range(400)]
+        drag, t = dragEvents(t + 0.5, x, y, offsets, modifiers)
+        events.extend(drag)
+    allMastersKerning = {
+        "description": "Dragging two kerning pairs in all masters with Command",
+        "mode": "kerning",
+        "events": events,
+    }
+
+    TRACES.mkdir(exist_ok=True)
+    for name, trace in (
+        ("hover", hover),
+        ("suggest-spacing", suggestSpacing),
+        ("kern-drag", kerning),
+        ("snap-kern-drag", snapKerning),
+        ("values-kern-drag", valuesKerning),
+        ("gap-kern-drag", gapKerning),
+        ("instance-kern-drag", instanceKerning),
+        ("preview-kern-drag", previewKerning),
+        ("all-masters-kern-drag", allMastersKerning),
+        ("spacing-drag", spacing),
+        ("group-spacing-drag", groupSpacing),
+    ):
+        path = TRACES / ("%s.json" % name)
+        with open(path, "w") as f:
+            json.dump(trace, f, indent=0)
+            f.write("\n")
+        print("Wrote %s (%i events)" % (path, len(trace["events"])))
+
+
+# Reporting
+
+
+def printReport(results: dict) -> None:
+    for name, result in results.items():
+        print()
+        if "events" in result:
+            print("%s (%i events)" % (name, result["events"]))
+        else:
+            print(name)
+        print(
+            "  %-22s %7s %10s %10s %10s %10s"
+            % ("", "count", "p50 µs", "p95 µs", "p99 µs", "max µs")
+        )
+        for kind, stats in result["latency"].items():
+            print(
+                "  %-22s %7i %10.1f %10.1f %10.1f %10.1f"
+                % (
+                    kind,
+                    stats["count"],
+                    stats["p50"] * 1e6,
+                    stats["p95"] * 1e6,
+                    stats["p99"] * 1e6,
+                    stats["max"] * 1e6,
+                )
+            )
+        print("  calls:")
+        for call, count in result["calls"].items():
+            print("    %-46s %8i" % (call, count))
+
+
+def callCounts(results: dict) -> dict:
+    return {name: result["calls"] for name, result in results.items()}
+
+
+def compareBaseline(results: dict, baseline: dict) -> list[str]:
+    """
+    Return a description of every call count that is higher than in the
+    baseline.
+    """
+    regressions = []
+    for name, calls in callCounts(results).items():
+        expected = baseline.get(name, {})
+        for call, count in calls.items():
+            if count > expected.get(call, 0):
+                regressions.append(
+                    "%s: %s %i > %i" % (name, call, count, expected.get(call, 0))
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "traces",
+        nargs="*",
+        help="Trace files to replay (default: all in benchmarks/traces)",
+    )
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument(
+        "--baseline",
+        action="store_true",
+        help="Fail if call counts are higher than in benchmarks/baseline.json",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the call counts to benchmarks/baseline.json",
+    )
+    parser.add_argument(
+        "--profiling",
+        action="store_true",
+        help="Replay the traces with the tool's profiling mode on",
+    )
+    parser.add_argument(
+        "--write-traces",
+        action="store_true",
+        help="Generate the trace files from the synthetic font and exit",
+    )
+    args = parser.parse_args()
+
+    if args.write_traces:
+        writeTraces()
+        return 0
+
+    plugin = loadPlugin()
+    Glyphs.defaults["com.lucasfonts.DragToKern.profiling"] = args.profiling
+    paths = [Path(p) for p in args.traces] or sorted(TRACES.glob("*.json"))
+    results = {}
+    for path in paths:
+        with open(path) as f:
+            trace = json.load(f)
+        results[path.stem] = replay(plugin, trace)
+    results["checkHandleLocation"] = benchmarkCheckHandleLocation(plugin)
+    results["applyKerningTargets"] = benchmarkApplyKerningTargets(plugin)
+    results["applyOperations"] = benchmarkApplyOperations(plugin)
+    results["pruneKerning"] = benchmarkPruneKerning(plugin)
+
+    printReport(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(BASELINE, "w") as f:
+            json.dump(callCounts(results), f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(BASELINE) as f:
+            regressions = compareBaseline(results, json.load(f))
+        if regressions:
+            print()
+            print("Call counts went up compared to the baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
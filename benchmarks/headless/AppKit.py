@@ -0,0 +1,311 @@
+"""
+Headless stand-in for the parts of AppKit used by the plugin.
+
+Drawing calls do nothing but are counted in ``CALLS``, so that the benchmark
+can report how many Objective-C objects a code path would create.
+"""
+
+from collections import Counter
+from time import monotonic
+
+CALLS: Counter = Counter()
+
+NSFontAttributeName = "NSFont"
+NSForegroundColorAttributeName = "NSColor"
+NSFontWeightRegular = 0.0
+
+
+class NSPoint:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __eq__(self, other):
+        try:
+            x, y = other
+        except (TypeError, ValueError):
+            return NotImplemented
+        return self.x == x and self.y == y
+
+    def __repr__(self):
+        return f"NSPoint({self.x}, {self.y})"
+
+
+class NSSize:
+    __slots__ = ("width", "height")
+
+    def __init__(self, width=0.0, height=0.0):
+        self.width = width
+        self.height = height
+
+    def __iter__(self):
+        yield self.width
+        yield self.height
+
+
+class NSRect:
+    __slots__ = ("origin", "size")
+
+    def __init__(self, origin=(0.0, 0.0), size=(0.0, 0.0)):
+        self.origin = NSPoint(*origin)
+        self.size = NSSize(*size)
+
+    def __iter__(self):
+        yield self.origin
+        yield self.size
+
+    def __repr__(self):
+        return "NSRect((%g, %g), (%g, %g))" % (
+            self.origin.x,
+            self.origin.y,
+            self.size.width,
+            self.size.height,
+        )
+
+
+class NSRange:
+    __slots__ = ("location", "length")
+
+    def __init__(self, location=0, length=0):
+        self.location = location
+        self.length = length
+
+    def __iter__(self):
+        yield self.location
+        yield self.length
+
+
+def NSClassFromString(name):
+    return type(name, (), {})
+
+
+class NSObject:
+    @classmethod
+    def alloc(cls):
+        CALLS["NSObject.alloc"] += 1
+        return cls.__new__(cls)
+
+    def init(self):
+        return self
+
+    def respondsToSelector_(self, selector):
+        return hasattr(self, selector.replace(":", "_"))
+
+    @classmethod
+    def cancelPreviousPerformRequestsWithTarget_selector_object_(
+        cls, target, selector, argument
+    ):
+        CALLS["NSObject.cancelPreviousPerformRequests"] += 1
+        PERFORM_REQUESTS[:] = [
+            r for r in PERFORM_REQUESTS if not (r[0] is target and r[1] == selector)
+        ]
+
+
+# Pending performSelector:withObject:afterDelay: requests as
+# (target, selector, argument, due time)
+PERFORM_REQUESTS: list = []
+
+# The clock for delayed selectors. The benchmark replaces it with the virtual
+# clock of a trace.
+clock = monotonic
+
+
+def runPerformRequests(now=None):
+    """
+    Fire the pending delayed selectors that are due at the time now, like the
+    run loop would. If now is None, all requests are fired. Returns the number
+    of fired requests.
+    """
+    due = [r for r in PERFORM_REQUESTS if now is None or r[3] <= now]
+    for request in due:
+        PERFORM_REQUESTS.remove(request)
+    for target, selector, argument, _ in due:
+        getattr(target, selector.replace(":", "_"))(argument)
+    return len(due)
+
+
+class NSScreen(NSObject):
+    frameRate = 60
+
+    @classmethod
+    def mainScreen(cls):
+        return cls()
+
+    def maximumFramesPerSecond(self):
+        return self.frameRate
+
+
+class NSColor(NSObject):
+    def __init__(self, *rgba):
+        self.rgba = rgba
+
+    @classmethod
+    def colorWithCalibratedRed_green_blue_alpha_(cls, r, g, b, a):
+        CALLS["NSColor"] += 1
+        return cls(r, g, b, a)
+
+    @classmethod
+    def textColor(cls):
+        return cls(0, 0, 0, 1)
+
+    @classmethod
+    def textBackgroundColor(cls):
+        return cls(1, 1, 1, 1)
+
+    def set(self):
+        CALLS["NSColor.set"] += 1
+
+
+class NSCursor(NSObject):
+    @classmethod
+    def resizeLeftRightCursor(cls):
+        return cls()
+
+    @classmethod
+    def operationNotAllowedCursor(cls):
+        return cls()
+
+
+class NSFont(NSObject):
+    def __init__(self, size=11):
+        self.size = size
+
+    @classmethod
+    def monospacedDigitSystemFontOfSize_weight_(cls, size, weight):
+        CALLS["NSFont"] += 1
+        return cls(size)
+
+
+class NSAffineTransform(NSObject):
+    @classmethod
+    def transform(cls):
+        CALLS["NSAffineTransform"] += 1
+        return cls()
+
+    def setTransformStruct_(self, struct):
+        pass
+
+    def translateXBy_yBy_(self, x, y):
+        pass
+
+    def scaleBy_(self, s):
+        pass
+
+    def concat(self):
+        pass
+
+
+class NSBezierPath(NSObject):
+    @classmethod
+    def bezierPath(cls):
+        CALLS["NSBezierPath"] += 1
+        return cls()
+
+    @classmethod
+    def bezierPathWithRect_(cls, rect):
+        CALLS["NSBezierPath"] += 1
+        return cls()
+
+    @classmethod
+    def bezierPathWithRoundedRect_xRadius_yRadius_(cls, rect, rx, ry):
+        CALLS["NSBezierPath"] += 1
+        return cls()
+
+    @classmethod
+    def fillRect_(cls, rect):
+        CALLS["NSBezierPath.fill"] += 1
+
+    @classmethod
+    def strokeLineFromPoint_toPoint_(cls, p1, p2):
+        CALLS["NSBezierPath.stroke"] += 1
+
+    def appendBezierPathWithRect_(self, rect):
+        pass
+
+    def moveToPoint_(self, pt):
+        pass
+
+    def lineToPoint_(self, pt):
+        pass
+
+    def setLineWidth_(self, w):
+        pass
+
+    def setLineDash_count_phase_(self, dash, count, phase):
+        pass
+
+    def transformUsingAffineTransform_(self, t):
+        pass
+
+    def copy(self):
+        CALLS["NSBezierPath"] += 1
+        return NSBezierPath()
+
+    def fill(self):
+        CALLS["NSBezierPath.fill"] += 1
+
+    def stroke(self):
+        CALLS["NSBezierPath.stroke"] += 1
+
+
+class NSGradient(NSObject):
+    def initWithStartingColor_endingColor_(self, c1, c2):
+        CALLS["NSGradient"] += 1
+        return self
+
+    def drawInBezierPath_angle_(self, path, angle):
+        CALLS["NSGradient.draw"] += 1
+
+    def drawInRect_angle_(self, rect, angle):
+        CALLS["NSGradient.draw"] += 1
+
+
+class NSString(str):
+    @classmethod
+    def string(cls):
+        CALLS["NSString"] += 1
+        return cls("")
+
+    @classmethod
+    def stringWithString_(cls, s):
+        CALLS["NSString"] += 1
+        return cls(s)
+
+    def stringByAppendingString_(self, s):
+        CALLS["NSString"] += 1
+        return NSString(str(self) + s)
+
+    def sizeWithAttributes_(self, attrs):
+        CALLS["NSString.sizeWithAttributes"] += 1
+        font = attrs.get(NSFontAttributeName)
+        size = getattr(font, "size", 11)
+        return NSSize(0.6 * size * len(self), 1.2 * size)
+
+    def drawInRect_withAttributes_(self, rect, attrs):
+        CALLS["NSString.draw"] += 1
+
+    def drawAtPoint_withAttributes_(self, pt, attrs):
+        CALLS["NSString.draw"] += 1
+
+
+class NSDictionary(dict):
+    @classmethod
+    def dictionaryWithDictionary_(cls, d):
+        CALLS["NSDictionary"] += 1
+        return cls(d)
+
+
+class NSGraphicsContext(NSObject):
+    @classmethod
+    def saveGraphicsState(cls):
+        CALLS["NSGraphicsContext.save"] += 1
+
+    @classmethod
+    def restoreGraphicsState(cls):
+        CALLS["NSGraphicsContext.restore"] += 1
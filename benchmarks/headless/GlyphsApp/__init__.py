@@ -0,0 +1,967 @@
+"""
+Headless stand-in for the parts of the GlyphsApp API used by the plugin.
+
+The objects model just enough of Glyphs to run the tool's event handlers and
+drawing callbacks: a font with masters, glyphs, layers and kerning, and an
+Edit view that lays out a line of layers. Every call that would cross the
+Objective-C bridge in Glyphs is counted in ``CALLS``.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+
+from AppKit import CALLS, NSPoint, NSRange, NSRect
+
+GSLTR = 0
+GSRTL = 1
+MOUSEMOVED = "mouseMovedNotification"
+DOCUMENTACTIVATED = "GSDocumentActivateNotification"
+DOCUMENTWASSAVED = "GSDocumentWasSavedSuccessfully"
+UPDATEINTERFACE = "GSUpdateInterface"
+GSLINE = "line"
+GSCURVE = "curve"
+GSOFFCURVE = "offcurve"
+GSUppercase = 1
+GSLowercase = 2
+NSNotFound = 0x7FFFFFFFFFFFFFFF
+
+
+def _count(name):
+    CALLS[name] += 1
+
+
+# Font model
+
+
+class GSCustomParametersProxy:
+    def __init__(self, parameters=None):
+        self._parameters = dict(parameters or {})
+
+    def __contains__(self, name):
+        _count("GSFontMaster.customParameters")
+        # Glyphs scans the list of parameters
+        for key in self._parameters:
+            if key == name:
+                return True
+        return False
+
+    def __getitem__(self, name):
+        _count("GSFontMaster.customParameters")
+        return self._parameters.get(name)
+
+    def __setitem__(self, name, value):
+        self._parameters[name] = value
+
+    def __delitem__(self, name):
+        del self._parameters[name]
+
+
+class GSFontMaster:
+    def __init__(
+        self,
+        name="Regular",
+        id=None,
+        ascender=750,
+        descender=-250,
+        xHeight=500,
+        capHeight=700,
+        customParameters=None,
+        axes=(),
+    ):
+        self.name = name
+        self.id = id or name
+        self.axes = list(axes)
+        self.ascender = ascender
+        self.descender = descender
+        self.xHeight = xHeight
+        self.capHeight = capHeight
+        self.customParameters = GSCustomParametersProxy(customParameters)
+        self.font = None
+
+
+class GSInstance:
+    def __init__(self, name, instanceInterpolations, axes=(), exports=True):
+        self.name = name
+        self._interpolations = dict(instanceInterpolations)
+        self.axes = list(axes)
+        self.exports = exports
+
+    @property
+    def instanceInterpolations(self):
+        _count("GSInstance.instanceInterpolations")
+        return self._interpolations
+
+
+class GSNode:
+    def __init__(self, pt, type=GSLINE):
+        self.position = NSPoint(*pt)
+        self.type = type
+
+    @property
+    def x(self):
+        return self.position.x
+
+    @property
+    def y(self):
+        return self.position.y
+
+
+class GSPath:
+    def __init__(self, nodes=(), closed=True):
+        self.nodes = [n if isinstance(n, GSNode) else GSNode(n) for n in nodes]
+        self.closed = closed
+
+
+class GSComponent:
+    def __init__(self, componentName, position=(0, 0), automaticAlignment=False):
+        self.componentName = componentName
+        self.position = NSPoint(*position)
+        self.transform = (1, 0, 0, 1, position[0], position[1])
+        self.automaticAlignment = automaticAlignment
+        self.parent = None
+
+    @property
+    def component(self):
+        return self.parent.parent.parent.glyphs[self.componentName]
+
+
+class GSLayer:
+    def __init__(self, associatedMasterId=None, width=500, paths=(), components=()):
+        self.associatedMasterId = associatedMasterId
+        self.layerId = associatedMasterId
+        self._width = width
+        self.paths = [p if isinstance(p, GSPath) else GSPath(p) for p in paths]
+        self.components = list(components)
+        for c in self.components:
+            c.parent = self
+        self.parent = None
+        self.leftMetricsKey = None
+        self.rightMetricsKey = None
+        self.widthMetricsKey = None
+
+    def __repr__(self):
+        name = self.parent.name if self.parent is not None else None
+        return "<GSLayer %s (%s)>" % (name, self.associatedMasterId)
+
+    def className(self):
+        return "GSLayer"
+
+    def isKindOfClass_(self, cls):
+        return isinstance(self, cls)
+
+    # Metrics
+
+    @property
+    def master(self):
+        _count("GSLayer.master")
+        font = self.parent.parent
+        for master in font.masters:
+            if master.id == self.associatedMasterId:
+                return master
+        raise KeyError(self.associatedMasterId)
+
+    def _allPoints(self):
+        for path in self.paths:
+            for node in path.nodes:
+                yield node.position.x, node.position.y
+        for component in self.components:
+            base = component.component.layers[self.associatedMasterId]
+            dx, dy = component.position
+            for x, y in base._allPoints():
+                yield x + dx, y + dy
+
+    def _xExtremes(self):
+        xs = [x for x, _ in self._allPoints()]
+        if not xs:
+            return None
+        return min(xs), max(xs)
+
+    @property
+    def bounds(self):
+        points = list(self._allPoints())
+        if not points:
+            return NSRect(origin=(0, 0), size=(0, 0))
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        return NSRect(
+            origin=(min(xs), min(ys)), size=(max(xs) - min(xs), max(ys) - min(ys))
+        )
+
+    @property
+    def width(self):
+        _count("GSLayer.width")
+        return self._width
+
+    @width.setter
+    def width(self, value):
+        _count("GSLayer.setWidth")
+        self._width = value
+        self._changed()
+
+    @property
+    def LSB(self):
+        _count("GSLayer.LSB")
+        extremes = self._xExtremes()
+        return 0 if extremes is None else extremes[0]
+
+    @LSB.setter
+    def LSB(self, value):
+        _count("GSLayer.setLSB")
+        extremes = self._xExtremes()
+        if extremes is None:
+            return
+        delta = value - extremes[0]
+        self._shift(delta)
+        self._width += delta
+        self._changed()
+
+    @property
+    def RSB(self):
+        _count("GSLayer.RSB")
+        extremes = self._xExtremes()
+        return 0 if extremes is None else self._width - extremes[1]
+
+    @RSB.setter
+    def RSB(self, value):
+        _count("GSLayer.setRSB")
+        extremes = self._xExtremes()
+        if extremes is None:
+            return
+        self._width += value - (self._width - extremes[1])
+        self._changed()
+
+    def _shift(self, delta):
+        for path in self.paths:
+            for node in path.nodes:
+                node.position = NSPoint(node.position.x + delta, node.position.y)
+        for component in self.components:
+            x, y = component.position
+            component.position = NSPoint(x + delta, y)
+
+    def _changed(self):
+        _count("notification")
+        if self.parent is not None:
+            self.parent.lastChange += 1
+            if self.parent.parent is not None:
+                self.parent.parent._invalidateLayout()
+
+    def _metricsKeyValue(self, key):
+        """
+        Evaluate a metrics key of the forms "=name", "=name+10" or "=|name".
+        The value is the same side of the other glyph, or the opposite side
+        with "|". Returns the other layer, whether the opposite side is meant,
+        and the offset, or None.
+        """
+        m = _METRICS_KEY.match(key or "")
+        if m is None:
+            return None
+        opposite, name, offset = m.groups()
+        glyph = self.parent.parent.glyphs[name]
+        if glyph is None:
+            return None
+        layer = glyph.layers[self.associatedMasterId]
+        offset = int(offset.replace(" ", "")) if offset else 0
+        return layer, bool(opposite), offset
+
+    def syncMetrics(self):
+        _count("GSLayer.syncMetrics")
+        glyph = self.parent
+        for side in ("width", "left", "right"):
+            key = getattr(self, side + "MetricsKey") or getattr(
+                glyph, side + "MetricsKey"
+            )
+            result = self._metricsKeyValue(key)
+            if result is None:
+                continue
+            layer, opposite, offset = result
+            if side == "width":
+                self.width = layer._width + offset
+            elif side == "left":
+                self.LSB = (layer.RSB if opposite else layer.LSB) + offset
+            else:
+                self.RSB = (layer.LSB if opposite else layer.RSB) + offset
+
+    def updateMetrics(self):
+        _count("GSLayer.updateMetrics")
+        if self.components and self.components[0].automaticAlignment:
+            base = self.components[0].component.layers[self.associatedMasterId]
+            self._width = base._width
+            self._changed()
+
+    def _intersectionsAt(self, y):
+        xs = []
+        for path in self.paths:
+            points = [node.position for node in path.nodes]
+            for p0, p1 in zip(points, points[1:] + points[:1]):
+                if (p0.y <= y < p1.y) or (p1.y <= y < p0.y):
+                    t = (y - p0.y) / (p1.y - p0.y)
+                    xs.append(p0.x + t * (p1.x - p0.x))
+        for component in self.components:
+            base = component.component.layers[self.associatedMasterId]
+            dx, dy = component.position
+            xs.extend(x + dx for x in base._intersectionsAt(y - dy))
+        return xs
+
+    def intersectionsBetweenPoints(self, startPoint, endPoint, components=False):
+        """
+        Only horizontal lines are supported. Like in Glyphs, the result
+        includes the start and end point.
+        """
+        _count("GSLayer.intersectionsBetweenPoints")
+        (x0, y), (x1, _) = startPoint, endPoint
+        xs = sorted(x for x in self._intersectionsAt(y) if x0 <= x <= x1)
+        return [NSPoint(x0, y)] + [NSPoint(x, y) for x in xs] + [NSPoint(x1, y)]
+
+    @property
+    def completeBezierPath(self):
+        from AppKit import NSBezierPath
+
+        _count("GSLayer.completeBezierPath")
+        return NSBezierPath.bezierPath()
+
+    # Kerning
+
+    def _kerningPair(self, layer1, direction):
+        """
+        Return the keys and value of the kerning pair that applies between
+        layer1 (first) and self (second).
+        """
+        font = self.parent.parent
+        masterId = self.associatedMasterId
+        for left, right in font._pairKeys(layer1.parent, self.parent, direction):
+            value = font._rawValue(masterId, left, right, direction)
+            if value is not None:
+                return left, right, value
+        left, right = font._pairKeys(layer1.parent, self.parent, direction)[-1]
+        return left, right, None
+
+    def previousKerningForLayer_direction_(self, layer1, direction):
+        _count("GSLayer.previousKerningForLayer_direction_")
+        return self._kerningPair(layer1, direction)[2]
+
+    def setPreviousKerning_forLayer_direction_(self, value, layer1, direction):
+        _count("GSLayer.setPreviousKerning_forLayer_direction_")
+        left, right, _ = self._kerningPair(layer1, direction)
+        font = self.parent.parent
+        font.setKerningForPair(self.associatedMasterId, left, right, value, direction)
+
+    def setNextKerningExeption_forLayer_direction_(self, flag, layer2, direction):
+        _count("GSLayer.setNextKerningExeption_forLayer_direction_")
+        layer2._setException(flag, self, direction, side=0)
+
+    def setPreviousKerningExeption_forLayer_direction_(self, flag, layer1, direction):
+        _count("GSLayer.setPreviousKerningExeption_forLayer_direction_")
+        self._setException(flag, layer1, direction, side=1)
+
+    def _setException(self, flag, layer1, direction, side):
+        font = self.parent.parent
+        masterId = self.associatedMasterId
+        left, right, value = self._kerningPair(layer1, direction)
+        keys = [left, right]
+        glyphName = (layer1.parent if side == 0 else self.parent).name
+        if flag:
+            if keys[side] == glyphName:
+                return
+            keys[side] = glyphName
+            font.setKerningForPair(masterId, keys[0], keys[1], value or 0, direction)
+        elif keys[side] == glyphName:
+            font.removeKerningForPair(masterId, keys[0], keys[1], direction)
+
+
+_METRICS_KEY = re.compile(
+    r"=(\|)?([A-Za-z_][\w.]*(?:-[A-Za-z_][\w.]*)*)\s*([+-]\s*\d+)?$"
+)
+
+
+class GSControlLayer(GSLayer):
+    def __init__(self, char=10):
+        super().__init__(None, 0)
+        self.char = char
+
+    def className(self):
+        return "GSControlLayer"
+
+    @property
+    def master(self):
+        raise KeyError("control layer")
+
+
+class GSLayersProxy:
+    def __init__(self, glyph):
+        self._glyph = glyph
+        self._layers = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            key = self._glyph.parent.masters[key].id
+        return self._layers.get(key)
+
+    def __setitem__(self, key, layer):
+        layer.associatedMasterId = key
+        layer.layerId = key
+        layer.parent = self._glyph
+        self._layers[key] = layer
+
+    def __iter__(self):
+        return iter(self._layers.values())
+
+    def __len__(self):
+        return len(self._layers)
+
+    def values(self):
+        return list(self._layers.values())
+
+
+class GSGlyph:
+    _nextId = 0
+
+    def __init__(self, name, leftKerningGroup=None, rightKerningGroup=None):
+        GSGlyph._nextId += 1
+        self.name = name
+        self.id = "id%05d" % GSGlyph._nextId
+        self.leftKerningGroup = leftKerningGroup
+        self.rightKerningGroup = rightKerningGroup
+        self.leftMetricsKey = None
+        self.rightMetricsKey = None
+        self.widthMetricsKey = None
+        self.layers = GSLayersProxy(self)
+        self.parent = None
+        self.case = 0
+        self.undoLevel = 0
+        self.lastChange = 0
+
+    def __repr__(self):
+        return "<GSGlyph %s>" % self.name
+
+    def beginUndo(self):
+        _count("GSGlyph.beginUndo")
+        self.undoLevel += 1
+
+    def endUndo(self):
+        _count("GSGlyph.endUndo")
+        self.undoLevel -= 1
+
+    def undoManager(self):
+        return self.parent.undoManager()
+
+
+class GSGlyphsProxy:
+    def __init__(self, font):
+        self._font = font
+        self._glyphs = []
+        self._byName = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._glyphs[key]
+        return self._byName.get(key)
+
+    def append(self, glyph):
+        glyph.parent = self._font
+        self._glyphs.append(glyph)
+        self._byName[glyph.name] = glyph
+
+    def __iter__(self):
+        return iter(list(self._glyphs))
+
+    def __len__(self):
+        return len(self._glyphs)
+
+
+class NSUndoManager:
+    def __init__(self):
+        self.groupingLevel = 0
+        self.groups = 0
+
+    def beginUndoGrouping(self):
+        _count("NSUndoManager.beginUndoGrouping")
+        self.groupingLevel += 1
+        if self.groupingLevel == 1:
+            self.groups += 1
+
+    def endUndoGrouping(self):
+        _count("NSUndoManager.endUndoGrouping")
+        self.groupingLevel -= 1
+
+    def registerUndoWithTarget_selector_object_(self, target, selector, argument):
+        _count("NSUndoManager.registerUndo")
+        self.stack = getattr(self, "stack", [])
+        self.stack.append((target, selector, argument))
+
+    def setActionName_(self, name):
+        self.actionName = name
+
+    def undo(self):
+        target, selector, argument = self.stack.pop()
+        getattr(target, selector.replace(":", "_"))(argument)
+
+
+class GSFont:
+    def __init__(self, masters=(), filepath=None):
+        self.masters = list(masters)
+        for master in self.masters:
+            master.font = self
+        self.glyphs = GSGlyphsProxy(self)
+        self.kerning = {m.id: {} for m in self.masters}
+        self.kerningRTL = {m.id: {} for m in self.masters}
+        self.filepath = filepath
+        self.instances = []
+        self.upm = 1000
+        self._undoManager = NSUndoManager()
+        self._updateInterfaceDisabled = 0
+        self.editViewControllers = []
+        self.selectedLayers = []
+
+    def undoManager(self):
+        return self._undoManager
+
+    def disableUpdateInterface(self):
+        _count("GSFont.disableUpdateInterface")
+        self._updateInterfaceDisabled += 1
+
+    def enableUpdateInterface(self):
+        _count("GSFont.enableUpdateInterface")
+        self._updateInterfaceDisabled -= 1
+        if not self._updateInterfaceDisabled:
+            self._invalidateLayout()
+
+    def _invalidateLayout(self):
+        if self._updateInterfaceDisabled:
+            return
+        _count("relayout")
+        for evc in self.editViewControllers:
+            evc.graphicView()._layoutValid = False
+            evc.graphicView().setNeedsDisplay_(True)
+
+    # Kerning keys
+
+    def _kerningDict(self, direction):
+        return self.kerningRTL if direction == GSRTL else self.kerning
+
+    def _rawKey(self, key, side):
+        if key.startswith("@MMK_"):
+            return key
+        if key.startswith("@"):
+            return ("@MMK_L_" if side == 0 else "@MMK_R_") + key[1:]
+        glyph = self.glyphs[key]
+        return key if glyph is None else glyph.id
+
+    def _pairKeys(self, glyph1, glyph2, direction):
+        if direction == GSRTL:
+            group1, group2 = glyph1.leftKerningGroup, glyph2.rightKerningGroup
+        else:
+            group1, group2 = glyph1.rightKerningGroup, glyph2.leftKerningGroup
+        lefts = [glyph1.name] + (["@" + group1] if group1 else [])
+        rights = [glyph2.name] + (["@" + group2] if group2 else [])
+        keys = []
+        for left in lefts:
+            for right in rights:
+                keys.append((left, right))
+        # glyph-glyph, glyph-group, group-glyph, group-group
+        return keys
+
+    def _rawValue(self, masterId, left, right, direction):
+        kerning = self._kerningDict(direction).get(masterId, {})
+        row = kerning.get(self._rawKey(left, 0))
+        if row is None:
+            return None
+        return row.get(self._rawKey(right, 1))
+
+    def kerningForPair(self, masterId, left, right, direction=GSLTR):
+        _count("GSFont.kerningForPair")
+        return self._rawValue(masterId, left, right, direction)
+
+    def setKerningForPair(self, masterId, left, right, value, direction=GSLTR):
+        _count("GSFont.setKerningForPair")
+        kerning = self._kerningDict(direction).setdefault(masterId, {})
+        kerning.setdefault(self._rawKey(left, 0), {})[self._rawKey(right, 1)] = value
+        self._invalidateLayout()
+
+    def removeKerningForPair(self, masterId, left, right, direction=GSLTR):
+        _count("GSFont.removeKerningForPair")
+        kerning = self._kerningDict(direction).get(masterId, {})
+        rawLeft = self._rawKey(left, 0)
+        row = kerning.get(rawLeft)
+        if row is not None:
+            row.pop(self._rawKey(right, 1), None)
+            if not row:
+                del kerning[rawLeft]
+        self._invalidateLayout()
+
+    def glyphForId_(self, glyphId):
+        for glyph in self.glyphs:
+            if glyph.id == glyphId:
+                return glyph
+        return None
+
+
+# Edit view
+
+
+class NSEvent:
+    def __init__(
+        self,
+        x=0.0,
+        y=0.0,
+        clickCount=1,
+        characters="",
+        modifiers=(),
+        timestamp=0.0,
+    ):
+        self._location = NSPoint(x, y)
+        self._clickCount = clickCount
+        self._characters = characters
+        self.modifiers = set(modifiers)
+        self._timestamp = timestamp
+
+    def locationInWindow(self):
+        _count("NSEvent.locationInWindow")
+        return self._location
+
+    def clickCount(self):
+        return self._clickCount
+
+    def characters(self):
+        return self._characters
+
+    def charactersIgnoringModifiers(self):
+        return self._characters
+
+    def modifierFlags(self):
+        flags = 0
+        for name, bit in (
+            ("shift", 17),
+            ("control", 18),
+            ("option", 19),
+            ("command", 20),
+        ):
+            if name in self.modifiers:
+                flags |= 1 << bit
+        return flags
+
+    def timestamp(self):
+        return self._timestamp
+
+
+class GSAppearance:
+    def __init__(self, name="NSAppearanceNameAqua"):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+
+class GSGraphicView:
+    LINE_GAP = 1.25
+
+    def __init__(self, evc, scale=0.5, viewWidth=2000.0):
+        self._evc = evc
+        self._scale = scale
+        self._viewWidth = viewWidth
+        self._positions = []
+        self._lines = []
+        self._lineHeight = 0
+        self._layoutValid = False
+        self.dirtyRects = []
+        self.needsFullDisplay = False
+        # The part of the view that is scrolled into the window
+        self.visible = None
+        self.doKerningFlag = True
+        self.doSpacingFlag = False
+        self.appearance = GSAppearance()
+        # The selected layers as (location, length)
+        self.selection = (0, 0)
+
+    def scale(self):
+        _count("GSGraphicView.scale")
+        return self._scale
+
+    def setScale_(self, scale):
+        self._scale = scale
+        self._layoutValid = False
+
+    def doKerning(self):
+        _count("GSGraphicView.doKerning")
+        return self.doKerningFlag
+
+    def doSpacing(self):
+        _count("GSGraphicView.doSpacing")
+        return self.doSpacingFlag
+
+    def effectiveAppearance(self):
+        return self.appearance
+
+    def convertPoint_fromView_(self, point, view):
+        _count("GSGraphicView.convertPoint_fromView_")
+        return NSPoint(point.x, point.y)
+
+    def _layout(self):
+        if self._layoutValid:
+            return
+        _count("layout")
+        layers = self._evc._layers
+        font = self._evc.font
+        master = font.masters[self._evc.masterIndex]
+        scale = self._scale
+        self._lineHeight = (master.ascender - master.descender) * self.LINE_GAP
+        direction = self._evc.direction
+        x = 0.0
+        y = -master.ascender
+        positions = []
+        # Per line: baseline y and the x positions and indices of its layers
+        lines = [(y * scale, [], [])]
+        previous = None
+        for index, layer in enumerate(layers):
+            if isinstance(layer, GSControlLayer):
+                positions.append(NSPoint(x * scale, y * scale))
+                x = 0.0
+                y -= self._lineHeight
+                lines.append((y * scale, [], []))
+                previous = None
+                continue
+            if previous is not None:
+                kern = layer._kerningPair(previous, direction)[2]
+                if kern is not None:
+                    x += kern
+            if x > 0 and (x + layer._width) * scale > self._viewWidth:
+                # Wrap the line
+                x = 0.0
+                y -= self._lineHeight
+                lines.append((y * scale, [], []))
+            positions.append(NSPoint(x * scale, y * scale))
+            lines[-1][1].append(x * scale)
+            lines[-1][2].append(index)
+            x += layer._width
+            previous = layer
+        self._positions = positions
+        self._lines = lines
+        self._layoutValid = True
+
+    def cachedPositionAtIndex_(self, index):
+        _count("GSGraphicView.cachedPositionAtIndex_")
+        self._layout()
+        return self._positions[index]
+
+    def layerIndexForPoint_(self, point):
+        _count("GSGraphicView.layerIndexForPoint_")
+        self._layout()
+        master = self._evc.font.masters[self._evc.masterIndex]
+        scale = self._scale
+        for baseline, xs, indices in self._lines:
+            top = baseline + master.ascender * scale
+            if not (top - self._lineHeight * scale <= point.y <= top):
+                continue
+            i = bisect_right(xs, point.x) - 1
+            if i < 0:
+                return NSNotFound
+            index = indices[i]
+            if point.x < xs[i] + self._evc._layers[index]._width * scale:
+                return index
+            return NSNotFound
+        return NSNotFound
+
+    def cachedLayerSelectionRange(self):
+        return NSRange(*self.selection)
+
+    def bounds(self):
+        return NSRect(origin=(0, -1e6), size=(self._viewWidth, 2e6))
+
+    def visibleRect(self):
+        return self.bounds() if self.visible is None else self.visible
+
+    def setNeedsDisplay_(self, flag):
+        _count("GSGraphicView.setNeedsDisplay_")
+        if flag:
+            self.needsFullDisplay = True
+
+    def setNeedsDisplayInRect_(self, rect):
+        _count("GSGraphicView.setNeedsDisplayInRect_")
+        self.dirtyRects.append(rect)
+
+    def drawLayer_atPoint_asActive_attributes_(self, layer, origin, active, attributes):
+        _count("GSGraphicView.drawLayer")
+
+    def display(self, tool, draw=None):
+        """
+        Draw the dirty parts of the view by calling the tool's draw callback
+        for every affected layer, like Glyphs would. If draw is given, it is
+        called with the callback and its arguments instead, so that the caller
+        can time it. Returns the number of layers drawn.
+        """
+        if not self.needsFullDisplay and not self.dirtyRects:
+            return 0
+        self._layout()
+        layers = self._evc._layers
+        master = self._evc.font.masters[self._evc.masterIndex]
+        scale = self._scale
+        callback = tool.drawLayer_atPoint_asActive_attributes_
+        drawn = 0
+        for baseline, xs, indices in self._lines:
+            y0 = baseline + master.descender * scale
+            y1 = baseline + master.ascender * scale
+            rects = self.dirtyRects
+            if self.needsFullDisplay:
+                rects = [self.visibleRect()]
+            if rects:
+                rects = [
+                    r
+                    for r in rects
+                    if r.origin.y <= y1 and y0 <= r.origin.y + r.size.height
+                ]
+                if not rects:
+                    continue
+            for x0, index in zip(xs, indices):
+                layer = layers[index]
+                if rects:
+                    x1 = x0 + layer._width * scale
+                    for r in rects:
+                        if r.origin.x <= x1 and x0 <= r.origin.x + r.size.width:
+                            break
+                    else:
+                        continue
+                args = (layer, NSPoint(x0, baseline), False, {})
+                if draw is None:
+                    callback(*args)
+                else:
+                    draw(callback, *args)
+                drawn += 1
+        self.needsFullDisplay = False
+        self.dirtyRects = []
+        return drawn
+
+
+class GSWindowController:
+    def __init__(self):
+        self.modifiers = set()
+        self.tool = None
+
+    def CommandKey(self):
+        return "command" in self.modifiers
+
+    def AltKey(self):
+        return "option" in self.modifiers
+
+    def ShiftKey(self):
+        return "shift" in self.modifiers
+
+    def setToolForClass_(self, cls):
+        self.tool = cls
+
+    def toolEventDelegate(self):
+        return None
+
+
+class GSEditViewController:
+    def __init__(self, font, layers, masterIndex=0, scale=0.5, viewWidth=2000.0):
+        self.font = font
+        self._layers = list(layers)
+        self.masterIndex = masterIndex
+        self.direction = GSLTR
+        self.windowController = GSWindowController()
+        self._graphicView = GSGraphicView(self, scale, viewWidth)
+        font.editViewControllers.append(self)
+
+    @property
+    def composedLayers(self):
+        _count("GSEditViewController.composedLayers")
+        return self._layers
+
+    @property
+    def text(self):
+        return "".join(
+            "\n" if isinstance(layer, GSControlLayer) else "/" + layer.parent.name
+            for layer in self._layers
+        )
+
+    @property
+    def scale(self):
+        _count("GSEditViewController.scale")
+        return self._graphicView._scale
+
+    @property
+    def masterIndex(self):
+        return self._masterIndex
+
+    @masterIndex.setter
+    def masterIndex(self, value):
+        self._masterIndex = value
+
+    def representedObject(self):
+        return self.font
+
+    def graphicView(self):
+        return self._graphicView
+
+    def forceRedraw(self):
+        _count("GSEditViewController.forceRedraw")
+        self._graphicView.setNeedsDisplay_(True)
+
+
+# Application
+
+
+class _Defaults(dict):
+    def __getitem__(self, key):
+        return self.get(key)
+
+
+class _Glyphs:
+    def __init__(self):
+        self.defaults = _Defaults()
+        self.callbacks = {}
+        self.currentEditViewController = None
+        self.currentEventObject = None
+        self.font = None
+        self.fonts = []
+        self.notifications = []
+
+    def localize(self, strings):
+        return strings.get("en")
+
+    def addCallback(self, function, event):
+        self.callbacks.setdefault(event, []).append(function)
+
+    def removeCallback(self, function, event=None):
+        for callbacks in self.callbacks.values():
+            if function in callbacks:
+                callbacks.remove(function)
+
+    def post(self, event, notification=None):
+        for function in list(self.callbacks.get(event, [])):
+            function(notification)
+
+    def redraw(self):
+        _count("Glyphs.redraw")
+        for font in self.fonts:
+            for evc in font.editViewControllers:
+                evc.graphicView().setNeedsDisplay_(True)
+
+    def currentEvent(self):
+        _count("Glyphs.currentEvent")
+        return self.currentEventObject
+
+    def showNotification(self, title, message):
+        self.notifications.append((title, message))
+
+
+Glyphs = _Glyphs()
+
+
+# Dialogs
+
+# The path that GetSaveFile returns
+SAVE_FILE_PATH = None
+
+
+def GetSaveFile(message=None, ProposedFileName=None, filetypes=None):
+    return SAVE_FILE_PATH
+
+
+# The path that GetOpenFile returns
+OPEN_FILE_PATH = None
+
+
+def GetOpenFile(message=None, allowsMultipleSelection=False, filetypes=None, path=None):
+    return OPEN_FILE_PATH
@@ -0,0 +1,41 @@
+"""
+Headless stand-in for ``GlyphsApp.plugins``.
+"""
+
+import AppKit
+import GlyphsApp
+from AppKit import PERFORM_REQUESTS
+
+
+class SelectTool:
+    def __init__(self):
+        self.settings()
+        self.start()
+
+    @classmethod
+    def alloc(cls):
+        return cls.__new__(cls)
+
+    def init(self):
+        self.__init__()
+        return self
+
+    def settings(self):
+        pass
+
+    def start(self):
+        pass
+
+    def editViewController(self):
+        return GlyphsApp.Glyphs.currentEditViewController
+
+    def windowController(self):
+        evc = GlyphsApp.Glyphs.currentEditViewController
+        return None if evc is None else evc.windowController
+
+    def performSelector_withObject_afterDelay_(self, selector, argument, delay):
+        GlyphsApp.CALLS["performSelector"] += 1
+        PERFORM_REQUESTS.append((self, selector, argument, AppKit.clock() + delay))
+
+    def keyDown_(self, theEvent):
+        GlyphsApp.CALLS["SelectTool.keyDown_"] += 1
@@ -0,0 +1,30 @@
+"""
+Headless stand-in for the parts of PyObjC used by the plugin.
+"""
+
+import sys
+
+
+def python_method(function):
+    return function
+
+
+class _Super:
+    def __init__(self, cls, instance):
+        self._super = super(cls, instance)
+
+    def __getattr__(self, name):
+        return getattr(self._super, name)
+
+
+def super(*args):
+    if args:
+        return _Super(*args)
+    frame = sys._getframe(1)
+    instance = frame.f_locals["self"]
+    code = frame.f_code
+    for cls in type(instance).__mro__:
+        function = cls.__dict__.get(code.co_name)
+        if getattr(function, "__code__", None) is code:
+            return _Super(cls, instance)
+    return _Super(type(instance), instance)
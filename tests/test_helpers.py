@@ -0,0 +1,335 @@
+"""
+Behaviour checks for the helper functions of the DragToKern tool, run against
+the headless GlyphsApp and AppKit stand-ins from ``benchmarks/headless``.
+
+    python3 -m unittest discover tests
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PLUGIN = ROOT / "DragToKern.glyphsTool" / "Contents" / "Resources" / "plugin.py"
+
+sys.path.insert(0, str(ROOT / "benchmarks" / "headless"))
+
+from GlyphsApp import (  # noqa: E402
+    GSComponent,
+    GSEditViewController,
+    GSFont,
+    GSFontMaster,
+    GSGlyph,
+    GSLayer,
+    Glyphs,
+)
+
+
+def loadPlugin():
+    spec = importlib.util.spec_from_file_location("plugin", PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+plugin = loadPlugin()
+
+
+def buildFont(masterNames=("Regular",)) -> GSFont:
+    """
+    Build a font with the glyphs T, o and odieresis, with T in the kerning
+    group T, and o and odieresis in the kerning group o.
+    """
+    masters = [GSFontMaster(name) for name in masterNames]
+    font = GSFont(masters)
+    for name, group in (("T", "T"), ("o", "o"), ("odieresis", "o"), ("n", None)):
+        glyph = GSGlyph(name, group, group)
+        font.glyphs.append(glyph)
+        for master in masters:
+            glyph.layers[master.id] = GSLayer(master.id, 500)
+    Glyphs.fonts = [font]
+    Glyphs.font = font
+    return font
+
+
+def buildTool(font):
+    Glyphs.currentEditViewController = GSEditViewController(
+        font, [font.glyphs["T"].layers[font.masters[0].id]]
+    )
+    tool = plugin.DragToKern()
+    tool.start()
+    return tool
+
+
+class ResolveKerningPairTest(unittest.TestCase):
+    def test_group_pair(self):
+        font = buildFont()
+        font.setKerningForPair("Regular", "@T", "@o", -50)
+        glyph1, glyph2 = font.glyphs["T"], font.glyphs["odieresis"]
+        self.assertEqual(
+            plugin.resolveKerningPair(font, "Regular", glyph1, glyph2),
+            ("@T", "@o", -50),
+        )
+
+    def test_exception_wins_over_group(self):
+        font = buildFont()
+        font.setKerningForPair("Regular", "@T", "@o", -50)
+        font.setKerningForPair("Regular", "T", "odieresis", -20)
+        glyph1, glyph2 = font.glyphs["T"], font.glyphs["odieresis"]
+        self.assertEqual(
+            plugin.resolveKerningPair(font, "Regular", glyph1, glyph2),
+            ("T", "odieresis", -20),
+        )
+
+    def test_missing_pair(self):
+        font = buildFont()
+        glyph1, glyph2 = font.glyphs["T"], font.glyphs["o"]
+        self.assertEqual(
+            plugin.resolveKerningPair(font, "Regular", glyph1, glyph2),
+            ("@T", "@o", None),
+        )
+
+
+class IsRedundantPairTest(unittest.TestCase):
+    def isRedundant(self, font, left, right):
+        groupIndex = plugin.KerningGroupIndex(font)
+        groupIndex.update()
+        return plugin.isRedundantPair(font, groupIndex, "Regular", left, right)
+
+    def test_group_pair_with_zero(self):
+        font = buildFont()
+        font.setKerningForPair("Regular", "@T", "@o", 0)
+        self.assertTrue(self.isRedundant(font, "@T", "@o"))
+        font.setKerningForPair("Regular", "@T", "@o", -10)
+        self.assertFalse(self.isRedundant(font, "@T", "@o"))
+
+    def test_exception_with_group_value(self):
+        font = buildFont()
+        font.setKerningForPair("Regular", "@T", "@o", -50)
+        font.setKerningForPair("Regular", "T", "odieresis", -50)
+        self.assertTrue(self.isRedundant(font, "T", "odieresis"))
+        font.setKerningForPair("Regular", "T", "odieresis", -40)
+        self.assertFalse(self.isRedundant(font, "T", "odieresis"))
+
+    def test_group_exception_hidden_by_glyph_pairs(self):
+        # T/@o differs from @T/@o, but only for o and odieresis, which both
+        # have their own exception with the value of @T/@o
+        font = buildFont()
+        font.setKerningForPair("Regular", "@T", "@o", -50)
+        font.setKerningForPair("Regular", "T", "@o", -30)
+        self.assertFalse(self.isRedundant(font, "T", "@o"))
+        font.setKerningForPair("Regular", "T", "o", -50)
+        font.setKerningForPair("Regular", "T", "odieresis", -50)
+        self.assertTrue(self.isRedundant(font, "T", "@o"))
+
+    def test_missing_pair(self):
+        font = buildFont()
+        self.assertFalse(self.isRedundant(font, "T", "o"))
+
+
+class KerningValueIndexTest(unittest.TestCase):
+    def test_candidates(self):
+        font = buildFont(("Regular", "Bold"))
+        font.setKerningForPair("Regular", "@T", "@o", -50)
+        font.setKerningForPair("Regular", "T", "odieresis", -20)
+        font.setKerningForPair("Regular", "n", "@o", -10)
+        font.setKerningForPair("Bold", "@T", "@o", -70)
+        font.setKerningForPair("Regular", "@T", "@T", -5)
+        index = plugin.KerningValueIndex(font)
+        # T/odieresis shares neither key with the pair
+        self.assertEqual(index.candidates("Regular", "@T", "@o"), [-70, -10, -5])
+
+    def test_update(self):
+        font = buildFont()
+        font.setKerningForPair("Regular", "@T", "@o", -50)
+        index = plugin.KerningValueIndex(font)
+        self.assertEqual(index.candidates("Regular", "n", "@o"), [-50])
+        font.setKerningForPair("Regular", "T", "@o", -30)
+        index.update("Regular", "T", "@o", None, -30)
+        self.assertEqual(index.candidates("Regular", "n", "@o"), [-50, -30])
+        font.removeKerningForPair("Regular", "T", "@o")
+        index.update("Regular", "T", "@o", -30, None)
+        self.assertEqual(index.candidates("Regular", "n", "@o"), [-50])
+
+    def test_change_outside_of_the_tool(self):
+        font = buildFont(("Regular", "Bold"))
+        font.setKerningForPair("Regular", "@T", "@o", -50)
+        index = plugin.KerningValueIndex(font)
+        bold = index.column("Bold")
+        self.assertEqual(index.candidates("Regular", "n", "@o"), [-50])
+        font.setKerningForPair("Regular", "T", "@o", -30)
+        self.assertEqual(index.candidates("Regular", "n", "@o"), [-50, -30])
+        # The other master is kept
+        self.assertIs(index.column("Bold"), bold)
+
+
+class OutlineStampTest(unittest.TestCase):
+    def buildComposites(self):
+        """
+        Return a font where odieresis is a composite of o, and a glyph
+        "odieresis.ss01" is a composite of odieresis.
+        """
+        font = buildFont()
+        square = [(100, 0), (400, 0), (400, 500), (100, 500)]
+        font.glyphs["o"].layers["Regular"] = GSLayer("Regular", 500, [square])
+        font.glyphs["odieresis"].layers["Regular"] = GSLayer(
+            "Regular", 500, components=[GSComponent("o")]
+        )
+        glyph = GSGlyph("odieresis.ss01", "o", "o")
+        font.glyphs.append(glyph)
+        glyph.layers["Regular"] = GSLayer(
+            "Regular", 500, components=[GSComponent("odieresis")]
+        )
+        return font
+
+    def test_base_glyph_change(self):
+        font = self.buildComposites()
+        layer = font.glyphs["odieresis.ss01"].layers["Regular"]
+        stamp = plugin.outlineStamp(layer)
+        self.assertEqual(plugin.outlineStamp(layer), stamp)
+        font.glyphs["o"].lastChange += 1
+        self.assertNotEqual(plugin.outlineStamp(layer), stamp)
+
+    def test_components_that_refer_to_each_other(self):
+        font = self.buildComposites()
+        font.glyphs["o"].layers["Regular"] = GSLayer(
+            "Regular", 500, components=[GSComponent("odieresis")]
+        )
+        layer = font.glyphs["odieresis"].layers["Regular"]
+        self.assertEqual(plugin.outlineStamp(layer), (0, ((0, (None,)),)))
+
+    def test_signature_of_composite(self):
+        font = self.buildComposites()
+        layer = font.glyphs["odieresis"].layers["Regular"]
+        suggestions = plugin.SidebearingSuggestions()
+        signature = suggestions.signature(layer)
+        base = font.glyphs["o"].layers["Regular"]
+        base.paths[0].nodes[2].position.x = 450
+        base.paths[0].nodes[3].position.x = 150
+        font.glyphs["o"].lastChange += 1
+        self.assertNotEqual(suggestions.signature(layer), signature)
+
+
+class DependencyOrderTest(unittest.TestCase):
+    def order(self, names, references):
+        dependents = {}
+        for name, refs in references.items():
+            for ref in refs:
+                dependents.setdefault(ref, []).append(name)
+        return plugin.dependencyOrder(
+            names,
+            lambda name: dependents.get(name, []),
+            lambda name: references.get(name, []),
+        )
+
+    def test_chain(self):
+        references = {"b": ["a"], "c": ["b"], "d": ["a", "c"]}
+        self.assertEqual(self.order({"a"}, references), ["b", "c", "d"])
+
+    def test_unrelated_glyphs_are_left_out(self):
+        references = {"b": ["a"], "y": ["x"]}
+        self.assertEqual(self.order({"a"}, references), ["b"])
+
+    def test_cycle_is_left_out(self):
+        references = {"b": ["a", "c"], "c": ["b"]}
+        self.assertEqual(self.order({"a"}, references), [])
+
+
+class DeltaTest(unittest.TestCase):
+    def export(self, font, changes):
+        """
+        Record the kerning pairs, change them in the font and return the
+        delta file contents. changes holds (left, right, glyph1, glyph2, new
+        value) tuples.
+        """
+        recorder = plugin.DeltaRecorder(font)
+        for left, right, name1, name2, value in changes:
+            _, _, origin = plugin.resolveKerningPair(
+                font, "Regular", font.glyphs[name1], font.glyphs[name2]
+            )
+            current = plugin.snapshotKerning(font, "Regular", left, right)[-1]
+            recorder.addKerning(
+                "Regular", left, right, current, origin or 0, name1, name2
+            )
+            font.setKerningForPair("Regular", left, right, value)
+        return recorder.export()
+
+    def apply(self, font, data):
+        tool = buildTool(font)
+        return tool.applyOperations(font, plugin.deltaOperations(font, data))
+
+    def test_changed_group_pair(self):
+        source = buildFont()
+        source.setKerningForPair("Regular", "@T", "@o", -50)
+        data = self.export(source, [("@T", "@o", "T", "o", -60)])
+        self.assertEqual(data["kerning"], [[0, "@T", "@o", -10, "T", "o", False]])
+
+        sibling = buildFont()
+        sibling.setKerningForPair("Regular", "@T", "@o", -45)
+        self.assertEqual(self.apply(sibling, data), 1)
+        self.assertEqual(sibling.kerningForPair("Regular", "@T", "@o"), -55)
+
+    def test_new_exception_starts_from_group_value(self):
+        source = buildFont()
+        source.setKerningForPair("Regular", "@T", "@o", -50)
+        data = self.export(source, [("T", "odieresis", "T", "odieresis", -60)])
+        self.assertEqual(
+            data["kerning"], [[0, "T", "odieresis", -10, "T", "odieresis", True]]
+        )
+
+        sibling = buildFont()
+        sibling.setKerningForPair("Regular", "@T", "@o", -45)
+        self.assertEqual(self.apply(sibling, data), 1)
+        self.assertEqual(sibling.kerningForPair("Regular", "T", "odieresis"), -55)
+        # The group pair is left alone
+        self.assertEqual(sibling.kerningForPair("Regular", "@T", "@o"), -45)
+
+    def test_new_pair_that_the_sibling_has(self):
+        source = buildFont()
+        source.setKerningForPair("Regular", "@T", "@o", -50)
+        data = self.export(source, [("T", "odieresis", "T", "odieresis", -60)])
+
+        sibling = buildFont()
+        sibling.setKerningForPair("Regular", "@T", "@o", -45)
+        sibling.setKerningForPair("Regular", "T", "odieresis", -70)
+        self.apply(sibling, data)
+        self.assertEqual(sibling.kerningForPair("Regular", "T", "odieresis"), -80)
+
+    def test_version_1_file(self):
+        data = {
+            "format": plugin.DELTA_FORMAT,
+            "version": 1,
+            "masters": ["Regular"],
+            "kerning": [[0, "T", "odieresis", -10, "T", "odieresis"]],
+            "metrics": [],
+        }
+        sibling = buildFont()
+        self.assertEqual(
+            list(plugin.deltaOperations(sibling, data)),
+            [("kernPair", "Regular", "T", "odieresis", -10)],
+        )
+
+    def test_missing_keys_fall_back_to_glyphs(self):
+        data = {
+            "format": plugin.DELTA_FORMAT,
+            "version": 2,
+            "masters": ["Regular"],
+            "kerning": [[0, "@X", "@o", -10, "T", "o", False]],
+            "metrics": [],
+        }
+        sibling = buildFont()
+        self.assertEqual(
+            list(plugin.deltaOperations(sibling, data)),
+            [("kern", "Regular", "T", "o", -10)],
+        )
+
+    def test_not_a_delta_file(self):
+        with self.assertRaises(ValueError):
+            list(plugin.deltaOperations(buildFont(), {"format": "other"}))
+
+
+if __name__ == "__main__":
+    unittest.main()